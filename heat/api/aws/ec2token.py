@@ -21,10 +21,12 @@ from heat.api.aws.exception import HeatAPIException
 
 gettextutils.install('heat')
 
+from heat.common import cache
 from heat.common import wsgi
 from heat.openstack.common import jsonutils as json
 from oslo.config import cfg
 from heat.openstack.common import importutils
+from heat.openstack.common import timeutils
 
 import webob
 from heat.api.aws import exception
@@ -45,7 +47,17 @@ opts = [
                 default=[],
                 help=_('Allowed keystone endpoints for auth_uri when '
                        'multi_cloud is enabled. At least one endpoint needs '
-                       'to be specified.'))
+                       'to be specified.')),
+    cfg.IntOpt('cache_size',
+               default=1000,
+               help=_('Maximum number of successfully validated request '
+                      'signatures to remember.')),
+    cfg.IntOpt('cache_ttl',
+               default=300,
+               help=_('Number of seconds for which a validated request '
+                      'signature is remembered, unless the token it was '
+                      'exchanged for expires sooner. Set to 0 to validate '
+                      'every request with keystone.'))
 ]
 cfg.CONF.register_opts(opts, group='ec2authtoken')
 
@@ -56,6 +68,9 @@ class EC2Token(wsgi.Middleware):
     def __init__(self, app, conf):
         self.conf = conf
         self.application = app
+        self.session = requests.Session()
+        self.validated = cache.TTLCache(int(self._conf_get('cache_size')),
+                                        int(self._conf_get('cache_ttl')))
 
     def _conf_get(self, name):
         # try config from paste-deploy first
@@ -117,6 +132,20 @@ class EC2Token(wsgi.Middleware):
 
         return access
 
+    def _cache_ttl(self, result):
+        """
+        Return the number of seconds for which a successful validation may
+        be reused, which must not extend beyond the expiry of the token.
+        """
+        ttl = self.validated.ttl
+        expires = result['access']['token'].get('expires')
+        if expires is not None:
+            expires = timeutils.normalize_time(
+                timeutils.parse_isotime(expires))
+            ttl = min(ttl, timeutils.delta_seconds(timeutils.utcnow(),
+                                                   expires))
+        return ttl
+
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
         if not self._conf_get('multi_cloud'):
@@ -189,10 +218,17 @@ class EC2Token(wsgi.Middleware):
         headers = {'Content-Type': 'application/json'}
 
         keystone_ec2_uri = self._conf_get_keystone_ec2_uri(auth_uri)
-        logger.info('Authenticating with %s' % keystone_ec2_uri)
-        response = requests.post(keystone_ec2_uri, data=creds_json,
-                                 headers=headers)
-        result = response.json()
+        digest = hashlib.sha256(keystone_ec2_uri +
+                                json.dumps(creds, sort_keys=True)).hexdigest()
+        result = self.validated.get(digest)
+        cached = result is not None
+        if cached:
+            logger.info("AWS credentials previously validated.")
+        else:
+            logger.info('Authenticating with %s' % keystone_ec2_uri)
+            response = self.session.post(keystone_ec2_uri, data=creds_json,
+                                         headers=headers)
+            result = response.json()
         try:
             token_id = result['access']['token']['id']
             tenant = result['access']['token']['tenant']['name']
@@ -215,6 +251,9 @@ class EC2Token(wsgi.Middleware):
                 raise exception.HeatAccessDeniedError()
 
         # Authenticated!
+        # Reusing a validation must not extend its lifetime
+        if not cached:
+            self.validated.set(digest, result, self._cache_ttl(result))
         ec2_creds = {'ec2Credentials': {'access': access,
                                         'signature': signature}}
         req.headers['X-Auth-EC2-Creds'] = json.dumps(ec2_creds)
@@ -16,6 +16,7 @@
 """
 endpoint for heat AWS-compatible CloudWatch API
 """
+
 from heat.api.aws import exception
 from heat.api.aws import utils as api_utils
 from heat.common import wsgi
@@ -37,6 +38,16 @@ class WatchController(object):
     Implements the API actions
     """
 
+    # The most datapoints returned by a single ListMetrics call, as in AWS
+    METRICS_PAGE_SIZE = 500
+    # The largest MaxRecords accepted by DescribeAlarms, as in AWS
+    MAX_ALARM_RECORDS = 100
+
+    # Map from AWS state names to those used in the engine
+    STATE_MAP = {'OK': engine_api.WATCH_STATE_OK,
+                 'ALARM': engine_api.WATCH_STATE_ALARM,
+                 'INSUFFICIENT_DATA': engine_api.WATCH_STATE_NODATA}
+
     def __init__(self, options):
         self.options = options
         self.engine_rpcapi = rpc_client.EngineClient()
@@ -137,13 +148,47 @@ class WatchController(object):
         except KeyError:
             name = None
 
+        state = parms.get('StateValue')
+        if state is not None:
+            if state not in self.STATE_MAP:
+                msg = _('Invalid state %(state)s, '
+                        'expecting one of %(expect)s') % {
+                            'state': state,
+                            'expect': self.STATE_MAP.keys()}
+                return exception.HeatInvalidParameterValueError(detail=msg)
+            state = self.STATE_MAP[state]
+
+        limit = parms.get('MaxRecords')
+        if limit is not None:
+            try:
+                limit = int(limit)
+                if not 1 <= limit <= self.MAX_ALARM_RECORDS:
+                    raise ValueError
+            except ValueError:
+                msg = _('MaxRecords must be an integer from 1 to %d') % \
+                    self.MAX_ALARM_RECORDS
+                return exception.HeatInvalidParameterValueError(detail=msg)
+
+        marker = parms.get('NextToken')
+        if marker is not None:
+            try:
+                marker = int(marker)
+            except ValueError:
+                msg = _("Invalid NextToken %s") % marker
+                return exception.HeatInvalidParameterValueError(detail=msg)
+
         try:
-            watch_list = self.engine_rpcapi.show_watch(con, watch_name=name)
+            watch_list = self.engine_rpcapi.show_watch(
+                con, watch_name=name, state=state,
+                name_prefix=parms.get('AlarmNamePrefix'),
+                limit=limit, marker=marker)
         except rpc_common.RemoteError as ex:
             return exception.map_remote_error(ex)
 
         res = {'MetricAlarms': [format_metric_alarm(a)
                                 for a in watch_list]}
+        if limit is not None and len(watch_list) >= limit:
+            res['NextToken'] = str(watch_list[-1][engine_api.WATCH_ID])
 
         result = api_utils.format_response("DescribeAlarms", res)
         return result
@@ -184,12 +229,9 @@ class WatchController(object):
         """
         self._enforce(req, 'ListMetrics')
 
-        def format_metric_data(d, fil={}):
+        def format_metric_data(d):
             """
             Reformat engine output into the AWS "Metric" format
-            Takes an optional filter dict, which is traversed
-            so a metric dict is only returned if all keys match
-            the filter dict
             """
             dimensions = [
                 {'AlarmName': d[engine_api.WATCH_DATA_ALARM]},
@@ -206,39 +248,33 @@ class WatchController(object):
                 'Namespace': d[engine_api.WATCH_DATA_NAMESPACE],
             }
 
-            for f in fil:
-                try:
-                    value = result[f]
-                    if value != fil[f]:
-                        # Filter criteria not met, return None
-                        return
-                except KeyError:
-                    logger.warning("Invalid filter key %s, ignoring" % f)
-
             return result
 
         con = req.context
         parms = dict(req.params)
         # FIXME : Don't yet handle filtering by Dimensions
-        filter_result = dict((k, v) for (k, v) in parms.iteritems() if k in
-                             ("MetricName", "Namespace"))
-        logger.debug("filter parameters : %s" % filter_result)
+        filter_kwargs = {'metric_namespace': parms.get('Namespace'),
+                         'metric_name': parms.get('MetricName')}
+        logger.debug("filter parameters : %s" % filter_kwargs)
+
+        marker = parms.get('NextToken')
+        if marker is not None:
+            try:
+                marker = int(marker)
+            except ValueError:
+                msg = _("Invalid NextToken %s") % marker
+                return exception.HeatInvalidParameterValueError(detail=msg)
 
         try:
-            # Engine does not currently support query by namespace/metric
-            # so we pass None/None and do any filtering locally
-            null_kwargs = {'metric_namespace': None,
-                           'metric_name': None}
-            watch_data = self.engine_rpcapi.show_watch_metric(con,
-                                                              **null_kwargs)
+            watch_data = self.engine_rpcapi.show_watch_metric(
+                con, limit=self.METRICS_PAGE_SIZE, marker=marker,
+                **filter_kwargs)
         except rpc_common.RemoteError as ex:
             return exception.map_remote_error(ex)
 
-        res = {'Metrics': []}
-        for d in watch_data:
-            metric = format_metric_data(d, filter_result)
-            if metric:
-                res['Metrics'].append(metric)
+        res = {'Metrics': [format_metric_data(d) for d in watch_data]}
+        if len(watch_data) >= self.METRICS_PAGE_SIZE:
+            res['NextToken'] = str(watch_data[-1][engine_api.WATCH_DATA_ID])
 
         result = api_utils.format_response("ListMetrics", res)
         return result
@@ -271,26 +307,49 @@ class WatchController(object):
             logger.error("Request does not contain required MetricData")
             return exception.HeatMissingParameterError("MetricData list")
 
-        watch_name = None
-        dimensions = []
+        # Each datapoint is passed to the engine with its own dimensions,
+        # except for the special AlarmName dimension, which names the watch
+        # that the datapoint is for.
+        watch_names = set()
+        named = []
+        data = []
         for p in metric_data:
             dimension = api_utils.extract_param_pairs(p,
                                                       prefix='Dimensions',
                                                       keyname='Name',
                                                       valuename='Value')
+
+            # Extract the required data from the metric_data
+            # and format dict to pass to engine
+            datapoint = {'Unit': api_utils.get_param_value(p, 'Unit'),
+                         'Value': api_utils.get_param_value(p, 'Value'),
+                         'Dimensions': [dimension]}
             if 'AlarmName' in dimension:
                 watch_name = dimension['AlarmName']
+                datapoint['Dimensions'] = []
+                named.append((watch_name, datapoint))
             else:
-                dimensions.append(dimension)
-
-        # Extract the required data from the metric_data
-        # and format dict to pass to engine
-        data = {'Namespace': namespace,
-                api_utils.get_param_value(metric_data[0], 'MetricName'): {
-                    'Unit': api_utils.get_param_value(metric_data[0], 'Unit'),
-                    'Value': api_utils.get_param_value(metric_data[0],
-                                                       'Value'),
-                    'Dimensions': dimensions}}
+                watch_name = None
+            watch_names.add(watch_name)
+
+            data.append({'Namespace': namespace,
+                         api_utils.get_param_value(p, 'MetricName'):
+                         datapoint})
+
+        # All of the datapoints are sent to the engine in a single call, so
+        # that either all of them are stored or none are. If they are not all
+        # for the same watch, those naming a watch keep their AlarmName
+        # dimension for the engine to route them by.
+        if len(watch_names) == 1:
+            watch_name = watch_names.pop()
+        else:
+            watch_name = None
+            for name, datapoint in named:
+                datapoint['Dimensions'] = [{'AlarmName': name}]
+
+        # A single datapoint is sent on its own, as older engines expect
+        if len(data) == 1:
+            data = data[0]
 
         try:
             self.engine_rpcapi.create_watch_data(con, watch_name, data)
@@ -306,10 +365,7 @@ class WatchController(object):
         """
         self._enforce(req, 'SetAlarmState')
 
-        # Map from AWS state names to those used in the engine
-        state_map = {'OK': engine_api.WATCH_STATE_OK,
-                     'ALARM': engine_api.WATCH_STATE_ALARM,
-                     'INSUFFICIENT_DATA': engine_api.WATCH_STATE_NODATA}
+        state_map = self.STATE_MAP
 
         con = req.context
         parms = dict(req.params)
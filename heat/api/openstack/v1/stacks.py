@@ -245,9 +245,11 @@ class StackController(object):
         """
         Gets detailed information for a stack
         """
+        refresh = req.params.get('refresh_outputs', 'false')
 
-        stack_list = self.engine.show_stack(req.context,
-                                            identity)
+        stack_list = self.engine.show_stack(
+            req.context, identity,
+            refresh_outputs=str(refresh).lower() == 'true')
 
         if not stack_list:
             raise exc.HTTPInternalServerError()
@@ -48,7 +48,11 @@ def purge_deleted():
     """
     Remove database records that have been previously soft deleted
     """
-    utils.purge_deleted(CONF.command.age, CONF.command.granularity)
+    counts = utils.purge_deleted(CONF.command.age, CONF.command.granularity,
+                                 CONF.command.batch_size)
+    for table_name in sorted(counts):
+        print(_('%(table)s: %(count)d rows deleted') %
+              {'table': table_name, 'count': counts[table_name]})
 
 
 def add_command_parsers(subparsers):
@@ -68,6 +72,10 @@ def add_command_parsers(subparsers):
         '-g', '--granularity', default='days',
         choices=['days', 'hours', 'minutes', 'seconds'],
         help=_('Granularity to use for age argument, defaults to days.'))
+    parser.add_argument(
+        '-b', '--batch_size', default='100',
+        help=_('Number of stacks to purge in each transaction, '
+               'defaults to 100.'))
 
 command_opt = cfg.SubCommandOpt('command',
                                 title='Commands',
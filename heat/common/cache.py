@@ -0,0 +1,130 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+'''
+Simple in-process caches for data that is expensive to fetch or compute.
+'''
+
+import collections
+import itertools
+from time import time as wallclock
+
+
+class LRUCache(object):
+    '''
+    A dictionary-like cache holding at most max_size entries. When full, the
+    least recently used entry is discarded to make room for a new one. A
+    max_size of 0 disables the cache entirely.
+    '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = {}
+        # Keys in order of use, oldest first, tagged with the time they were
+        # used. A key used again is appended anew rather than moved, so any
+        # entry whose tag is older than that in _used is stale.
+        self._order = collections.deque()
+        self._used = {}
+        self._clock = itertools.count()
+
+    def _touch(self, key):
+        tick = next(self._clock)
+        self._used[key] = tick
+        self._order.append((tick, key))
+        if len(self._order) > 2 * len(self._data) + 16:
+            self._order = collections.deque(sorted((t, k) for k, t
+                                                   in self._used.items()))
+
+    def get(self, key, default=None):
+        '''Return the value for key, marking it as recently used.'''
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        self._touch(key)
+        return value
+
+    def set(self, key, value):
+        '''Store a value, evicting the least recently used if necessary.'''
+        if self.max_size <= 0:
+            return
+        if key not in self._data:
+            while len(self._data) >= self.max_size:
+                tick, oldest = self._order.popleft()
+                if self._used.get(oldest) == tick:
+                    self.delete(oldest)
+        self._data[key] = value
+        self._touch(key)
+
+    def delete(self, key):
+        '''Remove key from the cache, if present.'''
+        self._data.pop(key, None)
+        self._used.pop(key, None)
+
+    def clear(self):
+        '''Remove all entries from the cache.'''
+        self._data.clear()
+        self._used.clear()
+        self._order.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TTLCache(LRUCache):
+    '''
+    An LRUCache whose entries also expire ttl seconds after they are stored.
+    The numbers of hits and misses are counted, so that the effectiveness of
+    the cache can be monitored. A ttl of 0 disables the cache entirely.
+    '''
+
+    def __init__(self, max_size, ttl):
+        super(TTLCache, self).__init__(max_size)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        '''Return the value for key, if it has not yet expired.'''
+        entry = super(TTLCache, self).get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > wallclock():
+                self.hits += 1
+                return value
+            self.delete(key)
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        '''Store a value which expires after ttl (by default self.ttl).'''
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0:
+            return
+        super(TTLCache, self).set(key, (wallclock() + ttl, value))
+
+    def hit_rate(self):
+        '''Return the fraction of lookups which were hits, or None.'''
+        lookups = self.hits + self.misses
+        if not lookups:
+            return None
+        return float(self.hits) / lookups
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > wallclock()
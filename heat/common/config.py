@@ -106,7 +106,103 @@ engine_opts = [
                default=1000,
                help=_('Maximum events that will be available per stack. Older'
                       ' events will be deleted when this is reached. Set to 0'
-                      ' for unlimited events per stack.'))]
+                      ' for unlimited events per stack.')),
+    cfg.IntOpt('template_cache_size',
+               default=100,
+               help=_('Maximum number of parsed raw templates kept in memory'
+                      ' by each engine, keyed by template content hash. Set'
+                      ' to 0 to disable the cache.')),
+    cfg.IntOpt('watch_data_retention',
+               default=0,
+               help=_('Number of hours CloudWatch metric samples are kept'
+                      ' before being pruned. This should exceed the longest'
+                      ' alarm Period in use. Set to 0 (the default) to keep'
+                      ' samples forever.')),
+    cfg.BoolOpt('watch_data_rollups',
+                default=False,
+                help=_('Aggregate pruned metric samples into per-minute'
+                       ' minimum, maximum, sum and count rollups instead of'
+                       ' discarding them.')),
+    cfg.IntOpt('watch_data_rollup_retention',
+               default=168,
+               help=_('Number of hours per-minute metric rollups are kept'
+                      ' before being pruned. Set to 0 to keep rollups'
+                      ' forever.')),
+    cfg.BoolOpt('watch_sample_buffers',
+                default=False,
+                help=_('Keep the recent metric samples of each watch rule in'
+                       ' memory, so that alarms are evaluated without reading'
+                       ' samples back from the database. Only enable this'
+                       ' when a single engine receives all metric data, since'
+                       ' each engine otherwise sees only part of it.')),
+    cfg.FloatOpt('scaling_signal_window',
+                 default=0.0,
+                 help=_('Number of seconds a scaling policy signal waits for'
+                        ' other signals to the same AutoScalingGroup, so that'
+                        ' they are all applied as a single resize. This'
+                        ' delays every scaling action by up to this long.'
+                        ' Set to 0 (the default) to apply each signal as'
+                        ' soon as any earlier one has been applied.')),
+    cfg.IntOpt('nova_lookup_cache_size',
+               default=1000,
+               help=_('Maximum number of image, flavor and keypair lookups'
+                      ' each engine caches for each tenant.')),
+    cfg.IntOpt('nova_lookup_cache_ttl',
+               default=60,
+               help=_('Number of seconds each engine caches the results of'
+                      ' looking up images, flavors and keypairs by name. Set'
+                      ' to 0 to disable the cache.')),
+    cfg.IntOpt('nova_lookup_negative_cache_ttl',
+               default=10,
+               help=_('Number of seconds each engine remembers that an'
+                      ' image, flavor or keypair was not found.')),
+    cfg.FloatOpt('server_status_poll_interval',
+                 default=1.0,
+                 help=_('Minimum number of seconds between requests for the'
+                        ' status of servers that are changing state. All of a'
+                        ' tenant\'s servers are refreshed by each request. Set'
+                        ' to 0 to refresh each server individually.')),
+    cfg.IntOpt('trust_token_refresh_margin',
+               default=300,
+               help=_('Number of seconds before a cached trust-scoped token'
+                      ' expires at which a new one is requested instead.'
+                      ' Set to a negative value to disable the cache.')),
+    cfg.FloatOpt('api_rate_limit',
+                 default=0.0,
+                 help=_('Average number of requests per second each engine'
+                        ' sends to each OpenStack service on behalf of a'
+                        ' tenant. Set to 0 (the default) to disable rate'
+                        ' limiting.')),
+    cfg.IntOpt('api_rate_burst',
+               default=20,
+               help=_('Number of requests to an OpenStack service on behalf'
+                      ' of a tenant which may be sent at once, in excess of'
+                      ' api_rate_limit.')),
+    cfg.IntOpt('api_retry_limit',
+               default=5,
+               help=_('Number of times a request rejected by an OpenStack'
+                      ' service as over limit or unavailable is retried.')),
+    cfg.FloatOpt('api_retry_backoff',
+                 default=1.0,
+                 help=_('Maximum number of seconds to wait before the first'
+                        ' retry of a rejected request, doubling for each'
+                        ' subsequent retry.')),
+    cfg.FloatOpt('api_retry_max_backoff',
+                 default=30.0,
+                 help=_('Upper limit on the number of seconds to wait'
+                        ' before retrying a rejected request.')),
+    cfg.IntOpt('attribute_cache_ttl',
+               default=60,
+               help=_('Number of seconds for which attributes of resources'
+                      ' fetched from other OpenStack services are stored and'
+                      ' reused. Set to 0 to fetch them every time.')),
+    cfg.FloatOpt('neutron_status_poll_interval',
+                 default=1.0,
+                 help=_('Minimum number of seconds between requests for the'
+                        ' status of Neutron resources that are changing'
+                        ' state. All of a tenant\'s resources of the same type'
+                        ' are refreshed by each request. Set to 0 to refresh'
+                        ' each resource individually.'))]
 rpc_opts = [
     cfg.StrOpt('host',
                default=socket.gethostname(),
@@ -13,11 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from heat.common import cache
 from heat.common import context
 from heat.common import exception
 
 import eventlet
+import functools
 
+from keystoneclient import exceptions as kc_exception
 from keystoneclient.v2_0 import client as kc
 from keystoneclient.v3 import client as kc_v3
 from oslo.config import cfg
@@ -27,6 +30,44 @@ from heat.openstack.common import log as logging
 
 logger = logging.getLogger('heat.common.keystoneclient')
 
+cfg.CONF.import_opt('trust_token_refresh_margin', 'heat.common.config')
+
+TRUST_CACHE_SIZE = 1000
+
+_trust_clients = None
+
+
+def trust_client_cache():
+    '''
+    Return the cache of clients authenticated with trust-scoped tokens,
+    keyed by trust ID, which is shared by all stacks in this process.
+    '''
+    global _trust_clients
+    if _trust_clients is None:
+        _trust_clients = cache.LRUCache(TRUST_CACHE_SIZE)
+    return _trust_clients
+
+
+def _retry_unauthorized(method):
+    '''
+    Decorate a method using the v2 client so that, if it fails because a
+    cached trust-scoped token has been revoked, the token is evicted from the
+    cache and the method retried once with a freshly authenticated client.
+    '''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except kc_exception.Unauthorized:
+            if not self._client_v2_cached:
+                raise
+            logger.info('Cached token for trust %s rejected, '
+                        're-authenticating' % self.context.trust_id)
+            trust_client_cache().delete(self.context.trust_id)
+            self._client_v2 = None
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class KeystoneClient(object):
     """
@@ -53,6 +94,7 @@ class KeystoneClient(object):
         # - context.auth_url is expected to contain the v2.0 keystone endpoint
         self.context = context
         self._client_v2 = None
+        self._client_v2_cached = False
         self._client_v3 = None
 
         if self.context.trust_id:
@@ -73,7 +115,33 @@ class KeystoneClient(object):
             self._client_v2 = self._v2_client_init()
         return self._client_v2
 
+    def _cached_trust_client(self):
+        '''
+        Return a client already authenticated with a token scoped to the
+        context's trust, provided the token is not about to expire.
+        '''
+        margin = cfg.CONF.trust_token_refresh_margin
+        if margin < 0:
+            return None
+        client_v2 = trust_client_cache().get(self.context.trust_id)
+        if client_v2 is None:
+            return None
+        if client_v2.auth_ref.will_expire_soon(margin):
+            trust_client_cache().delete(self.context.trust_id)
+            return None
+        return client_v2
+
     def _v2_client_init(self):
+        self._client_v2_cached = False
+        if self.context.trust_id is not None:
+            client_v2 = self._cached_trust_client()
+            if client_v2 is not None:
+                creds = self._service_admin_creds(api_version=2)
+                self.context.auth_token = client_v2.auth_ref.auth_token
+                self.context.auth_url = creds['auth_url']
+                self._client_v2_cached = True
+                return client_v2
+
         kwargs = {
             'auth_url': self.context.auth_url
         }
@@ -113,6 +181,8 @@ class KeystoneClient(object):
             # All OK so update the context with the token
             self.context.auth_token = client_v2.auth_ref.auth_token
             self.context.auth_url = kwargs.get('auth_url')
+            if cfg.CONF.trust_token_refresh_margin >= 0:
+                trust_client_cache().set(self.context.trust_id, client_v2)
 
         return client_v2
 
@@ -208,6 +278,7 @@ class KeystoneClient(object):
         """
         self.client_v3.trusts.delete(trust_id)
 
+    @_retry_unauthorized
     def create_stack_user(self, username, password=''):
         """
         Create a user defined as part of a stack, either via template
@@ -245,6 +316,7 @@ class KeystoneClient(object):
 
         return user.id
 
+    @_retry_unauthorized
     def delete_stack_user(self, user_id):
 
         user = self.client_v2.users.get(user_id)
@@ -280,9 +352,11 @@ class KeystoneClient(object):
         if status != 'DELETED':
             raise exception.Error(reason)
 
+    @_retry_unauthorized
     def delete_ec2_keypair(self, user_id, accesskey):
         self.client_v2.ec2.delete(user_id, accesskey)
 
+    @_retry_unauthorized
     def get_ec2_keypair(self, user_id):
         # We make the assumption that each user will only have one
         # ec2 keypair, it's not clear if AWS allow multiple AccessKey resources
@@ -297,10 +371,12 @@ class KeystoneClient(object):
             logger.error("Unexpected number of ec2 credentials %s for %s" %
                          (len(cred), user_id))
 
+    @_retry_unauthorized
     def disable_stack_user(self, user_id):
         # FIXME : This won't work with the v3 keystone API
         self.client_v2.users.update_enabled(user_id, False)
 
+    @_retry_unauthorized
     def enable_stack_user(self, user_id):
         # FIXME : This won't work with the v3 keystone API
         self.client_v2.users.update_enabled(user_id, True)
@@ -0,0 +1,140 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+'''
+Streaming summaries of distributions of values.
+'''
+
+import math
+
+from heat.openstack.common.gettextutils import _
+
+
+class DDSketch(object):
+    '''
+    A mergeable summary of a distribution, from which quantiles can be
+    estimated to within a fixed relative accuracy, as described in
+    "DDSketch: A Fast and Fully-Mergeable Quantile Sketch with
+    Relative-Error Guarantees" (Masson, Rim and Lee, 2019).
+
+    Values are counted in logarithmically sized bins, so memory use depends
+    only on the range of the values and never on how many there are. It is
+    further bounded by max_bins, beyond which the bins holding the lowest
+    values are merged, reducing the accuracy of only the lowest quantiles.
+    '''
+
+    # Values closer to zero than this are all counted as zero
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(_('relative_accuracy must be between 0 and 1'))
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _collapse(self, bins, negative=False):
+        # The lowest values are those of the smallest magnitude when they are
+        # positive, but of the largest magnitude when they are negative
+        extreme = max if negative else min
+        while len(bins) > self.max_bins:
+            count = bins.pop(extreme(bins))
+            bins[extreme(bins)] += count
+
+    def add(self, value, count=1):
+        '''Add a value to the sketch, count times.'''
+        if value > self.MIN_VALUE:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0) + count
+            self._collapse(self.positive)
+        elif value < -self.MIN_VALUE:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0) + count
+            self._collapse(self.negative, negative=True)
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def merge(self, other):
+        '''Add all of the values summarised by another sketch to this one.'''
+        if other.gamma != self.gamma:
+            raise ValueError(_('Cannot merge sketches with different '
+                               'relative accuracies'))
+        for bins, other_bins, negative in (
+                (self.positive, other.positive, False),
+                (self.negative, other.negative, True)):
+            for index, count in other_bins.items():
+                bins[index] = bins.get(index, 0) + count
+            self._collapse(bins, negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        '''
+        Return an estimate of the q-quantile of the values added, for q
+        between 0 and 1, or None if the sketch is empty.
+        '''
+        if not 0 <= q <= 1:
+            raise ValueError(_('Quantile must be between 0 and 1'))
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive))
+
+    def to_dict(self):
+        '''Return a JSON-serialisable representation of the sketch.'''
+        return {'relative_accuracy': self.relative_accuracy,
+                'positive': dict((str(i), c) for i, c in
+                                 self.positive.items()),
+                'negative': dict((str(i), c) for i, c in
+                                 self.negative.items()),
+                'zero_count': self.zero_count}
+
+    @classmethod
+    def from_dict(cls, data, max_bins=2048):
+        '''Recreate a sketch from the output of to_dict().'''
+        sketch = cls(data['relative_accuracy'], max_bins)
+        sketch.positive = dict((int(i), c) for i, c in
+                               data['positive'].items())
+        sketch.negative = dict((int(i), c) for i, c in
+                               data['negative'].items())
+        sketch.zero_count = data['zero_count']
+        sketch.count = (sum(sketch.positive.values()) +
+                        sum(sketch.negative.values()) +
+                        sketch.zero_count)
+        return sketch
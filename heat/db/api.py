@@ -182,10 +182,30 @@ def watch_rule_get_all(context):
     return IMPL.watch_rule_get_all(context)
 
 
+def watch_rule_get_all_summary(context, state=None, name_prefix=None,
+                               limit=None, marker=None):
+    return IMPL.watch_rule_get_all_summary(context, state=state,
+                                           name_prefix=name_prefix,
+                                           limit=limit, marker=marker)
+
+
+def watch_rule_get_all_by_ids(context, watch_rule_ids):
+    return IMPL.watch_rule_get_all_by_ids(context, watch_rule_ids)
+
+
+def watch_rule_signature(context):
+    return IMPL.watch_rule_signature(context)
+
+
 def watch_rule_get_all_by_stack(context, stack_id):
     return IMPL.watch_rule_get_all_by_stack(context, stack_id)
 
 
+def watch_rule_get_all_with_stack(context, exclude_states=None):
+    return IMPL.watch_rule_get_all_with_stack(context,
+                                              exclude_states=exclude_states)
+
+
 def watch_rule_create(context, values):
     return IMPL.watch_rule_create(context, values)
 
@@ -194,6 +214,10 @@ def watch_rule_update(context, watch_id, values):
     return IMPL.watch_rule_update(context, watch_id, values)
 
 
+def watch_rule_update_all(context, values):
+    return IMPL.watch_rule_update_all(context, values)
+
+
 def watch_rule_delete(context, watch_id):
     return IMPL.watch_rule_delete(context, watch_id)
 
@@ -202,8 +226,39 @@ def watch_data_create(context, values):
     return IMPL.watch_data_create(context, values)
 
 
-def watch_data_get_all(context):
-    return IMPL.watch_data_get_all(context)
+def watch_data_create_all(context, values_list):
+    return IMPL.watch_data_create_all(context, values_list)
+
+
+def watch_data_get_all(context, namespace=None, metric_name=None,
+                       limit=None, marker=None):
+    return IMPL.watch_data_get_all(context, namespace=namespace,
+                                   metric_name=metric_name,
+                                   limit=limit, marker=marker)
+
+
+def watch_data_get_all_by_watch_rule(context, watch_rule_id, since=None):
+    return IMPL.watch_data_get_all_by_watch_rule(context, watch_rule_id,
+                                                 since=since)
+
+
+def watch_data_statistics(context, watch_rule_id, since=None):
+    return IMPL.watch_data_statistics(context, watch_rule_id, since=since)
+
+
+def watch_data_rollup_get_all_by_watch_rule(context, watch_rule_id,
+                                            since=None):
+    return IMPL.watch_data_rollup_get_all_by_watch_rule(context,
+                                                        watch_rule_id,
+                                                        since=since)
+
+
+def watch_data_prune(context, time_line, rollups=False):
+    return IMPL.watch_data_prune(context, time_line, rollups=rollups)
+
+
+def watch_data_rollup_prune(context, time_line):
+    return IMPL.watch_data_rollup_prune(context, time_line)
 
 
 def db_sync(version=None):
@@ -14,12 +14,16 @@
 #    under the License.
 
 '''Implementation of SQLAlchemy backend.'''
+import collections
+import hashlib
+import json
 import sys
 from datetime import datetime
 from datetime import timedelta
 
 from oslo.config import cfg
 import sqlalchemy
+from sqlalchemy import orm
 from sqlalchemy.orm.session import Session
 
 cfg.CONF.import_opt('max_events_per_stack', 'heat.common.config')
@@ -28,11 +32,18 @@ from heat.openstack.common.gettextutils import _
 
 from heat.common import crypt
 from heat.common import exception
+from heat.common import sketch
 from heat.db.sqlalchemy import migration
 from heat.db.sqlalchemy import models
+from heat.openstack.common.db import exception as db_exception
 from heat.openstack.common.db.sqlalchemy import session as db_session
+from heat.openstack.common import excutils
+from heat.openstack.common import log as logging
+from heat.openstack.common import timeutils
 
 
+logger = logging.getLogger(__name__)
+
 get_engine = db_session.get_engine
 get_session = db_session.get_session
 
@@ -79,11 +90,50 @@ def raw_template_get(context, template_id):
     return result
 
 
+def _template_hash(template):
+    canonical = json.dumps(template, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def _raw_template_get_by_hash(context, template_hash):
+    return model_query(context, models.RawTemplate).\
+        filter_by(hash=template_hash).first()
+
+
 def raw_template_create(context, values):
-    raw_template_ref = models.RawTemplate()
-    raw_template_ref.update(values)
-    raw_template_ref.save(_session(context))
-    return raw_template_ref
+    """Store a template, sharing the row with any identical template.
+
+    Raw templates are content-addressed, so storing a template which is
+    already in the database returns the existing row. Rows are shared by
+    reference count, which is maintained as stacks are created, updated and
+    purged.
+    """
+    template_hash = _template_hash(values['template'])
+    existing = _raw_template_get_by_hash(context, template_hash)
+    if existing is None:
+        raw_template_ref = models.RawTemplate()
+        raw_template_ref.update(values)
+        raw_template_ref.hash = template_hash
+        raw_template_ref.refcount = 0
+        try:
+            raw_template_ref.save(_session(context))
+            return raw_template_ref
+        except db_exception.DBDuplicateEntry:
+            # Another engine stored the same template concurrently
+            existing = _raw_template_get_by_hash(context, template_hash)
+
+    # Touch the row so that purge_deleted does not remove a template that
+    # is about to be referenced
+    existing.updated_at = timeutils.utcnow()
+    existing.save(_session(context))
+    return existing
+
+
+def _raw_template_adjust_refcount(context, template_id, delta):
+    model_query(context, models.RawTemplate).\
+        filter_by(id=template_id).\
+        update({'refcount': models.RawTemplate.refcount + delta},
+               synchronize_session=False)
 
 
 def resource_get(context, resource_id):
@@ -270,6 +320,7 @@ def stack_create(context, values):
     stack_ref = models.Stack()
     stack_ref.update(values)
     stack_ref.save(_session(context))
+    _raw_template_adjust_refcount(context, stack_ref.raw_template_id, 1)
     return stack_ref
 
 
@@ -285,6 +336,10 @@ def stack_update(context, stack_id, values):
     stack.update(values)
     stack.save(_session(context))
 
+    if stack.raw_template_id != old_template_id:
+        _raw_template_adjust_refcount(context, stack.raw_template_id, 1)
+        _raw_template_adjust_refcount(context, old_template_id, -1)
+
 
 def stack_delete(context, stack_id):
     s = stack_get(context, stack_id)
@@ -335,24 +390,23 @@ def event_get(context, event_id):
     return result
 
 
-def event_get_all(context):
-    stacks = soft_delete_aware_query(context, models.Stack)
-    stack_ids = [stack.id for stack in stacks]
-    results = model_query(context, models.Event).\
-        filter(models.Event.stack_id.in_(stack_ids)).all()
+def _query_event_get_all(context):
+    # Join with the stack so callers can format events without loading
+    # each stack individually
+    query = model_query(context, models.Event).\
+        join(models.Event.stack).\
+        options(orm.contains_eager(models.Event.stack)).\
+        filter(models.Stack.deleted_at == sqlalchemy.null())
+    return query
 
-    return results
 
+def event_get_all(context):
+    return _query_event_get_all(context).all()
 
-def event_get_all_by_tenant(context):
-    stacks = soft_delete_aware_query(context, models.Stack).\
-        filter_by(tenant=context.tenant_id).all()
-    results = []
-    for stack in stacks:
-        results.extend(model_query(context, models.Event).
-                       filter_by(stack_id=stack.id).all())
 
-    return results
+def event_get_all_by_tenant(context):
+    return _query_event_get_all(context).\
+        filter(models.Stack.tenant == context.tenant_id).all()
 
 
 def _query_all_by_stack(context, stack_id):
@@ -420,12 +474,75 @@ def watch_rule_get_all(context):
     return results
 
 
+def watch_rule_get_all_summary(context, state=None, name_prefix=None,
+                               limit=None, marker=None):
+    """
+    Return the columns of watch rules needed to describe them, without
+    loading any of their watch data, ordered by ID. Optionally only rules in
+    a given state or whose names start with a given prefix are returned. At
+    most limit rules are returned, starting after the rule whose ID is
+    marker.
+    """
+    query = model_query(context, models.WatchRule.id, models.WatchRule.name,
+                        models.WatchRule.rule, models.WatchRule.state,
+                        models.WatchRule.stack_id,
+                        models.WatchRule.created_at,
+                        models.WatchRule.updated_at)
+    if state is not None:
+        query = query.filter(models.WatchRule.state == state)
+    if name_prefix:
+        pattern = name_prefix.replace('\\', '\\\\').\
+            replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(models.WatchRule.name.like(pattern + '%',
+                                                        escape='\\'))
+    if marker is not None:
+        query = query.filter(models.WatchRule.id > marker)
+    query = query.order_by(models.WatchRule.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def watch_rule_get_all_by_ids(context, watch_rule_ids):
+    results = model_query(context, models.WatchRule).\
+        filter(models.WatchRule.id.in_(list(watch_rule_ids))).all()
+    return results
+
+
+def watch_rule_signature(context):
+    """Return a value which changes whenever a watch rule is added or removed.
+
+    This is the number of rules together with the highest rule ID, which is
+    cheap to compute however many rules there are.
+    """
+    count, max_id = model_query(
+        context,
+        sqlalchemy.func.count(models.WatchRule.id),
+        sqlalchemy.func.max(models.WatchRule.id)).one()
+    return count, max_id
+
+
 def watch_rule_get_all_by_stack(context, stack_id):
     results = model_query(context, models.WatchRule).\
         filter_by(stack_id=stack_id).all()
     return results
 
 
+def watch_rule_get_all_with_stack(context, exclude_states=None):
+    """Return watch rules of live stacks, with each rule's stack loaded.
+
+    Rules in any of exclude_states are skipped.
+    """
+    query = model_query(context, models.WatchRule).\
+        join(models.WatchRule.stack).\
+        options(orm.contains_eager(models.WatchRule.stack)).\
+        filter(models.Stack.deleted_at == sqlalchemy.null())
+    if exclude_states:
+        query = query.filter(
+            sqlalchemy.not_(models.WatchRule.state.in_(exclude_states)))
+    return query.all()
+
+
 def watch_rule_create(context, values):
     obj_ref = models.WatchRule()
     obj_ref.update(values)
@@ -444,6 +561,11 @@ def watch_rule_update(context, watch_id, values):
     wr.save(_session(context))
 
 
+def watch_rule_update_all(context, values):
+    return model_query(context, models.WatchRule).\
+        update(values, synchronize_session=False)
+
+
 def watch_rule_delete(context, watch_id):
     wr = watch_rule_get(context, watch_id)
     if not wr:
@@ -452,8 +574,9 @@ def watch_rule_delete(context, watch_id):
 
     session = Session.object_session(wr)
 
-    for d in wr.watch_data:
-        session.delete(d)
+    for model in (models.WatchData, models.WatchDataRollup):
+        session.query(model).filter_by(watch_rule_id=watch_id).\
+            delete(synchronize_session=False)
 
     session.delete(wr)
     session.flush()
@@ -466,12 +589,261 @@ def watch_data_create(context, values):
     return obj_ref
 
 
-def watch_data_get_all(context):
-    results = model_query(context, models.WatchData).all()
-    return results
+def watch_data_create_all(context, values_list):
+    """
+    Insert many watch_data rows with a single executemany() of one INSERT
+    statement, rather than flushing an ORM object for each row.
+    """
+    session = _session(context)
+    session.execute(models.WatchData.__table__.insert(), values_list)
+
 
+def watch_data_get_all(context, namespace=None, metric_name=None,
+                       limit=None, marker=None):
+    """
+    Return watch data, oldest first, optionally only that of one namespace
+    and/or metric. At most limit rows are returned, starting after the row
+    whose ID is marker.
+    """
+    query = model_query(context, models.WatchData).\
+        options(orm.joinedload('watch_rule'))
+    if namespace is not None:
+        query = query.filter_by(namespace=namespace)
+    if metric_name is not None:
+        query = query.filter_by(metric_name=metric_name)
+    if marker is not None:
+        query = query.filter(models.WatchData.id > marker)
+    query = query.order_by(models.WatchData.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def watch_data_get_all_by_watch_rule(context, watch_rule_id, since=None):
+    query = model_query(context, models.WatchData).\
+        filter_by(watch_rule_id=watch_rule_id)
+    if since is not None:
+        query = query.filter(models.WatchData.created_at >= since)
+    return query.order_by(models.WatchData.created_at).all()
+
+
+def watch_data_statistics(context, watch_rule_id, since=None):
+    """Aggregate the numeric samples of a watch rule in a single query.
+
+    Returns a dict with the minimum, maximum and sum of the sample values,
+    the total sample_count and the value_count of samples with a numeric
+    value. Samples stored before values were split out of the JSON data have
+    no value, so callers must fall back to decoding those themselves when
+    value_count is less than sample_count.
+    """
+    value = models.WatchData.value
+    query = model_query(context,
+                        sqlalchemy.func.min(value),
+                        sqlalchemy.func.max(value),
+                        sqlalchemy.func.sum(value),
+                        sqlalchemy.func.count(models.WatchData.id),
+                        sqlalchemy.func.count(value)).\
+        filter(models.WatchData.watch_rule_id == watch_rule_id)
+    if since is not None:
+        query = query.filter(models.WatchData.created_at >= since)
+    minimum, maximum, total, sample_count, value_count = query.one()
+    return {'minimum': minimum,
+            'maximum': maximum,
+            'sum': total,
+            'sample_count': sample_count,
+            'value_count': value_count}
+
+
+def watch_data_rollup_get_all_by_watch_rule(context, watch_rule_id,
+                                            since=None):
+    query = model_query(context, models.WatchDataRollup).\
+        filter_by(watch_rule_id=watch_rule_id)
+    if since is not None:
+        query = query.filter(models.WatchDataRollup.period_start >= since)
+    return query.order_by(models.WatchDataRollup.period_start).all()
+
+
+def _watch_data_rollups(samples):
+    """Aggregate (watch_rule_id, created_at, value, unit) rows by minute.
+
+    Besides the minimum, maximum, sum and count, each rollup keeps a sketch
+    of the distribution of its samples, from which percentiles for any span
+    of minutes can later be estimated.
+    """
+    rollups = {}
+    sketches = {}
+    for rule_id, created_at, value, unit in samples:
+        if value is None:
+            continue
+        minute = created_at.replace(second=0, microsecond=0)
+        key = (rule_id, minute)
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollups[key] = {'watch_rule_id': rule_id,
+                            'period_start': minute,
+                            'minimum': value,
+                            'maximum': value,
+                            'sum': value,
+                            'sample_count': 1,
+                            'unit': unit}
+            sketches[key] = sketch.DDSketch()
+        else:
+            rollup['minimum'] = min(rollup['minimum'], value)
+            rollup['maximum'] = max(rollup['maximum'], value)
+            rollup['sum'] += value
+            rollup['sample_count'] += 1
+        sketches[key].add(value)
+
+    for key, rollup in rollups.items():
+        rollup['sketch'] = sketches[key].to_dict()
+    return rollups.values()
+
+
+def watch_data_prune(context, time_line, rollups=False):
+    """Delete all watch_data samples created before time_line.
+
+    If rollups is True, the expired samples are first aggregated into
+    per-minute watch_data_rollup rows. The cut-off is rounded down to a whole
+    minute in that case, so that no minute is ever split across two rollups.
+    Every engine prunes, so a minute which already has a rollup is skipped,
+    and if another engine stores a rollup for the same minute concurrently
+    the unique index on watch_data_rollup makes this prune back out, leaving
+    the samples to the other engine. Returns the number of samples deleted.
+    """
+    session = _session(context)
+    if rollups:
+        time_line = time_line.replace(second=0, microsecond=0)
+    expired = session.query(models.WatchData).\
+        filter(models.WatchData.created_at < time_line)
 
-def purge_deleted(age, granularity='days'):
+    session.begin(subtransactions=True)
+    try:
+        if rollups:
+            samples = expired.with_entities(models.WatchData.watch_rule_id,
+                                            models.WatchData.created_at,
+                                            models.WatchData.value,
+                                            models.WatchData.unit)
+            new_rollups = _watch_data_rollups(samples)
+            if new_rollups:
+                earliest = min(r['period_start'] for r in new_rollups)
+                stored = set(session.query(
+                    models.WatchDataRollup.watch_rule_id,
+                    models.WatchDataRollup.period_start).filter(
+                        models.WatchDataRollup.period_start >= earliest,
+                        models.WatchDataRollup.period_start < time_line))
+            for values in new_rollups:
+                if (values['watch_rule_id'], values['period_start']) in stored:
+                    continue
+                rollup = models.WatchDataRollup()
+                rollup.update(values)
+                session.add(rollup)
+            session.flush()
+        count = expired.delete(synchronize_session=False)
+        session.commit()
+    except db_exception.DBDuplicateEntry:
+        session.rollback()
+        logger.info(_('Watch data is being pruned by another engine'))
+        return 0
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            session.rollback()
+    return count
+
+
+def watch_data_rollup_prune(context, time_line):
+    """Delete all watch_data_rollup rows for minutes before time_line."""
+    return model_query(context, models.WatchDataRollup).\
+        filter(models.WatchDataRollup.period_start < time_line).\
+        delete(synchronize_session=False)
+
+
+def _purge_stacks(engine, tables, stack_ids, time_line):
+    """Delete a batch of soft-deleted stacks and all of their dependent rows.
+
+    All of the deletes for a batch happen in a single transaction, and each
+    statement covers the whole batch. The stacks are locked and re-read at
+    the start of the transaction, so that only those not already purged by a
+    concurrent purge are deleted and release their template references.
+    Returns a dict of row counts deleted, keyed by table name.
+    """
+    stack = tables['stack']
+    resource = tables['resource']
+    resource_data = tables['resource_data']
+    watch_rule = tables['watch_rule']
+    watch_data = tables['watch_data']
+    watch_data_rollup = tables['watch_data_rollup']
+    event = tables['event']
+    raw_template = tables['raw_template']
+    user_creds = tables['user_creds']
+
+    counts = dict((table_name, 0) for table_name in tables
+                  if table_name != 'raw_template')
+    with engine.begin() as conn:
+        stacks = conn.execute(
+            sqlalchemy.select([stack.c.id,
+                               stack.c.raw_template_id,
+                               stack.c.user_creds_id],
+                              for_update=True).
+            where(stack.c.id.in_(stack_ids)).
+            where(stack.c.deleted_at < time_line)).fetchall()
+        if not stacks:
+            return counts
+
+        stack_ids = [s.id for s in stacks]
+        template_refs = collections.defaultdict(int)
+        for s in stacks:
+            template_refs[s.raw_template_id] += 1
+
+        rule_ids = sqlalchemy.select([watch_rule.c.id]).\
+            where(watch_rule.c.stack_id.in_(stack_ids))
+        resource_ids = sqlalchemy.select([resource.c.id]).\
+            where(resource.c.stack_id.in_(stack_ids))
+        creds_in_use = sqlalchemy.select([stack.c.user_creds_id]).\
+            where(sqlalchemy.not_(stack.c.id.in_(stack_ids)))
+
+        # Children first, so that foreign key constraints are never violated
+        deletes = [
+            ('watch_data',
+             watch_data.delete().
+             where(watch_data.c.watch_rule_id.in_(rule_ids))),
+            ('watch_data_rollup',
+             watch_data_rollup.delete().
+             where(watch_data_rollup.c.watch_rule_id.in_(rule_ids))),
+            ('watch_rule',
+             watch_rule.delete().where(watch_rule.c.stack_id.in_(stack_ids))),
+            ('resource_data',
+             resource_data.delete().
+             where(resource_data.c.resource_id.in_(resource_ids))),
+            ('resource',
+             resource.delete().where(resource.c.stack_id.in_(stack_ids))),
+            ('event',
+             event.delete().where(event.c.stack_id.in_(stack_ids))),
+            ('stack',
+             stack.delete().where(stack.c.id.in_(stack_ids))),
+            ('user_creds',
+             user_creds.delete().
+             where(user_creds.c.id.in_([s.user_creds_id for s in stacks])).
+             where(sqlalchemy.not_(user_creds.c.id.in_(creds_in_use)))),
+        ]
+
+        for table_name, stmt in deletes:
+            counts[table_name] = conn.execute(stmt).rowcount
+        for template_id, refs in template_refs.items():
+            conn.execute(raw_template.update().
+                         where(raw_template.c.id == template_id).
+                         values(refcount=raw_template.c.refcount - refs))
+    return counts
+
+
+def purge_deleted(age, granularity='days', batch_size=100):
+    """Remove stacks soft-deleted longer ago than age, with all their data.
+
+    Stacks are purged batch_size at a time, each batch in its own short
+    transaction, so that live engines are never blocked for long. Only rows
+    belonging to stacks that were already deleted before the cut-off are
+    touched. Returns a dict of the total number of rows deleted, keyed by
+    table name.
+    """
     try:
         age = int(age)
     except ValueError:
@@ -483,6 +855,13 @@ def purge_deleted(age, granularity='days'):
         raise exception.Error(
             _("granularity should be days, hours, minutes, or seconds"))
 
+    try:
+        batch_size = int(batch_size)
+    except ValueError:
+        raise exception.Error(_("batch_size should be an integer"))
+    if batch_size < 1:
+        raise exception.Error(_("batch_size should be a positive integer"))
+
     if granularity == 'days':
         age = age * 86400
     elif granularity == 'hours':
@@ -495,27 +874,55 @@ def purge_deleted(age, granularity='days'):
     meta = sqlalchemy.MetaData()
     meta.bind = engine
 
-    stack = sqlalchemy.Table('stack', meta, autoload=True)
-    event = sqlalchemy.Table('event', meta, autoload=True)
-    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
-    user_creds = sqlalchemy.Table('user_creds', meta, autoload=True)
-
-    stmt = sqlalchemy.select([stack.c.id,
-                              stack.c.raw_template_id,
-                              stack.c.user_creds_id]).\
-        where(stack.c.deleted_at < time_line)
-    deleted_stacks = engine.execute(stmt)
-
-    for s in deleted_stacks:
-        event_del = event.delete().where(event.c.stack_id == s[0])
-        engine.execute(event_del)
-        stack_del = stack.delete().where(stack.c.id == s[0])
-        engine.execute(stack_del)
-        raw_template_del = raw_template.delete().\
-            where(raw_template.c.id == s[1])
-        engine.execute(raw_template_del)
-        user_creds_del = user_creds.delete().where(user_creds.c.id == s[2])
-        engine.execute(user_creds_del)
+    tables = dict((name, sqlalchemy.Table(name, meta, autoload=True))
+                  for name in ('stack', 'event', 'resource', 'resource_data',
+                               'watch_rule', 'watch_data',
+                               'watch_data_rollup', 'raw_template',
+                               'user_creds'))
+    stack = tables['stack']
+    raw_template = tables['raw_template']
+
+    totals = collections.defaultdict(int)
+
+    stmt = sqlalchemy.select([stack.c.id]).\
+        where(stack.c.deleted_at < time_line).\
+        order_by(stack.c.deleted_at).\
+        limit(batch_size)
+    while True:
+        stacks = engine.execute(stmt).fetchall()
+        if not stacks:
+            break
+        counts = _purge_stacks(engine, tables, [s.id for s in stacks],
+                               time_line)
+        for table_name, count in counts.items():
+            totals[table_name] += count
+        logger.info(_('Purged %(count)d deleted stacks (%(total)d so far)') %
+                    {'count': counts['stack'], 'total': totals['stack']})
+        if len(stacks) < batch_size or not counts['stack']:
+            break
+
+    # Remove templates no longer used by any stack. Recently stored or
+    # reused templates are skipped, as they may be about to be referenced.
+    in_use = sqlalchemy.select([stack.c.raw_template_id])
+    unused = sqlalchemy.and_(
+        raw_template.c.refcount <= 0,
+        sqlalchemy.func.coalesce(raw_template.c.updated_at,
+                                 raw_template.c.created_at) < time_line,
+        sqlalchemy.not_(raw_template.c.id.in_(in_use)))
+    stmt = sqlalchemy.select([raw_template.c.id]).\
+        where(unused).limit(batch_size)
+    while True:
+        template_ids = [t.id for t in engine.execute(stmt).fetchall()]
+        if not template_ids:
+            break
+        result = engine.execute(raw_template.delete().
+                                where(raw_template.c.id.in_(template_ids)).
+                                where(unused))
+        totals['raw_template'] += result.rowcount
+        if len(template_ids) < batch_size:
+            break
+
+    return dict(totals)
 
 
 def db_sync(version=None):
@@ -0,0 +1,72 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import pickle
+
+import sqlalchemy
+from sqlalchemy.dialects import mysql
+
+
+def _text_type(migrate_engine):
+    if migrate_engine.name == 'mysql':
+        return mysql.LONGTEXT()
+    return sqlalchemy.Text()
+
+
+def _convert(migrate_engine, event, src, dest, func):
+    select = sqlalchemy.select([event.c.id, src])
+    for ev_id, value in migrate_engine.execute(select).fetchall():
+        migrate_engine.execute(event.update().
+                               where(event.c.id == ev_id).
+                               values({dest: func(value)}))
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    event = sqlalchemy.Table('event', meta, autoload=True)
+    tmp = sqlalchemy.Column('tmp_properties', _text_type(migrate_engine))
+    tmp.create(event)
+
+    def to_json(pickled):
+        if pickled is None:
+            return json.dumps({})
+        return json.dumps(pickle.loads(str(pickled)))
+
+    _convert(migrate_engine, event, event.c.resource_properties,
+             'tmp_properties', to_json)
+
+    event.c.resource_properties.drop()
+    event.c.tmp_properties.alter(name='resource_properties')
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    event = sqlalchemy.Table('event', meta, autoload=True)
+    tmp = sqlalchemy.Column('tmp_properties', sqlalchemy.PickleType)
+    tmp.create(event)
+
+    # The PickleType column does the serialisation for us
+    def from_json(serialised):
+        if serialised is None:
+            return None
+        return json.loads(serialised)
+
+    _convert(migrate_engine, event, event.c.resource_properties,
+             'tmp_properties', from_json)
+
+    event.c.resource_properties.drop()
+    event.c.tmp_properties.alter(name='resource_properties')
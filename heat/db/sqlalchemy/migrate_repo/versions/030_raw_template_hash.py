@@ -0,0 +1,97 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+
+import sqlalchemy
+
+
+def _template_hash(serialised):
+    # Must match heat.db.sqlalchemy.api._template_hash
+    template = json.loads(serialised)
+    canonical = json.dumps(template, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
+    stack = sqlalchemy.Table('stack', meta, autoload=True)
+
+    sqlalchemy.Column('hash', sqlalchemy.String(64)).create(raw_template)
+    sqlalchemy.Column('refcount', sqlalchemy.Integer,
+                      default=0).create(raw_template)
+
+    # Merge any identical templates into a single row, pointing all of the
+    # stacks which used a duplicate at the surviving copy
+    canonical_ids = {}
+    select = sqlalchemy.select([raw_template.c.id, raw_template.c.template]).\
+        order_by(raw_template.c.id)
+    for tmpl_id, serialised in migrate_engine.execute(select).fetchall():
+        tmpl_hash = _template_hash(serialised)
+        if tmpl_hash not in canonical_ids:
+            canonical_ids[tmpl_hash] = tmpl_id
+            migrate_engine.execute(raw_template.update().
+                                   where(raw_template.c.id == tmpl_id).
+                                   values(hash=tmpl_hash))
+        else:
+            migrate_engine.execute(stack.update().
+                                   where(stack.c.raw_template_id == tmpl_id).
+                                   values(raw_template_id=
+                                          canonical_ids[tmpl_hash]))
+            migrate_engine.execute(raw_template.delete().
+                                   where(raw_template.c.id == tmpl_id))
+
+    refs = sqlalchemy.select([sqlalchemy.func.count(stack.c.id)]).\
+        where(stack.c.raw_template_id == raw_template.c.id).as_scalar()
+    migrate_engine.execute(raw_template.update().values(refcount=refs))
+
+    sqlalchemy.Index('ix_raw_template_hash', raw_template.c.hash,
+                     unique=True).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
+    stack = sqlalchemy.Table('stack', meta, autoload=True)
+
+    sqlalchemy.Index('ix_raw_template_hash',
+                     raw_template.c.hash).drop(migrate_engine)
+
+    # Give every stack its own copy of its template again
+    select = sqlalchemy.select([stack.c.id, raw_template.c.id,
+                                raw_template.c.template]).\
+        where(stack.c.raw_template_id == raw_template.c.id).\
+        order_by(raw_template.c.id)
+    seen = set()
+    rows = migrate_engine.execute(select).fetchall()
+    for stack_id, tmpl_id, serialised in rows:
+        if tmpl_id not in seen:
+            seen.add(tmpl_id)
+            continue
+        result = migrate_engine.execute(raw_template.insert().
+                                        values(template=serialised))
+        migrate_engine.execute(stack.update().
+                               where(stack.c.id == stack_id).
+                               values(raw_template_id=
+                                      result.inserted_primary_key[0]))
+
+    # Reload the table so that the dropped index is no longer associated
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
+    raw_template.c.refcount.drop()
+    raw_template.c.hash.drop()
@@ -0,0 +1,97 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import sqlalchemy
+
+
+def _sample(serialised_rule, serialised_data):
+    '''Return the (value, unit) of the datapoint a rule alarms on.'''
+    try:
+        rule = json.loads(serialised_rule or '{}')
+        data = json.loads(serialised_data or '{}')
+        datapoint = data[rule['MetricName']]
+        return float(datapoint['Value']), datapoint.get('Unit')
+    except (ValueError, TypeError, KeyError):
+        return None, None
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    watch_rule = sqlalchemy.Table('watch_rule', meta, autoload=True)
+    watch_data = sqlalchemy.Table('watch_data', meta, autoload=True)
+
+    sqlalchemy.Column('value', sqlalchemy.Float).create(watch_data)
+    sqlalchemy.Column('unit', sqlalchemy.String(64)).create(watch_data)
+
+    select = sqlalchemy.select([watch_data.c.id, watch_rule.c.rule,
+                                watch_data.c.data]).\
+        where(watch_data.c.watch_rule_id == watch_rule.c.id)
+    for wd_id, rule, data in migrate_engine.execute(select).fetchall():
+        value, unit = _sample(rule, data)
+        if value is not None:
+            migrate_engine.execute(watch_data.update().
+                                   where(watch_data.c.id == wd_id).
+                                   values(value=value, unit=unit))
+
+    sqlalchemy.Index('ix_watch_data_rule_time',
+                     watch_data.c.watch_rule_id,
+                     watch_data.c.created_at).create(migrate_engine)
+
+    watch_data_rollup = sqlalchemy.Table(
+        'watch_data_rollup', meta,
+        sqlalchemy.Column('id',
+                          sqlalchemy.Integer,
+                          primary_key=True,
+                          nullable=False),
+        sqlalchemy.Column('created_at', sqlalchemy.DateTime),
+        sqlalchemy.Column('updated_at', sqlalchemy.DateTime),
+        sqlalchemy.Column('period_start', sqlalchemy.DateTime,
+                          nullable=False),
+        sqlalchemy.Column('minimum', sqlalchemy.Float),
+        sqlalchemy.Column('maximum', sqlalchemy.Float),
+        sqlalchemy.Column('sum', sqlalchemy.Float),
+        sqlalchemy.Column('sample_count', sqlalchemy.Integer),
+        sqlalchemy.Column('unit', sqlalchemy.String(64)),
+        sqlalchemy.Column('watch_rule_id',
+                          sqlalchemy.Integer,
+                          sqlalchemy.ForeignKey('watch_rule.id'),
+                          nullable=False),
+        sqlalchemy.Index('ix_watch_data_rollup_rule_time',
+                         'watch_rule_id', 'period_start'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+    watch_data_rollup.create()
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    watch_data_rollup = sqlalchemy.Table('watch_data_rollup', meta,
+                                         autoload=True)
+    watch_data_rollup.drop()
+
+    watch_data = sqlalchemy.Table('watch_data', meta, autoload=True)
+    sqlalchemy.Index('ix_watch_data_rule_time',
+                     watch_data.c.watch_rule_id,
+                     watch_data.c.created_at).drop(migrate_engine)
+
+    # Reload the table so that the dropped index is no longer associated
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+    watch_data = sqlalchemy.Table('watch_data', meta, autoload=True)
+    watch_data.c.unit.drop()
+    watch_data.c.value.drop()
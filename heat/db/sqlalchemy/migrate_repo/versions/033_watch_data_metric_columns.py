@@ -0,0 +1,74 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import sqlalchemy
+
+
+def _metric(serialised_rule, serialised_data):
+    '''Return the (namespace, metric name) of a stored datapoint.'''
+    try:
+        rule = json.loads(serialised_rule or '{}')
+        data = json.loads(serialised_data or '{}')
+    except ValueError:
+        return None, None
+    if not isinstance(data, dict):
+        return None, None
+    return data.get('Namespace'), rule.get('MetricName')
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    watch_rule = sqlalchemy.Table('watch_rule', meta, autoload=True)
+    watch_data = sqlalchemy.Table('watch_data', meta, autoload=True)
+
+    sqlalchemy.Column('namespace',
+                      sqlalchemy.String(255)).create(watch_data)
+    sqlalchemy.Column('metric_name',
+                      sqlalchemy.String(255)).create(watch_data)
+
+    select = sqlalchemy.select([watch_data.c.id, watch_rule.c.rule,
+                                watch_data.c.data]).\
+        where(watch_data.c.watch_rule_id == watch_rule.c.id)
+    for wd_id, rule, data in migrate_engine.execute(select).fetchall():
+        namespace, metric_name = _metric(rule, data)
+        migrate_engine.execute(watch_data.update().
+                               where(watch_data.c.id == wd_id).
+                               values(namespace=namespace,
+                                      metric_name=metric_name))
+
+    sqlalchemy.Index('ix_watch_data_namespace_metric',
+                     watch_data.c.namespace,
+                     watch_data.c.metric_name).create(migrate_engine)
+    sqlalchemy.Index('ix_watch_data_metric',
+                     watch_data.c.metric_name).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    watch_data = sqlalchemy.Table('watch_data', meta, autoload=True)
+    sqlalchemy.Index('ix_watch_data_metric',
+                     watch_data.c.metric_name).drop(migrate_engine)
+    sqlalchemy.Index('ix_watch_data_namespace_metric',
+                     watch_data.c.namespace,
+                     watch_data.c.metric_name).drop(migrate_engine)
+
+    # Reload the table so that the dropped indexes are no longer associated
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+    watch_data = sqlalchemy.Table('watch_data', meta, autoload=True)
+    watch_data.c.metric_name.drop()
+    watch_data.c.namespace.drop()
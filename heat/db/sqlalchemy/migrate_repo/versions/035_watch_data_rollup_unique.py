@@ -0,0 +1,59 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    watch_data_rollup = sqlalchemy.Table('watch_data_rollup', meta,
+                                         autoload=True)
+
+    # Engines pruning concurrently may have rolled up the same minute more
+    # than once, so keep only the first rollup of each minute
+    first = sqlalchemy.select([watch_data_rollup.c.watch_rule_id,
+                               watch_data_rollup.c.period_start,
+                               sqlalchemy.func.min(watch_data_rollup.c.id)]).\
+        group_by(watch_data_rollup.c.watch_rule_id,
+                 watch_data_rollup.c.period_start).\
+        having(sqlalchemy.func.count(watch_data_rollup.c.id) > 1)
+    for rule_id, period_start, first_id in \
+            migrate_engine.execute(first).fetchall():
+        migrate_engine.execute(watch_data_rollup.delete().where(
+            sqlalchemy.and_(watch_data_rollup.c.watch_rule_id == rule_id,
+                            watch_data_rollup.c.period_start == period_start,
+                            watch_data_rollup.c.id != first_id)))
+
+    sqlalchemy.Index('ix_watch_data_rollup_rule_time',
+                     watch_data_rollup.c.watch_rule_id,
+                     watch_data_rollup.c.period_start).drop(migrate_engine)
+    sqlalchemy.Index('ix_watch_data_rollup_rule_time',
+                     watch_data_rollup.c.watch_rule_id,
+                     watch_data_rollup.c.period_start,
+                     unique=True).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData(bind=migrate_engine)
+
+    watch_data_rollup = sqlalchemy.Table('watch_data_rollup', meta,
+                                         autoload=True)
+    sqlalchemy.Index('ix_watch_data_rollup_rule_time',
+                     watch_data_rollup.c.watch_rule_id,
+                     watch_data_rollup.c.period_start,
+                     unique=True).drop(migrate_engine)
+    sqlalchemy.Index('ix_watch_data_rollup_rule_time',
+                     watch_data_rollup.c.watch_rule_id,
+                     watch_data_rollup.c.period_start).create(migrate_engine)
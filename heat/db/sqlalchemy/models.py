@@ -18,7 +18,7 @@ SQLAlchemy models for heat data.
 import sqlalchemy
 
 from sqlalchemy.dialects import mysql
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship, backref, deferred
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import types
 from json import dumps
@@ -46,6 +46,8 @@ class Json(types.TypeDecorator):
         return dumps(value)
 
     def process_result_value(self, value, dialect):
+        if value is None:
+            return None
         return loads(value)
 
 # TODO(leizhang) When we removed sqlalchemy 0.7 dependence
@@ -112,7 +114,11 @@ class RawTemplate(BASE, HeatBase):
 
     __tablename__ = 'raw_template'
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
-    template = sqlalchemy.Column(Json)
+    # The template body is only fetched when accessed, so that it can be
+    # looked up in a cache keyed on the content hash instead
+    template = deferred(sqlalchemy.Column(Json))
+    hash = sqlalchemy.Column(sqlalchemy.String(64), unique=True)
+    refcount = sqlalchemy.Column(sqlalchemy.Integer, default=0)
 
 
 class Stack(BASE, HeatBase, SoftDelete):
@@ -141,6 +147,7 @@ class Stack(BASE, HeatBase, SoftDelete):
     owner_id = sqlalchemy.Column(sqlalchemy.String(36), nullable=True)
     timeout = sqlalchemy.Column(sqlalchemy.Integer)
     disable_rollback = sqlalchemy.Column(sqlalchemy.Boolean, nullable=False)
+    outputs = sqlalchemy.Column('outputs', Json)
 
 
 class UserCreds(BASE, HeatBase):
@@ -179,7 +186,7 @@ class Event(BASE, HeatBase):
     physical_resource_id = sqlalchemy.Column(sqlalchemy.String(255))
     resource_status_reason = sqlalchemy.Column(sqlalchemy.String(255))
     resource_type = sqlalchemy.Column(sqlalchemy.String(255))
-    resource_properties = sqlalchemy.Column(sqlalchemy.PickleType)
+    resource_properties = sqlalchemy.Column(Json)
 
 
 class ResourceData(BASE, HeatBase):
@@ -248,11 +255,48 @@ class WatchData(BASE, HeatBase):
 
     __tablename__ = 'watch_data'
 
+    __table_args__ = (
+        sqlalchemy.Index('ix_watch_data_rule_time',
+                         'watch_rule_id', 'created_at'),
+        sqlalchemy.Index('ix_watch_data_namespace_metric',
+                         'namespace', 'metric_name'),
+        sqlalchemy.Index('ix_watch_data_metric', 'metric_name'),
+        {'mysql_engine': 'InnoDB'})
+
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
     data = sqlalchemy.Column('data', Json)
+    value = sqlalchemy.Column(sqlalchemy.Float)
+    unit = sqlalchemy.Column(sqlalchemy.String(64))
+    namespace = sqlalchemy.Column(sqlalchemy.String(255))
+    metric_name = sqlalchemy.Column(sqlalchemy.String(255))
 
     watch_rule_id = sqlalchemy.Column(
         sqlalchemy.Integer,
         sqlalchemy.ForeignKey('watch_rule.id'),
         nullable=False)
     watch_rule = relationship(WatchRule, backref=backref('watch_data'))
+
+
+class WatchDataRollup(BASE, HeatBase):
+    """Represents the aggregate of one minute of expired watch_data."""
+
+    __tablename__ = 'watch_data_rollup'
+    __table_args__ = (
+        sqlalchemy.Index('ix_watch_data_rollup_rule_time',
+                         'watch_rule_id', 'period_start', unique=True),
+        {'mysql_engine': 'InnoDB'})
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    period_start = sqlalchemy.Column(sqlalchemy.DateTime, nullable=False)
+    minimum = sqlalchemy.Column(sqlalchemy.Float)
+    maximum = sqlalchemy.Column(sqlalchemy.Float)
+    sum = sqlalchemy.Column(sqlalchemy.Float)
+    sample_count = sqlalchemy.Column(sqlalchemy.Integer)
+    unit = sqlalchemy.Column(sqlalchemy.String(64))
+    sketch = sqlalchemy.Column(Json)
+
+    watch_rule_id = sqlalchemy.Column(
+        sqlalchemy.Integer,
+        sqlalchemy.ForeignKey('watch_rule.id'),
+        nullable=False)
+    watch_rule = relationship(WatchRule, backref=backref('watch_data_rollup'))
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from heat.common import identifier
 from heat.rpc import api
 from heat.openstack.common import timeutils
 from heat.engine import template
@@ -122,18 +123,29 @@ def format_stack_resource(resource, detail=True):
 
 
 def format_event(event):
-    stack_identifier = event.stack.identifier()
+    '''
+    Return a representation of the given event database row that matches the
+    API output expectations. Only the event row and its (joined) stack row
+    are used, so no Stack or Template needs to be loaded.
+    '''
+    stack_identifier = identifier.HeatIdentifier(event.stack.tenant,
+                                                 event.stack.name,
+                                                 event.stack.id)
+    res_identifier = identifier.ResourceIdentifier(
+        resource_name=event.resource_name, **stack_identifier)
+    event_identifier = identifier.EventIdentifier(event_id=str(event.id),
+                                                  **res_identifier)
 
     result = {
-        api.EVENT_ID: dict(event.identifier()),
+        api.EVENT_ID: dict(event_identifier),
         api.EVENT_STACK_ID: dict(stack_identifier),
         api.EVENT_STACK_NAME: stack_identifier.stack_name,
-        api.EVENT_TIMESTAMP: timeutils.isotime(event.timestamp),
+        api.EVENT_TIMESTAMP: timeutils.isotime(event.created_at),
         api.EVENT_RES_NAME: event.resource_name,
         api.EVENT_RES_PHYSICAL_ID: event.physical_resource_id,
-        api.EVENT_RES_ACTION: event.action,
-        api.EVENT_RES_STATUS: event.status,
-        api.EVENT_RES_STATUS_DATA: event.reason,
+        api.EVENT_RES_ACTION: event.resource_action,
+        api.EVENT_RES_STATUS: event.resource_status,
+        api.EVENT_RES_STATUS_DATA: event.resource_status_reason,
         api.EVENT_RES_TYPE: event.resource_type,
         api.EVENT_RES_PROPERTIES: event.resource_properties,
     }
@@ -142,6 +154,7 @@ def format_event(event):
 
 
 def format_watch(watch):
+    # watch may be either a WatchRule or a row from the watch_rule table
 
     result = {
         api.WATCH_ACTIONS_ENABLED: watch.rule.get(api.RULE_ACTIONS_ENABLED),
@@ -168,7 +181,8 @@ def format_watch(watch):
         api.WATCH_STATISTIC: watch.rule.get(api.RULE_STATISTIC),
         api.WATCH_THRESHOLD: watch.rule.get(api.RULE_THRESHOLD),
         api.WATCH_UNIT: watch.rule.get(api.RULE_UNIT),
-        api.WATCH_STACK_ID: watch.stack_id
+        api.WATCH_STACK_ID: watch.stack_id,
+        api.WATCH_ID: watch.id
     }
 
     return result
@@ -177,17 +191,21 @@ def format_watch(watch):
 def format_watch_data(wd):
 
     # Demangle DB format data into something more easily used in the API
-    # We are expecting a dict with exactly two items, Namespace and
-    # a metric key
+    # Data stored before the metric was recorded separately is expected to
+    # be a dict with exactly two items, Namespace and a metric key
     namespace = wd.data['Namespace']
-    metric = [(k, v) for k, v in wd.data.items() if k != 'Namespace']
-    if len(metric) == 1:
-        metric_name, metric_data = metric[0]
+    if wd.metric_name is not None and wd.metric_name in wd.data:
+        metric_name, metric_data = wd.metric_name, wd.data[wd.metric_name]
     else:
-        logger.error("Unexpected number of keys in watch_data.data!")
-        return
+        metric = [(k, v) for k, v in wd.data.items() if k != 'Namespace']
+        if len(metric) == 1:
+            metric_name, metric_data = metric[0]
+        else:
+            logger.error("Unexpected number of keys in watch_data.data!")
+            return
 
     result = {
+        api.WATCH_DATA_ID: wd.id,
         api.WATCH_DATA_ALARM: wd.watch_rule.name,
         api.WATCH_DATA_METRIC: metric_name,
         api.WATCH_DATA_TIME: timeutils.isotime(wd.created_at),
@@ -15,6 +15,8 @@
 
 from oslo.config import cfg
 
+from heat.common import cache
+from heat.engine import ratelimit
 from heat.openstack.common import importutils
 from heat.openstack.common import log as logging
 
@@ -55,6 +57,37 @@ cloud_opts = [
 ]
 cfg.CONF.register_opts(cloud_opts)
 
+CLIENT_CACHE_SIZE = 100
+
+_clients = None
+_nova_extensions = None
+
+
+def client_cache():
+    '''
+    Return the cache of clients shared by all stacks in this engine.
+
+    Clients are keyed by the token they were created with, so they are only
+    ever shared with stacks which could have created an identical client.
+    Each keeps its own pool of connections alive between requests.
+    '''
+    global _clients
+    if _clients is None:
+        _clients = cache.LRUCache(CLIENT_CACHE_SIZE)
+    return _clients
+
+
+def nova_extensions():
+    '''
+    Return the novaclient extensions installed, which need only be
+    discovered once by each process.
+    '''
+    global _nova_extensions
+    if _nova_extensions is None:
+        computeshell = novashell.OpenStackComputeShell()
+        _nova_extensions = computeshell._discover_extensions("1.1")
+    return _nova_extensions
+
 
 class OpenStackClients(object):
     '''
@@ -85,6 +118,19 @@ class OpenStackClients(object):
     def url_for(self, **kwargs):
         return self.keystone().url_for(**kwargs)
 
+    def _shared_client(self, key, create):
+        '''
+        Return a client from the engine-wide cache, calling create() to
+        make one for the current token if none is cached.
+        '''
+        key = key + (self.context.auth_url, self.context.tenant,
+                     self.auth_token)
+        client = client_cache().get(key)
+        if client is None:
+            client = create()
+            client_cache().set(key, client)
+        return client
+
     def nova(self, service_type='compute'):
         if service_type in self._nova:
             return self._nova[service_type]
@@ -94,26 +140,29 @@ class OpenStackClients(object):
             logger.error("Nova connection failed, no auth_token!")
             return None
 
-        computeshell = novashell.OpenStackComputeShell()
-        extensions = computeshell._discover_extensions("1.1")
-
-        args = {
-            'project_id': con.tenant,
-            'auth_url': con.auth_url,
-            'service_type': service_type,
-            'username': None,
-            'api_key': None,
-            'extensions': extensions
-        }
-
-        client = novaclient.Client(1.1, **args)
-
-        management_url = self.url_for(service_type=service_type)
-        client.client.auth_token = self.auth_token
-        client.client.management_url = management_url
-
-        self._nova[service_type] = client
-        return client
+        def create():
+            args = {
+                'project_id': con.tenant,
+                'auth_url': con.auth_url,
+                'service_type': service_type,
+                'username': None,
+                'api_key': None,
+                'extensions': nova_extensions()
+            }
+
+            client = novaclient.Client(1.1, **args)
+
+            management_url = self.url_for(service_type=service_type)
+            client.client.auth_token = self.auth_token
+            client.client.management_url = management_url
+            client.client.request = ratelimit.limited(service_type,
+                                                      con.tenant_id,
+                                                      client.client.request)
+            return client
+
+        self._nova[service_type] = self._shared_client(('nova', service_type),
+                                                       create)
+        return self._nova[service_type]
 
     def swift(self):
         if swiftclient is None:
@@ -126,16 +175,19 @@ class OpenStackClients(object):
             logger.error("Swift connection failed, no auth_token!")
             return None
 
-        args = {
-            'auth_version': '2.0',
-            'tenant_name': con.tenant,
-            'user': con.username,
-            'key': None,
-            'authurl': None,
-            'preauthtoken': self.auth_token,
-            'preauthurl': self.url_for(service_type='object-store')
-        }
-        self._swift = swiftclient.Connection(**args)
+        def create():
+            args = {
+                'auth_version': '2.0',
+                'tenant_name': con.tenant,
+                'user': con.username,
+                'key': None,
+                'authurl': None,
+                'preauthtoken': self.auth_token,
+                'preauthurl': self.url_for(service_type='object-store')
+            }
+            return swiftclient.Connection(**args)
+
+        self._swift = self._shared_client(('swift', con.username), create)
         return self._swift
 
     def neutron(self):
@@ -149,15 +201,20 @@ class OpenStackClients(object):
             logger.error("Neutron connection failed, no auth_token!")
             return None
 
-        args = {
-            'auth_url': con.auth_url,
-            'service_type': 'network',
-            'token': self.auth_token,
-            'endpoint_url': self.url_for(service_type='network')
-        }
-
-        self._neutron = neutronclient.Client(**args)
-
+        def create():
+            args = {
+                'auth_url': con.auth_url,
+                'service_type': 'network',
+                'token': self.auth_token,
+                'endpoint_url': self.url_for(service_type='network')
+            }
+            client = neutronclient.Client(**args)
+            client.do_request = ratelimit.limited('network', con.tenant_id,
+                                                  client.do_request,
+                                                  method_arg=0)
+            return client
+
+        self._neutron = self._shared_client(('neutron',), create)
         return self._neutron
 
     def cinder(self):
@@ -171,19 +228,25 @@ class OpenStackClients(object):
             logger.error("Cinder connection failed, no auth_token!")
             return None
 
-        args = {
-            'service_type': 'volume',
-            'auth_url': con.auth_url,
-            'project_id': con.tenant,
-            'username': None,
-            'api_key': None
-        }
-
-        self._cinder = cinderclient.Client('1', **args)
-        management_url = self.url_for(service_type='volume')
-        self._cinder.client.auth_token = self.auth_token
-        self._cinder.client.management_url = management_url
-
+        def create():
+            args = {
+                'service_type': 'volume',
+                'auth_url': con.auth_url,
+                'project_id': con.tenant,
+                'username': None,
+                'api_key': None
+            }
+
+            client = cinderclient.Client('1', **args)
+            management_url = self.url_for(service_type='volume')
+            client.client.auth_token = self.auth_token
+            client.client.management_url = management_url
+            client.client.request = ratelimit.limited('volume',
+                                                      con.tenant_id,
+                                                      client.client.request)
+            return client
+
+        self._cinder = self._shared_client(('cinder',), create)
         return self._cinder
 
     def ceilometer(self):
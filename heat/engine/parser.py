@@ -93,6 +93,7 @@ class Stack(collections.Mapping):
         self.parent_resource = parent_resource
         self._resources = None
         self._dependencies = None
+        self.stored_outputs = None
 
         resources.initialise()
 
@@ -186,10 +187,12 @@ class Stack(collections.Mapping):
 
         template = Template.load(context, stack.raw_template_id)
         env = environment.Environment(stack.parameters)
+        outputs = stack.outputs
         stack = cls(context, stack.name, template, env,
                     stack.id, stack.action, stack.status, stack.status_reason,
                     stack.timeout, resolve_data, stack.disable_rollback,
                     parent_resource, owner_id=stack.owner_id)
+        stack.stored_outputs = outputs
 
         return stack
 
@@ -341,13 +344,23 @@ class Stack(collections.Mapping):
         self.status = status
         self.status_reason = reason
 
+        values = {'action': action,
+                  'status': status,
+                  'status_reason': reason}
+
+        # Any change to the resources invalidates the stored outputs, which
+        # are stored again once the stack is complete
+        if action in (self.CREATE, self.UPDATE, self.ROLLBACK, self.DELETE):
+            self.stored_outputs = None
+            values['outputs'] = None
+            if self.parent_resource is not None:
+                self.parent_resource.stack.invalidate_outputs()
+
         if self.id is None:
             return
 
         stack = db_api.stack_get(self.context, self.id)
-        stack.update_and_save({'action': action,
-                               'status': status,
-                               'status_reason': reason})
+        stack.update_and_save(values)
 
     @property
     def state(self):
@@ -414,6 +427,9 @@ class Stack(collections.Mapping):
 
         self.state_set(action, stack_status, reason)
 
+        if action == self.CREATE and stack_status == self.COMPLETE:
+            self.store_outputs()
+
         if callable(post_func):
             post_func()
 
@@ -524,6 +540,9 @@ class Stack(collections.Mapping):
         self.outputs = self.resolve_static_data(template_outputs)
         self.store()
 
+        if stack_status == self.COMPLETE:
+            self.store_outputs()
+
     def delete(self, action=DELETE):
         '''
         Delete all of the resources, and then the stack itself.
@@ -606,11 +625,56 @@ class Stack(collections.Mapping):
 
     def output(self, key):
         '''
-        Get the value of the specified stack output.
+        Get the value of the specified stack output, from the values stored
+        when the stack was last completed if possible.
         '''
+        if self.stored_outputs is not None and key in self.stored_outputs:
+            return self.stored_outputs[key]
+        return self._resolve_output(key)
+
+    def _resolve_output(self, key):
         value = self.outputs[key].get('Value', '')
         return self.resolve_runtime_data(value)
 
+    def store_outputs(self):
+        '''
+        Resolve the values of all of the stack outputs and store them in the
+        database, so that they need not be resolved again each time the stack
+        is shown. Outputs which cannot be resolved are not stored, and so are
+        resolved again when next requested.
+        '''
+        values = {}
+        for key in self.outputs:
+            try:
+                values[key] = self._resolve_output(key)
+            except Exception as ex:
+                logger.warning(_('Failed to resolve output %(key)s of stack '
+                                 '%(stack)s: %(err)s') %
+                               {'key': key, 'stack': self.name,
+                                'err': str(ex)})
+        self.stored_outputs = values
+
+        if self.id is None:
+            return
+
+        stack = db_api.stack_get(self.context, self.id)
+        stack.update_and_save({'outputs': values})
+
+    def invalidate_outputs(self):
+        '''
+        Discard the stored output values, because a resource or nested stack
+        may have changed without the stack itself being updated, along with
+        those of any stack in which this one is nested.
+        '''
+        if self.stored_outputs is not None:
+            self.stored_outputs = None
+            if self.id is not None:
+                stack = db_api.stack_get(self.context, self.id)
+                stack.update_and_save({'outputs': None})
+
+        if self.parent_resource is not None:
+            self.parent_resource.stack.invalidate_outputs()
+
     def restart_resource(self, resource_name):
         '''
         stop resource_name and all that depend on it
@@ -0,0 +1,161 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+'''
+Rate limiting and retrying of requests to OpenStack APIs, shared by all of
+the stacks in an engine.
+'''
+
+import functools
+import random
+from time import time as wallclock
+
+import eventlet
+from oslo.config import cfg
+
+from heat.engine import scheduler
+from heat.openstack.common import log as logging
+
+logger = logging.getLogger(__name__)
+
+cfg.CONF.import_opt('api_rate_limit', 'heat.common.config')
+cfg.CONF.import_opt('api_rate_burst', 'heat.common.config')
+cfg.CONF.import_opt('api_retry_limit', 'heat.common.config')
+cfg.CONF.import_opt('api_retry_backoff', 'heat.common.config')
+cfg.CONF.import_opt('api_retry_max_backoff', 'heat.common.config')
+
+# HTTP status codes with which a service rejects a request without acting on
+# it, so that the same request may safely be sent again later
+RETRY_STATUSES = (413, 429, 503)
+
+# HTTP methods which are not idempotent, so are only retried when the service
+# has explicitly rejected the request as over its rate limits
+UNSAFE_METHODS = ('POST',)
+
+
+def sleep(wait_time):
+    '''Yield to other greenthreads for wait_time seconds.'''
+    if scheduler.ENABLE_SLEEP and wait_time > 0:
+        eventlet.sleep(wait_time)
+
+
+class TokenBucket(object):
+    '''
+    A token bucket, which allows requests at an average of rate per second
+    with bursts of up to burst requests at once.
+
+    Each request takes a token immediately, even if it must then wait for
+    it to be replenished, so that concurrent callers are served in the order
+    in which they arrive.
+    '''
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.tokens = self.burst
+        self.updated = wallclock()
+
+    def reserve(self):
+        '''Take a token and return the number of seconds to wait for it.'''
+        now = wallclock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+
+_buckets = {}
+
+
+def bucket(service, tenant):
+    '''
+    Return the token bucket shared by all requests to a service on behalf of
+    a tenant, or None if requests are not rate limited.
+    '''
+    if cfg.CONF.api_rate_limit <= 0:
+        return None
+    key = (service, tenant)
+    if key not in _buckets:
+        _buckets[key] = TokenBucket(cfg.CONF.api_rate_limit,
+                                    cfg.CONF.api_rate_burst)
+    return _buckets[key]
+
+
+def backoff(attempt):
+    '''
+    Return the number of seconds to wait before the given retry attempt,
+    chosen at random up to an exponentially increasing limit so that
+    callers rejected at the same time do not all retry at the same time.
+    '''
+    limit = min(cfg.CONF.api_retry_max_backoff,
+                cfg.CONF.api_retry_backoff * 2 ** attempt)
+    return random.uniform(0, limit)
+
+
+def _http_status(ex):
+    return getattr(ex, 'code', None) or getattr(ex, 'status_code', None)
+
+
+def _retryable(method, ex):
+    '''
+    Return whether a request rejected with the given exception may be sent
+    again. A POST is only retried when it was rejected as too many requests
+    (429), or as over limit (413) with a Retry-After, since a service may
+    have acted on a POST that it rejected for any other reason.
+    '''
+    status = _http_status(ex)
+    if status not in RETRY_STATUSES:
+        return False
+    if method not in UNSAFE_METHODS:
+        return True
+    return status == 429 or (status == 413 and
+                             bool(getattr(ex, 'retry_after', None)))
+
+
+def limited(service, tenant, request, method_arg=1):
+    '''
+    Wrap a client's request function so that requests are rate limited and
+    are retried after a backoff when the service rejects them as over its
+    limits or temporarily unavailable. method_arg is the position of the
+    HTTP method in the request function's arguments.
+    '''
+    @functools.wraps(request)
+    def limited_request(*args, **kwargs):
+        if len(args) > method_arg:
+            method = args[method_arg]
+        else:
+            method = kwargs.get('method')
+        attempt = 0
+        while True:
+            limiter = bucket(service, tenant)
+            if limiter is not None:
+                sleep(limiter.reserve())
+            try:
+                return request(*args, **kwargs)
+            except Exception as ex:
+                status = _http_status(ex)
+                if (not _retryable(method, ex) or
+                        attempt >= cfg.CONF.api_retry_limit):
+                    raise
+                wait_time = max(backoff(attempt),
+                                getattr(ex, 'retry_after', None) or 0)
+                logger.info('%s request rejected with status %s, retrying '
+                            'in %.1fs' % (service, status, wait_time))
+                sleep(wait_time)
+                attempt += 1
+
+    return limited_request
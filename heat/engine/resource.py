@@ -15,6 +15,10 @@
 
 import base64
 from datetime import datetime
+import json
+from time import time as wallclock
+
+from oslo.config import cfg
 
 from heat.engine import event
 from heat.common import exception
@@ -34,6 +38,8 @@ from heat.openstack.common.gettextutils import _
 
 logger = logging.getLogger(__name__)
 
+cfg.CONF.import_opt('attribute_cache_ttl', 'heat.common.config')
+
 
 def get_types():
     '''Return an iterator over the list of valid resource types.'''
@@ -120,6 +126,11 @@ class Resource(object):
     # throughout its lifecycle
     requires_deferred_auth = False
 
+    # Resource implementations set this to True if their attributes are
+    # fetched from a remote API, so that the values may be cached for up to
+    # attribute_cache_ttl seconds while the resource's state is unchanged
+    cache_attributes = False
+
     def __new__(cls, name, json, stack):
         '''Create a new Resource of the appropriate class for its type.'''
 
@@ -147,7 +158,8 @@ class Resource(object):
                                      self.name)
         self.attributes = Attributes(self.name,
                                      self.attributes_schema,
-                                     self._resolve_attribute)
+                                     self._resolve_attribute_cached)
+        self._attribute_cache = None
 
         resource = db_api.resource_get_by_name_and_stack(self.context,
                                                          name, stack.id)
@@ -655,6 +667,50 @@ class Resource(object):
         # By default, no attributes resolve
         pass
 
+    def _resolve_attribute_cached(self, name):
+        """
+        Resolve an attribute, reusing the value stored by an earlier
+        resolution if it has not yet expired.
+
+        Values are stored in the resource's data, so that they are shared
+        by every load of the stack, and are discarded whenever the
+        resource's state changes.
+        """
+        ttl = cfg.CONF.attribute_cache_ttl
+        if (not self.cache_attributes or ttl <= 0 or self.id is None or
+                self.status != self.COMPLETE):
+            return self._resolve_attribute(name)
+
+        if self._attribute_cache is None:
+            try:
+                self._attribute_cache = json.loads(
+                    db_api.resource_data_get(self, 'attribute_cache'))
+            except exception.NotFound:
+                self._attribute_cache = {}
+
+        now = wallclock()
+        if name in self._attribute_cache:
+            expires, value = self._attribute_cache[name]
+            if expires > now:
+                return value
+
+        value = self._resolve_attribute(name)
+        if value is not None:
+            self._attribute_cache[name] = (now + ttl, value)
+            db_api.resource_data_set(self, 'attribute_cache',
+                                     json.dumps(self._attribute_cache))
+        return value
+
+    def _clear_attribute_cache(self):
+        if not self.cache_attributes:
+            return
+        self._attribute_cache = None
+        if self.id is not None:
+            try:
+                db_api.resource_data_delete(self, 'attribute_cache')
+            except exception.NotFound:
+                pass
+
     def state_reset(self):
         """
         Reset state to (INIT, COMPLETE)
@@ -671,7 +727,9 @@ class Resource(object):
 
         old_state = (self.action, self.status)
         new_state = (action, status)
+        self._clear_attribute_cache()
         self._store_or_update(action, status, reason)
+        self.stack.invalidate_outputs()
 
         if new_state != old_state:
             self._add_event(action, status, reason)
@@ -13,14 +13,24 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import copy
+import hashlib
+import json
 
+import eventlet
+from eventlet import event
+from oslo.config import cfg
+
+from heat.engine import dependencies
+from heat.engine import parser
 from heat.engine import resource
 from heat.engine import signal_responder
 
 from heat.common import short_id
 from heat.common import exception
 from heat.common import timeutils as iso8601utils
+from heat.openstack.common import excutils
 from heat.openstack.common import log as logging
 from heat.openstack.common import timeutils
 from heat.engine.properties import Properties
@@ -30,6 +40,23 @@ from heat.engine import stack_resource
 
 logger = logging.getLogger(__name__)
 
+# The latest batch of adjustments to each AutoScalingGroup in this engine,
+# by (stack ID, group name)
+_pending_adjustments = {}
+
+
+class AdjustmentBatch(object):
+    '''
+    The adjustments to a scaling group queued within one signal window, and
+    the outcome of applying them, for which every signaller waits.
+    '''
+
+    def __init__(self, previous=None):
+        self.adjustments = []
+        self.open = True
+        self.previous = previous
+        self.done = event.Event()
+
 
 class CooldownMixin(object):
     '''
@@ -61,6 +88,81 @@ class CooldownMixin(object):
         self.metadata = metadata
 
 
+def member_hash(definition):
+    '''
+    Return a digest of an instance definition, so that members of a group
+    can be compared with the launch configuration without comparing their
+    whole templates.
+    '''
+    return hashlib.sha1(json.dumps(definition, sort_keys=True)).hexdigest()
+
+
+class RollingUpdate(object):
+    '''
+    A task which updates the members of a group a few at a time.
+
+    Rather than waiting for a whole batch of members to finish before
+    starting the next batch, another member is started as soon as one of the
+    max_in_flight slots is free. After its member completes, a slot is held
+    for pause_time seconds to give the new member a chance to settle.
+
+    If given, out_of_service is called with the set of member names which
+    are being updated or are waiting for a slot's pause to end whenever a
+    slot is freed, so that the members are only taken out of service (e.g.
+    by reloading a load balancer) as often as slots are freed rather than
+    every time an update starts or finishes.
+    '''
+
+    def __init__(self, members, update, max_in_flight, pause_time=0,
+                 out_of_service=None):
+        self.members = list(members)
+        self.update = update
+        self.max_in_flight = max(max_in_flight, 1)
+        self.pause_time = pause_time
+        self.out_of_service = out_of_service
+
+    def __repr__(self):
+        return '%s(%d members)' % (type(self).__name__, len(self.members))
+
+    def __call__(self):
+        """Return a co-routine which updates all of the members."""
+        pending = collections.deque(self.members)
+        running = {}
+        waiting = []
+        freed = [scheduler.wallclock()] * self.max_in_flight
+        try:
+            while pending or running or waiting:
+                if freed:
+                    # Assign the next members to the freed slots, to start
+                    # when each slot's pause has ended
+                    while pending and freed:
+                        waiting.append((freed.pop(), pending.popleft()))
+                    freed = []
+                    if self.out_of_service is not None:
+                        self.out_of_service(set(running).union(
+                            name for start, name in waiting))
+
+                now = scheduler.wallclock()
+                for start, name in waiting:
+                    if start <= now:
+                        running[name] = scheduler.TaskRunner(self.update,
+                                                             name)
+                        running[name].start()
+                waiting = [(start, name) for start, name in waiting
+                           if name not in running]
+
+                yield
+
+                for name, runner in running.items():
+                    if runner.step():
+                        del running[name]
+                        freed.append(scheduler.wallclock() + self.pause_time)
+        except:
+            with excutils.save_and_reraise_exception():
+                for runner in running.itervalues():
+                    runner.cancel()
+
+
 class InstanceGroup(stack_resource.StackResource):
     tags_schema = {'Key': {'Type': 'String',
                            'Required': True},
@@ -229,52 +331,35 @@ class InstanceGroup(stack_resource.StackResource):
         # resolve references within the context of this stack.
         return self.stack.resolve_runtime_data(instance_definition)
 
-    def _create_template(self, num_instances, num_replace=0):
+    def _create_template(self, num_instances):
         """
         Create the template for the nested stack of existing and new instances
 
-        For rolling update, if launch configuration is different, the
-        instance definition should come from the existing instance instead
-        of using the new launch configuration.
+        Existing instances keep their own definitions, even if the launch
+        configuration has since changed; they are brought up to date by a
+        rolling update instead.
         """
         instances = self.get_instances()[-num_instances:]
         instance_definition = self._get_instance_definition()
-        num_create = num_instances - len(instances)
-        num_replace -= num_create
 
-        def instance_templates(num_replace):
+        def instance_templates():
             for i in range(num_instances):
                 if i < len(instances):
-                    inst = instances[i]
-                    if inst.t != instance_definition and num_replace > 0:
-                        num_replace -= 1
-                        yield inst.name, instance_definition
-                    else:
-                        yield inst.name, inst.t
+                    yield instances[i].name, instances[i].t
                 else:
                     yield short_id.generate_id(), instance_definition
 
-        return {"Resources": dict(instance_templates(num_replace))}
+        return {"Resources": dict(instance_templates())}
 
     def _replace(self, min_in_service, batch_size, pause_time):
         """
         Replace the instances in the group using updated launch configuration
-        """
-        def changing_instances(tmpl):
-            instances = self.get_instances()
-            current = set((i.name, str(i.t)) for i in instances)
-            updated = set((k, str(v)) for k, v in tmpl['Resources'].items())
-            # includes instances to be updated and deleted
-            affected = set(k for k, v in current ^ updated)
-            return set(i.FnGetRefId() for i in instances if i.name in affected)
-
-        def pause_between_batch():
-            while True:
-                try:
-                    yield
-                except scheduler.Timeout:
-                    return
 
+        Only instances whose definition differs from the launch configuration
+        are updated, at most batch_size at a time, and each is started as
+        soon as min_in_service allows rather than when the previous batch has
+        finished.
+        """
         capacity = len(self.nested()) if self.nested() else 0
         efft_bat_sz = min(batch_size, capacity)
         efft_min_sz = min(min_in_service, capacity)
@@ -285,44 +370,204 @@ class InstanceGroup(stack_resource.StackResource):
             raise ValueError('The current UpdatePolicy will result '
                              'in stack update timeout.')
 
-        # effective capacity includes temporary capacity added to accomodate
-        # the minimum number of instances in service during update
-        efft_capacity = max(capacity - efft_bat_sz, efft_min_sz) + efft_bat_sz
+        definition = self._get_instance_definition()
+        definition_hash = member_hash(definition)
+        stale = [i for i in self.get_instances()
+                 if member_hash(i.t) != definition_hash]
+        if not stale:
+            return
+
+        # temporary capacity is added to accomodate the minimum number of
+        # instances in service during update, and then removed by retiring
+        # the oldest out of date instances instead of updating them
+        extra = min(max(efft_min_sz - (capacity - efft_bat_sz), 0),
+                    len(stale))
+        retired, updated = stale[:extra], stale[extra:]
+        max_in_flight = min(efft_bat_sz, capacity + extra - efft_min_sz)
 
         try:
-            remainder = capacity
-            while remainder > 0 or efft_capacity > capacity:
-                if capacity - remainder >= efft_min_sz:
-                    efft_capacity = capacity
-                template = self._create_template(efft_capacity, efft_bat_sz)
-                self._lb_reload(exclude=changing_instances(template))
-                updater = self.update_with_template(template, {})
-                updater.run_to_completion()
-                self.check_update_complete(updater)
-                remainder -= efft_bat_sz
-                if remainder > 0 and pause_sec > 0:
-                    self._lb_reload()
-                    waiter = scheduler.TaskRunner(pause_between_batch)
-                    waiter(timeout=pause_sec)
+            if extra:
+                self._resize_members(capacity + extra)
+            self._update_members([i.name for i in updated], definition,
+                                 max_in_flight, pause_sec)
+            if extra:
+                self._resize_members(capacity,
+                                     retire=[i.name for i in retired])
         finally:
             self._lb_reload()
 
+    @scheduler.wrappertask
+    def _update_member(self, definition, staging, name):
+        """
+        Update a single instance to a new definition, in place if possible
+        and otherwise by replacing it with a new instance of the same name.
+
+        Replacements are initialised in the unstored staging stack, so that
+        they are not confused with the instances they replace.
+        """
+        nested = self.nested()
+        member = nested[name]
+        try:
+            yield member.update(nested.resolve_runtime_data(definition))
+        except resource.UpdateReplace:
+            pass
+        else:
+            return
+
+        yield member.destroy()
+        replacement = resource.Resource(name, definition, staging)
+        nested[name] = replacement
+        nested.reset_dependencies()
+        yield replacement.create()
+
+    def _update_members(self, names, definition, max_in_flight, pause_sec):
+        """
+        Update the named instances to a new definition in a rolling update,
+        keeping those being updated out of the load balancer.
+        """
+        nested = self.nested()
+
+        # Validate the new definition once, rather than for every instance
+        staging = parser.Stack(self.context, self.physical_resource_name(),
+                               parser.Template({'Resources': {
+                                   short_id.generate_id(): definition}}),
+                               parent_resource=self,
+                               owner_id=self.stack.id)
+        staging.validate()
+
+        def update(name):
+            return self._update_member(definition, staging, name)
+
+        def out_of_service(updating):
+            self._lb_reload(exclude=[nested[n].FnGetRefId()
+                                     for n in updating])
+
+        updater = RollingUpdate(names, update, max_in_flight, pause_sec,
+                                out_of_service)
+
+        nested.state_set(nested.UPDATE, nested.IN_PROGRESS,
+                         'Stack UPDATE started')
+        try:
+            scheduler.TaskRunner(updater)(timeout=nested.timeout_secs())
+        except exception.ResourceFailure as ex:
+            status, reason = nested.FAILED, str(ex)
+        except scheduler.Timeout:
+            status, reason = nested.FAILED, 'Timed out'
+        else:
+            status, reason = nested.COMPLETE, 'Stack successfully updated'
+
+        definition_hash = member_hash(definition)
+        resources = dict(nested.t['Resources'])
+        resources.update((n, definition) for n in names
+                         if member_hash(nested[n].t) == definition_hash)
+
+        nested.t = parser.Template(dict(nested.t.t, Resources=resources))
+        nested.state_set(nested.UPDATE, status, reason)
+        nested.store()
+
+        if status != nested.COMPLETE:
+            raise exception.Error("Nested stack update failed: %s" % reason)
+
     def resize(self, new_capacity):
         """
         Resize the instance group to the new capacity.
 
         When shrinking, the oldest instances will be removed.
         """
-        new_template = self._create_template(new_capacity)
+        nested = self.nested()
         try:
-            updater = self.update_with_template(new_template, {})
-            updater.run_to_completion()
-            self.check_update_complete(updater)
+            if nested is not None and nested.status == nested.COMPLETE:
+                self._resize_members(new_capacity)
+            else:
+                # Let a full update reconcile a nested stack left
+                # incomplete by an earlier failure
+                new_template = self._create_template(new_capacity)
+                updater = self.update_with_template(new_template, {})
+                updater.run_to_completion()
+                self.check_update_complete(updater)
         finally:
             # Reload the LB in any case, so it's only pointing at healthy
             # nodes.
             self._lb_reload()
 
+    def _resize_members(self, new_capacity, retire=()):
+        """
+        Resize the nested stack by creating or deleting only the instances
+        that change, so that the cost is proportional to the change in
+        capacity rather than to the size of the group. Existing instances are
+        left untouched, and the stored template is updated in place.
+
+        When shrinking, any instances named in retire are removed before the
+        oldest instances.
+        """
+        nested = self.nested()
+        instances = sorted(self.get_instances(),
+                           key=lambda r: r.name not in retire)
+
+        # Failed instances are not counted as members of the group, so are
+        # always removed along with the oldest instances when shrinking
+        removed = [r for r in nested.itervalues() if r.status == r.FAILED]
+        removed += instances[:max(len(instances) - new_capacity, 0)]
+
+        num_create = new_capacity - len(instances)
+        if num_create > 0:
+            new_size = nested.root_stack.total_resources() + num_create
+            if new_size - len(removed) > cfg.CONF.max_resources_per_stack:
+                raise exception.RequestLimitExceeded(
+                    message=exception.StackResourceLimitExceeded.msg_fmt)
+
+        # Validate the new instances in a stack of their own, rather than
+        # the whole group
+        definition = self._get_instance_definition()
+        additions = parser.Stack(self.context, self.physical_resource_name(),
+                                 parser.Template({'Resources': dict(
+                                     (short_id.generate_id(), definition)
+                                     for i in range(num_create))}),
+                                 parent_resource=self,
+                                 owner_id=self.stack.id)
+        additions.validate()
+        added = additions.resources.values()
+
+        nested.state_set(nested.UPDATE, nested.IN_PROGRESS,
+                         'Stack UPDATE started')
+        for res in added:
+            nested[res.name] = res
+        nested.reset_dependencies()
+
+        create = scheduler.DependencyTaskGroup(
+            dependencies.Dependencies((r, None) for r in added),
+            resource.Resource.create)
+        delete = scheduler.DependencyTaskGroup(
+            dependencies.Dependencies((r, None) for r in removed),
+            lambda r: r.destroy())
+        try:
+            scheduler.TaskRunner(create)(timeout=nested.timeout_secs())
+            scheduler.TaskRunner(delete)(timeout=nested.timeout_secs())
+        except exception.ResourceFailure as ex:
+            status, reason = nested.FAILED, str(ex)
+        except scheduler.Timeout:
+            status, reason = nested.FAILED, 'Timed out'
+        else:
+            status, reason = nested.COMPLETE, 'Stack successfully updated'
+
+        # Keep any instances which could not be deleted in the template, so
+        # that they are removed when the stack is deleted
+        resources = dict(nested.t['Resources'])
+        resources.update((r.name, definition) for r in added)
+        for res in removed:
+            if (status == nested.COMPLETE or
+                    res.state == (res.DELETE, res.COMPLETE)):
+                del resources[res.name]
+                del nested[res.name]
+        nested.reset_dependencies()
+
+        nested.t = parser.Template(dict(nested.t.t, Resources=resources))
+        nested.state_set(nested.UPDATE, status, reason)
+        nested.store()
+
+        if status != nested.COMPLETE:
+            raise exception.Error("Nested stack update failed: %s" % reason)
+
     def _lb_reload(self, exclude=[]):
         '''
         Notify the LoadBalancer to reload its config to include
@@ -496,36 +741,107 @@ class AutoScalingGroup(InstanceGroup, CooldownMixin):
         """
         Adjust the size of the scaling group if the cooldown permits.
         """
+        return self.adjust_all([(adjustment, adjustment_type)])
+
+    def adjust_all(self, adjustments):
+        """
+        Apply a list of (adjustment, adjustment_type) pairs in order, as a
+        single resize of the scaling group, if the cooldown permits. Any
+        adjustment which would take the group outside its size limits is
+        skipped. Returns False if the cooldown prevented the adjustments.
+        """
         if self._cooldown_inprogress():
             logger.info("%s NOT performing scaling adjustment, cooldown %s" %
                         (self.name, self.properties['Cooldown']))
-            return
+            return False
 
         capacity = len(self.get_instances())
-        if adjustment_type == 'ChangeInCapacity':
-            new_capacity = capacity + adjustment
-        elif adjustment_type == 'ExactCapacity':
-            new_capacity = adjustment
-        else:
-            # PercentChangeInCapacity
-            new_capacity = capacity + (capacity * adjustment / 100)
-
-        if new_capacity > int(self.properties['MaxSize']):
-            logger.warn('can not exceed %s' % self.properties['MaxSize'])
-            return
-        if new_capacity < int(self.properties['MinSize']):
-            logger.warn('can not be less than %s' % self.properties['MinSize'])
-            return
+        new_capacity = capacity
+        for adjustment, adjustment_type in adjustments:
+            if adjustment_type == 'ChangeInCapacity':
+                target = new_capacity + adjustment
+            elif adjustment_type == 'ExactCapacity':
+                target = adjustment
+            else:
+                # PercentChangeInCapacity
+                target = new_capacity + (new_capacity * adjustment / 100)
+
+            if target > int(self.properties['MaxSize']):
+                logger.warn('can not exceed %s' % self.properties['MaxSize'])
+                continue
+            if target < int(self.properties['MinSize']):
+                logger.warn('can not be less than %s' %
+                            self.properties['MinSize'])
+                continue
+            new_capacity = target
 
         if new_capacity == capacity:
             logger.debug('no change in capacity %d' % capacity)
-            return
+            return True
+
+        self.resize(new_capacity)
 
-        result = self.resize(new_capacity)
+        self._cooldown_timestamp(', '.join('%s : %s' % (adjustment_type,
+                                                        adjustment)
+                                           for adjustment, adjustment_type
+                                           in adjustments))
 
-        self._cooldown_timestamp("%s : %s" % (adjustment_type, adjustment))
+        return True
 
-        return result
+    def queue_adjustment(self, adjustment, adjustment_type='ChangeInCapacity'):
+        """
+        Adjust the size of the scaling group, together with any other
+        adjustments queued for it within scaling_signal_window seconds.
+
+        The first caller waits for the window to pass, and for any earlier
+        batch of adjustments to be applied, and then applies all of the
+        queued adjustments as a single resize. Every caller waits for that
+        resize and gets its outcome: False if the cooldown prevented it, or
+        the exception raised if it failed or was never attempted because the
+        first caller was killed.
+
+        Adjustments are only coalesced and ordered within this engine;
+        signals handled by other engines are subject only to the cooldown.
+        """
+        key = (self.stack.id, self.name)
+        batch = _pending_adjustments.get(key)
+        if batch is not None and batch.open:
+            logger.info('%s adjustment by %s coalesced with %d pending' %
+                        (self.name, adjustment, len(batch.adjustments)))
+            batch.adjustments.append((adjustment, adjustment_type))
+            return batch.done.wait()
+
+        batch = _pending_adjustments[key] = AdjustmentBatch(batch)
+        batch.adjustments.append((adjustment, adjustment_type))
+        try:
+            eventlet.sleep(cfg.CONF.scaling_signal_window)
+            batch.open = False
+            if batch.previous is not None:
+                try:
+                    batch.previous.done.wait()
+                except Exception:
+                    # Its failure was reported to its own signallers
+                    pass
+                batch.previous = None
+            applied = self.adjust_all(batch.adjustments)
+        except Exception as ex:
+            with excutils.save_and_reraise_exception():
+                batch.done.send_exception(ex)
+        else:
+            if not applied:
+                logger.info('%s adjustments %s not applied' %
+                            (self.name, batch.adjustments))
+            batch.done.send(applied)
+        finally:
+            batch.open = False
+            if not batch.done.ready():
+                # This thread was killed (e.g. by GreenletExit) before the
+                # batch was applied, so release the other signallers
+                batch.done.send_exception(exception.Error(
+                    _('Adjustment of %s was cancelled') % self.name))
+            if _pending_adjustments.get(key) is batch:
+                del _pending_adjustments[key]
+        return applied
 
     def _tags(self):
         """Add Identifing Tags to all servers in the group.
@@ -671,8 +987,8 @@ class ScalingPolicy(signal_responder.SignalResponder, CooldownMixin):
         logger.info('%s Alarm, adjusting Group %s by %s' %
                     (self.name, group.name,
                      self.properties['ScalingAdjustment']))
-        group.adjust(int(self.properties['ScalingAdjustment']),
-                     self.properties['AdjustmentType'])
+        group.queue_adjustment(int(self.properties['ScalingAdjustment']),
+                               self.properties['AdjustmentType'])
 
         self._cooldown_timestamp("%s : %s" %
                                  (self.properties['AdjustmentType'],
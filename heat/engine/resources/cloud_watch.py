@@ -68,6 +68,13 @@ class CloudWatchAlarm(resource.Resource):
             'Description': _('Metric statistic to evaluate.'),
             'UpdateAllowed': True,
         },
+        'ExtendedStatistic': {
+            'Type': 'String',
+            'Description': _('Percentile statistic to evaluate instead of '
+                             'Statistic, from p0 to p100, e.g. p90 or '
+                             'p99.9.'),
+            'UpdateAllowed': True,
+        },
         'AlarmActions': {
             'Type': 'List',
             'Description': _('A list of actions to execute when state '
@@ -133,6 +140,22 @@ class CloudWatchAlarm(resource.Resource):
     strict_dependency = False
     update_allowed_keys = ('Properties',)
 
+    def validate(self):
+        res = super(CloudWatchAlarm, self).validate()
+        if res:
+            return res
+
+        extended_statistic = self.properties['ExtendedStatistic']
+        if extended_statistic is not None:
+            if self.properties['Statistic'] is not None:
+                msg = _('Only one of Statistic and ExtendedStatistic may be '
+                        'specified.')
+                raise exception.StackValidationFailed(message=msg)
+            try:
+                watchrule.parse_percentile(extended_statistic)
+            except ValueError as ex:
+                raise exception.StackValidationFailed(message=str(ex))
+
     def handle_create(self):
         wr = watchrule.WatchRule(context=self.context,
                                  watch_name=self.physical_resource_name(),
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from heat.db import api as db_api
 from heat.engine import clients
 from heat.engine import resource
 from heat.engine.resources.vpc import VPC
@@ -46,24 +47,35 @@ class ElasticIp(resource.Resource):
 
     def _ipaddress(self):
         if self.ipaddress is None and self.resource_id is not None:
-            if self.properties['Domain'] and clients.neutronclient:
-                ne = clients.neutronclient.exceptions.NeutronClientException
-                try:
-                    ips = self.neutron().show_floatingip(self.resource_id)
-                except ne as e:
-                    if e.status_code == 404:
-                        logger.warn("Floating IPs not found: %s" % str(e))
-                else:
-                    self.ipaddress = ips['floatingip']['floating_ip_address']
-            else:
-                try:
-                    ips = self.nova().floating_ips.get(self.resource_id)
-                except clients.novaclient.exceptions.NotFound as ex:
-                    logger.warn("Floating IPs not found: %s" % str(ex))
-                else:
-                    self.ipaddress = ips.ip
+            # The address of an allocation never changes, so it is stored
+            # rather than fetched again on every load of the stack
+            try:
+                self.ipaddress = db_api.resource_data_get(self, 'ipaddress')
+            except exception.NotFound:
+                self.ipaddress = self._fetch_ipaddress()
+                if self.ipaddress is not None:
+                    db_api.resource_data_set(self, 'ipaddress',
+                                             self.ipaddress)
         return self.ipaddress or ''
 
+    def _fetch_ipaddress(self):
+        if self.properties['Domain'] and clients.neutronclient:
+            ne = clients.neutronclient.exceptions.NeutronClientException
+            try:
+                ips = self.neutron().show_floatingip(self.resource_id)
+            except ne as e:
+                if e.status_code == 404:
+                    logger.warn("Floating IPs not found: %s" % str(e))
+            else:
+                return ips['floatingip']['floating_ip_address']
+        else:
+            try:
+                ips = self.nova().floating_ips.get(self.resource_id)
+            except clients.novaclient.exceptions.NotFound as ex:
+                logger.warn("Floating IPs not found: %s" % str(ex))
+            else:
+                return ips.ip
+
     def handle_create(self):
         """Allocate a floating IP for the current tenant."""
         ips = None
@@ -76,6 +88,7 @@ class ElasticIp(resource.Resource):
                 'floatingip': props})['floatingip']
             self.ipaddress = ips['floating_ip_address']
             self.resource_id_set(ips['id'])
+            db_api.resource_data_set(self, 'ipaddress', self.ipaddress)
             logger.info('ElasticIp create %s' % str(ips))
         else:
             if self.properties['Domain']:
@@ -93,6 +106,7 @@ class ElasticIp(resource.Resource):
             if ips:
                 self.ipaddress = ips.ip
                 self.resource_id_set(ips.id)
+                db_api.resource_data_set(self, 'ipaddress', self.ipaddress)
                 logger.info('ElasticIp create %s' % str(ips))
 
         if self.properties['InstanceId']:
@@ -23,6 +23,7 @@ from heat.engine.resources import volume
 from heat.common import exception
 from heat.engine.resources.network_interface import NetworkInterface
 
+from heat.openstack.common import excutils
 from heat.openstack.common.gettextutils import _
 from heat.openstack.common import log as logging
 
@@ -180,6 +181,8 @@ class Instance(resource.Resource):
 
     update_allowed_keys = ('Metadata', 'Properties')
 
+    cache_attributes = True
+
     def __init__(self, name, json_snippet, stack):
         super(Instance, self).__init__(name, json_snippet, stack)
         self.ipaddress = None
@@ -360,6 +363,11 @@ class Instance(resource.Resource):
                 scheduler_hints=scheduler_hints,
                 nics=nics,
                 availability_zone=availability_zone)
+        except (clients.novaclient.exceptions.BadRequest,
+                clients.novaclient.exceptions.NotFound):
+            with excutils.save_and_reraise_exception():
+                nova_utils.invalidate_server_lookups(self.nova(), image_name,
+                                                     flavor)
         finally:
             # Avoid a race condition where the thread could be cancelled
             # before the ID is stored
@@ -384,7 +392,7 @@ class Instance(resource.Resource):
 
         if not volume_attach.started():
             if server.status != 'ACTIVE':
-                server.get()
+                nova_utils.refresh_server(server)
 
             # Some clouds append extra (STATUS) strings to the status
             short_server_status = server.status.split('(')[0]
@@ -482,7 +490,7 @@ class Instance(resource.Resource):
             yield
 
             try:
-                server.get()
+                nova_utils.refresh_server(server)
                 if server.status == "DELETED":
                     self.resource_id_set(None)
                     break
@@ -565,7 +573,7 @@ class Instance(resource.Resource):
                 if server.status == 'SUSPENDED':
                     return True
 
-                server.get()
+                nova_utils.refresh_server(server)
                 logger.debug("%s check_suspend_complete status = %s" %
                              (self.name, server.status))
                 if server.status in list(nova_utils.deferred_server_statuses +
@@ -13,7 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import itertools
+import json
+
+from heat.common import exception
 from heat.common import template_format
+from heat.db import api as db_api
 from heat.engine import stack_resource
 from heat.engine.resources import nova_utils
 
@@ -349,18 +354,48 @@ class LoadBalancer(stack_resource.StackResource):
 ''' % timeout_check
 
         servers = []
-        n = 1
-        client = self.nova()
-        for i in instances:
-            ip = nova_utils.server_to_ipaddress(client, i) or '0.0.0.0'
+        members = self._backend_servers(instances)
+        for member in sorted(members.values(), key=lambda m: m['server']):
+            ip = member['ip'] or '0.0.0.0'
             logger.debug('haproxy server:%s' % ip)
-            servers.append('%sserver server%d %s:%s %s' % (spaces, n,
+            servers.append('%sserver server%d %s:%s %s' % (spaces,
+                                                           member['server'],
                                                            ip, inst_port,
                                                            check))
-            n = n + 1
 
         return '%s%s%s%s\n' % (gl, frontend, backend, '\n'.join(servers))
 
+    def _backend_servers(self, instances):
+        '''
+        Return the backend server number and IP address of each instance.
+
+        An instance keeps its server number for as long as it remains a
+        member, and its IP address is looked up only once, so a change in
+        membership changes only the configuration lines of the instances
+        added or removed.
+        '''
+        previous = {}
+        if self.id is not None:
+            try:
+                previous = json.loads(db_api.resource_data_get(self,
+                                                               'members'))
+            except exception.NotFound:
+                pass
+
+        members = dict((i, m) for i, m in previous.items() if i in instances)
+        used = set(m['server'] for m in members.values())
+        numbers = (n for n in itertools.count(1) if n not in used)
+        for i in instances:
+            if i not in members:
+                members[i] = {'server': next(numbers), 'ip': None}
+            if members[i]['ip'] is None:
+                members[i]['ip'] = nova_utils.server_to_ipaddress(self.nova(),
+                                                                  i)
+
+        if members != previous and self.id is not None:
+            db_api.resource_data_set(self, 'members', json.dumps(members))
+        return members
+
     def handle_create(self):
         templ = template_format.parse(lb_template)
 
@@ -384,7 +419,7 @@ class LoadBalancer(stack_resource.StackResource):
     def handle_update(self, json_snippet, tmpl_diff, prop_diff):
         '''
         re-generate the Metadata
-        save it to the db.
+        save it to the db, if it has changed.
         rely on the cfn-hup to reconfigure HAProxy
         '''
         if 'Instances' in prop_diff:
@@ -393,6 +428,10 @@ class LoadBalancer(stack_resource.StackResource):
 
             md = self.nested()['LB_instance'].metadata
             files = md['AWS::CloudFormation::Init']['config']['files']
+            if files['/etc/haproxy/haproxy.cfg'].get('content') == cfg:
+                logger.debug('haproxy configuration of %s unchanged' %
+                             self.name)
+                return
             files['/etc/haproxy/haproxy.cfg']['content'] = cfg
 
             self.nested()['LB_instance'].metadata = md
@@ -29,6 +29,8 @@ class Firewall(neutron.NeutronResource):
     A resource for the Firewall resource in Neutron FWaaS.
     """
 
+    collection = 'firewalls'
+
     properties_schema = {'name': {'Type': 'String',
                                   'UpdateAllowed': True},
                          'description': {'Type': 'String',
@@ -85,6 +87,8 @@ class FirewallPolicy(neutron.NeutronResource):
     A resource for the FirewallPolicy resource in Neutron FWaaS.
     """
 
+    collection = 'firewall_policies'
+
     properties_schema = {'name': {'Type': 'String',
                                   'UpdateAllowed': True},
                          'description': {'Type': 'String',
@@ -143,6 +147,8 @@ class FirewallRule(neutron.NeutronResource):
     A resource for the FirewallRule resource in Neutron FWaaS.
     """
 
+    collection = 'firewall_rules'
+
     properties_schema = {'name': {'Type': 'String',
                                   'UpdateAllowed': True},
                          'description': {'Type': 'String',
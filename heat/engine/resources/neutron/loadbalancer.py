@@ -30,6 +30,8 @@ class HealthMonitor(neutron.NeutronResource):
     A resource for managing health monitors for load balancers in Neutron.
     """
 
+    collection = 'health_monitors'
+
     properties_schema = {
         'delay': {
             'Type': 'Integer', 'Required': True,
@@ -128,6 +130,8 @@ class Pool(neutron.NeutronResource):
     A resource for managing load balancer pools in Neutron.
     """
 
+    collection = 'pools'
+
     vip_schema = {
         'name': {
             'Type': 'String',
@@ -231,7 +235,7 @@ class Pool(neutron.NeutronResource):
         return self.neutron().show_pool(self.resource_id)['pool']
 
     def check_create_complete(self, data):
-        attributes = self._show_resource()
+        attributes = self._refresh_resource()
         if attributes['status'] == 'PENDING_CREATE':
             return False
         elif attributes['status'] == 'ACTIVE':
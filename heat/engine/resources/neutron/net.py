@@ -25,6 +25,8 @@ logger = logging.getLogger(__name__)
 
 
 class Net(neutron.NeutronResource):
+    collection = 'networks'
+
     properties_schema = {
         'name': {
             'Type': 'String',
@@ -81,7 +83,7 @@ class Net(neutron.NeutronResource):
             self.resource_id)['network']
 
     def check_create_complete(self, *args):
-        attributes = self._show_resource()
+        attributes = self._refresh_resource()
         return self.is_built(attributes)
 
     def handle_delete(self):
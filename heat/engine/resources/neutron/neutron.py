@@ -13,7 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from time import time as wallclock
+
 from neutronclient.common.exceptions import NeutronClientException
+from oslo.config import cfg
 
 from heat.common import exception
 from heat.engine import resource
@@ -22,9 +25,91 @@ from heat.openstack.common import log as logging
 
 logger = logging.getLogger(__name__)
 
+cfg.CONF.import_opt('neutron_status_poll_interval', 'heat.common.config')
+
+
+class NeutronStatusPoller(object):
+    '''
+    Refreshes the attributes of all of a tenant's resources of one type that
+    are changing state with a single filtered list request per interval,
+    instead of one show request per resource.
+
+    The first refresh of a resource shows it individually. After that, its
+    attributes are taken from the latest list of all of the resources being
+    refreshed. A resource missing from the list is shown individually again,
+    so that a deleted resource is reported by Neutron as not found. Resources
+    which are not refreshed for a while are forgotten.
+    '''
+
+    # Maximum number of ids in each list request, to limit the length of
+    # the query string
+    MAX_IDS = 100
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.expiry = interval * 10
+        self.watching = {}
+        self.attributes = {}
+        self.last_poll = None
+        self.polling = False
+
+    def refresh(self, resource_id, show, list_all):
+        '''
+        Return the attributes of a resource, using show(), which fetches the
+        resource, or list_all(ids), which fetches a list of the resources
+        with the given ids.
+        '''
+        now = wallclock()
+        if self.last_poll is not None and now - self.last_poll > self.expiry:
+            self.watching.clear()
+            self.attributes.clear()
+            self.last_poll = None
+
+        refreshed = self.watching.get(resource_id)
+        if (refreshed is not None and now - refreshed <= self.expiry and
+                not self.polling and
+                (self.last_poll is None or
+                 now - self.last_poll >= self.interval)):
+            self._poll(list_all, now)
+
+        if (resource_id not in self.attributes or
+                refreshed is None or now - refreshed > self.expiry):
+            self.watching.pop(resource_id, None)
+            self.attributes[resource_id] = show()
+
+        self.watching[resource_id] = now
+        return self.attributes[resource_id]
+
+    def _poll(self, list_all, now):
+        ids = self.watching.keys()
+
+        self.polling = True
+        try:
+            resources = []
+            for i in range(0, len(ids), self.MAX_IDS):
+                resources.extend(list_all(ids[i:i + self.MAX_IDS]))
+        finally:
+            self.polling = False
+
+        self.last_poll = now
+        self.attributes = dict((r['id'], r) for r in resources
+                               if r['id'] in self.watching)
+        for resource_id, refreshed in self.watching.items():
+            if now - refreshed > self.expiry:
+                del self.watching[resource_id]
+
+
+_status_pollers = {}
+
 
 class NeutronResource(resource.Resource):
 
+    cache_attributes = True
+
+    # The Neutron collection containing resources of this type, from which
+    # the statuses of several of them can be refreshed with one request
+    collection = None
+
     def validate(self):
         '''
         Validate any of the provided params
@@ -102,11 +187,33 @@ class NeutronResource(resource.Resource):
             return None
         return self.handle_get_attributes(self.name, name, attributes)
 
+    def _refresh_resource(self):
+        '''
+        Return the attributes of the resource while it is changing state,
+        sharing a single request to Neutron with any other resources of the
+        same type and tenant being refreshed by this engine.
+        '''
+        interval = cfg.CONF.neutron_status_poll_interval
+        if self.collection is None or interval <= 0:
+            return self._show_resource()
+
+        key = (self.context.tenant_id, self.collection)
+        if key not in _status_pollers:
+            _status_pollers[key] = NeutronStatusPoller(interval)
+
+        list_resources = getattr(self.neutron(), 'list_%s' % self.collection)
+
+        def list_all(ids):
+            return list_resources(id=ids)[self.collection]
+
+        return _status_pollers[key].refresh(self.resource_id,
+                                            self._show_resource, list_all)
+
     def _confirm_delete(self):
         while True:
             try:
                 yield
-                self._show_resource()
+                self._refresh_resource()
             except NeutronClientException as ex:
                 self._handle_not_found_exception(ex)
                 return
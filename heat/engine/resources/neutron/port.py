@@ -26,6 +26,8 @@ logger = logging.getLogger(__name__)
 
 class Port(neutron.NeutronResource):
 
+    collection = 'ports'
+
     fixed_ip_schema = {'subnet_id': {'Type': 'String'},
                        'ip_address': {'Type': 'String'}}
 
@@ -92,7 +94,7 @@ class Port(neutron.NeutronResource):
             self.resource_id)['port']
 
     def check_create_complete(self, *args):
-        attributes = self._show_resource()
+        attributes = self._refresh_resource()
         return self.is_built(attributes)
 
     def handle_delete(self):
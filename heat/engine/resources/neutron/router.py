@@ -28,6 +28,8 @@ logger = logging.getLogger(__name__)
 
 
 class Router(neutron.NeutronResource):
+    collection = 'routers'
+
     properties_schema = {'name': {'Type': 'String'},
                          'value_specs': {'Type': 'Map',
                                          'Default': {}},
@@ -54,7 +56,7 @@ class Router(neutron.NeutronResource):
             self.resource_id)['router']
 
     def check_create_complete(self, *args):
-        attributes = self._show_resource()
+        attributes = self._refresh_resource()
         return self.is_built(attributes)
 
     def handle_delete(self):
@@ -26,6 +26,8 @@ logger = logging.getLogger(__name__)
 
 class Subnet(neutron.NeutronResource):
 
+    collection = 'subnets'
+
     allocation_schema = {'start': {'Type': 'String',
                                    'Required': True},
                          'end': {'Type': 'String',
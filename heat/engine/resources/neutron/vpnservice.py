@@ -30,6 +30,8 @@ class VPNService(neutron.NeutronResource):
     A resource for VPN service in Neutron.
     """
 
+    collection = 'vpnservices'
+
     properties_schema = {
         'name': {
             'Type': 'String',
@@ -109,6 +111,8 @@ class IPsecSiteConnection(neutron.NeutronResource):
     A resource for IPsec site connection in Neutron.
     """
 
+    collection = 'ipsec_site_connections'
+
     dpd_schema = {
         'actions': {
             'Type': 'String',
@@ -274,6 +278,8 @@ class IKEPolicy(neutron.NeutronResource):
     A resource for IKE policy in Neutron.
     """
 
+    collection = 'ikepolicies'
+
     lifetime_schema = {
         'units': {
             'Type': 'String',
@@ -391,6 +397,8 @@ class IPsecPolicy(neutron.NeutronResource):
     A resource for IPsec policy in Neutron.
     """
 
+    collection = 'ipsecpolicies'
+
     lifetime_schema = {
         'units': {
             'Type': 'String',
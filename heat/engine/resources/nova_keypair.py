@@ -102,6 +102,7 @@ class KeyPair(resource.Resource):
                                      new_keypair.private_key,
                                      True)
         self.resource_id_set(new_keypair.id)
+        nova_utils.invalidate_lookup(self.nova(), 'keypair', new_keypair.id)
 
     def handle_delete(self):
         if self.resource_id:
@@ -109,6 +110,8 @@ class KeyPair(resource.Resource):
                 self.nova().keypairs.delete(self.resource_id)
             except nova_exceptions.NotFound:
                 pass
+            nova_utils.invalidate_lookup(self.nova(), 'keypair',
+                                         self.resource_id)
 
     def _resolve_attribute(self, key):
         attr_fn = {'private_key': self.private_key,
@@ -17,6 +17,7 @@
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+import datetime
 import json
 import os
 import pkgutil
@@ -25,14 +26,104 @@ from urlparse import urlparse
 
 from oslo.config import cfg
 
+from heat.common import cache
 from heat.common import exception
 from heat.engine import clients
 from heat.engine import scheduler
+from heat.openstack.common import excutils
 from heat.openstack.common import log as logging
+from heat.openstack.common import timeutils
 from heat.openstack.common import uuidutils
 
 logger = logging.getLogger(__name__)
 
+cfg.CONF.import_opt('nova_lookup_cache_size', 'heat.common.config')
+cfg.CONF.import_opt('nova_lookup_cache_ttl', 'heat.common.config')
+cfg.CONF.import_opt('nova_lookup_negative_cache_ttl', 'heat.common.config')
+cfg.CONF.import_opt('server_status_poll_interval', 'heat.common.config')
+
+LOOKUP_CACHE_SCOPES = 100
+
+_caches = None
+
+
+def lookup_cache(scope):
+    '''
+    Return the cache of image, flavor and keypair lookups for one scope (see
+    _lookup_scope) shared by all stacks in this engine. Each scope has its
+    own cache, so that one tenant's lookups never evict another's, and the
+    caches of the least recently used scopes are discarded.
+    '''
+    global _caches
+    if _caches is None:
+        _caches = cache.LRUCache(LOOKUP_CACHE_SCOPES)
+    scope_cache = _caches.get(scope)
+    if scope_cache is None:
+        scope_cache = cache.TTLCache(cfg.CONF.nova_lookup_cache_size,
+                                     cfg.CONF.nova_lookup_cache_ttl)
+        _caches.set(scope, scope_cache)
+    return scope_cache
+
+
+def _lookup_scope(nova_client, kind):
+    '''
+    Return the part of the cache key which determines who may share a lookup.
+
+    Images and flavors are shared by everyone in a tenant, but keypairs
+    belong to a user, so are only shared by requests with the same token.
+    '''
+    http_client = nova_client.client
+    if kind == 'keypair':
+        return getattr(http_client, 'auth_token', None)
+    return getattr(http_client, 'projectid', None)
+
+
+def _cached_lookup(nova_client, kind, identifier, lookup):
+    '''
+    Return the result of a lookup from the cache if possible, or otherwise
+    call lookup() to fetch it. lookup() returns a dict of results by
+    identifier, each of which is cached, so that a single call to list all
+    of the images, flavors or keypairs in a tenant satisfies subsequent
+    lookups of any of them. Failed lookups are also cached, for a shorter
+    time, by storing the exception to raise.
+    '''
+    scope_cache = lookup_cache(_lookup_scope(nova_client, kind))
+    result = scope_cache.get((kind, identifier))
+    if result is None:
+        results = lookup()
+        logger.debug("Looked up %s %s in nova, lookup cache hit rate %.2f" %
+                     (kind, identifier, scope_cache.hit_rate()))
+        for key, value in results.iteritems():
+            ttl = None
+            if isinstance(value, exception.HeatException):
+                ttl = cfg.CONF.nova_lookup_negative_cache_ttl
+            scope_cache.set((kind, key), value, ttl)
+        result = results[identifier]
+    if isinstance(result, exception.HeatException):
+        raise result
+    return result
+
+
+def invalidate_lookup(nova_client, kind, identifier):
+    '''
+    Discard any cached result of looking up an image, flavor or keypair, e.g.
+    because it has been found not to exist or to have been created.
+    '''
+    scope = _lookup_scope(nova_client, kind)
+    lookup_cache(scope).delete((kind, identifier))
+
+
+def invalidate_server_lookups(nova_client, image=None, flavor=None):
+    '''
+    Discard any cached lookups of the image and flavor of a server which
+    nova has rejected, since either may have been deleted after it was
+    cached.
+    '''
+    if image:
+        invalidate_lookup(nova_client, 'image', image)
+    if flavor:
+        invalidate_lookup(nova_client, 'flavor', flavor)
+
 
 deferred_server_statuses = ['BUILD',
                             'HARD_REBOOT',
@@ -55,33 +146,47 @@ def get_image_id(nova_client, image_identifier):
     :returns: the id of the requested :image_identifier:
     :raises: exception.ImageNotFound, exception.NoUniqueImageFound
     '''
-    image_id = None
     if uuidutils.is_uuid_like(image_identifier):
-        try:
-            image_id = nova_client.images.get(image_identifier).id
-        except clients.novaclient.exceptions.NotFound:
-            logger.info("Image %s was not found in glance"
-                        % image_identifier)
-            raise exception.ImageNotFound(image_name=image_identifier)
+        def lookup():
+            try:
+                image_id = nova_client.images.get(image_identifier).id
+            except clients.novaclient.exceptions.NotFound:
+                logger.info("Image %s was not found in glance"
+                            % image_identifier)
+                image_id = exception.ImageNotFound(
+                    image_name=image_identifier)
+            return {image_identifier: image_id}
     else:
-        try:
-            image_list = nova_client.images.list()
-        except clients.novaclient.exceptions.ClientException as ex:
-            raise exception.Error(
-                message="Error retrieving image list from nova: %s" % str(ex))
-        image_names = dict(
-            (o.id, o.name)
-            for o in image_list if o.name == image_identifier)
-        if len(image_names) == 0:
-            logger.info("Image %s was not found in glance" %
-                        image_identifier)
-            raise exception.ImageNotFound(image_name=image_identifier)
-        elif len(image_names) > 1:
-            logger.info("Mulitple images %s were found in glance with name"
-                        % image_identifier)
-            raise exception.NoUniqueImageFound(image_name=image_identifier)
-        image_id = image_names.popitem()[0]
-    return image_id
+        def lookup():
+            try:
+                image_list = nova_client.images.list()
+            except clients.novaclient.exceptions.ClientException as ex:
+                raise exception.Error(
+                    message="Error retrieving image list from nova: %s" %
+                    str(ex))
+            image_ids = {}
+            for o in image_list:
+                image_ids.setdefault(o.name, set()).add(o.id)
+
+            results = {}
+            for name, ids in image_ids.items():
+                if len(ids) == 1:
+                    results[name] = ids.pop()
+                else:
+                    results[name] = exception.NoUniqueImageFound(
+                        image_name=name)
+            if image_identifier not in results:
+                logger.info("Image %s was not found in glance" %
+                            image_identifier)
+                results[image_identifier] = exception.ImageNotFound(
+                    image_name=image_identifier)
+            elif isinstance(results[image_identifier],
+                            exception.NoUniqueImageFound):
+                logger.info("Mulitple images %s were found in glance with "
+                            "name" % image_identifier)
+            return results
+
+    return _cached_lookup(nova_client, 'image', image_identifier, lookup)
 
 
 def get_flavor_id(nova_client, flavor):
@@ -94,18 +199,16 @@ def get_flavor_id(nova_client, flavor):
     :returns: the id of :flavor:
     :raises: exception.FlavorMissing
     '''
-    flavor_id = None
-    flavor_list = nova_client.flavors.list()
-    for o in flavor_list:
-        if o.name == flavor:
-            flavor_id = o.id
-            break
-        if o.id == flavor:
-            flavor_id = o.id
-            break
-    if flavor_id is None:
-        raise exception.FlavorMissing(flavor_id=flavor)
-    return flavor_id
+    def lookup():
+        results = {}
+        for o in nova_client.flavors.list():
+            results.setdefault(o.id, o.id)
+            results.setdefault(o.name, o.id)
+        if flavor not in results:
+            results[flavor] = exception.FlavorMissing(flavor_id=flavor)
+        return results
+
+    return _cached_lookup(nova_client, 'flavor', flavor, lookup)
 
 
 def get_keypair(nova_client, key_name):
@@ -117,10 +220,108 @@ def get_keypair(nova_client, key_name):
     :returns: the keypair (name, public_key) for :key_name:
     :raises: exception.UserKeyPairMissing
     '''
-    for keypair in nova_client.keypairs.list():
-        if keypair.name == key_name:
-            return keypair
-    raise exception.UserKeyPairMissing(key_name=key_name)
+    def lookup():
+        results = dict((k.name, k) for k in nova_client.keypairs.list())
+        if key_name not in results:
+            results[key_name] = exception.UserKeyPairMissing(
+                key_name=key_name)
+        return results
+
+    return _cached_lookup(nova_client, 'keypair', key_name, lookup)
+
+
+class ServerStatusPoller(object):
+    '''
+    Refreshes the details of all of a tenant's servers that are changing
+    state with a single request per interval, instead of one per server.
+
+    The first refresh of a server fetches it individually. After that, its
+    details are taken from a list of the servers which have changed since
+    shortly before the previous list was fetched, so that no change is
+    missed. Servers which are not refreshed for a while are forgotten.
+    '''
+
+    # Allowance for the difference between our clock and Nova's
+    CLOCK_SKEW = datetime.timedelta(seconds=60)
+
+    def __init__(self, interval):
+        self.interval = datetime.timedelta(seconds=interval)
+        self.expiry = max(self.interval * 10, self.CLOCK_SKEW)
+        self.watching = {}
+        self.changes = {}
+        self.last_poll = None
+        self.polling = False
+
+    def refresh(self, server):
+        '''Update the details of the server.'''
+        now = timeutils.utcnow()
+        if self.last_poll is not None and now - self.last_poll > self.expiry:
+            self.watching.clear()
+            self.changes.clear()
+            self.last_poll = None
+
+        refreshed = self.watching.get(server.id)
+        if refreshed is None or now - refreshed > self.expiry:
+            server.get()
+            self.watching[server.id] = now
+            return
+        self.watching[server.id] = now
+
+        if (not self.polling and
+                (self.last_poll is None or
+                 now - self.last_poll >= self.interval)):
+            self._poll(server.manager, now)
+
+        info = self.changes.get(server.id)
+        if (info is not None and
+                info.get('updated', '') >= server._info.get('updated', '')):
+            server._add_details(info)
+
+    def _poll(self, manager, now):
+        if self.last_poll is None:
+            since = min(self.watching.values())
+        else:
+            since = self.last_poll
+        search_opts = {'changes-since':
+                       timeutils.isotime(since - self.CLOCK_SKEW)}
+
+        self.polling = True
+        try:
+            servers = manager.list(detailed=True, search_opts=search_opts)
+        finally:
+            self.polling = False
+
+        self.last_poll = now
+        self.changes = dict((s.id, s._info) for s in servers
+                            if s.id in self.watching)
+        for server_id, refreshed in self.watching.items():
+            if now - refreshed > self.expiry:
+                del self.watching[server_id]
+
+
+_server_pollers = {}
+
+
+def refresh_server(server):
+    '''
+    Update the details of a server which is changing state, sharing a single
+    request to Nova with any other servers of the same tenant being
+    refreshed by this engine.
+
+    A server which has been deleted may either raise NotFound or have the
+    status DELETED.
+    '''
+    interval = cfg.CONF.server_status_poll_interval
+    if interval <= 0:
+        server.get()
+        return
+
+    http_client = server.manager.api.client
+    key = (getattr(http_client, 'projectid', None),
+           getattr(http_client, 'management_url', None))
+    if key not in _server_pollers:
+        _server_pollers[key] = ServerStatusPoller(interval)
+    _server_pollers[key].refresh(server)
 
 
 def build_userdata(resource, userdata=None, instance_user=None):
@@ -206,15 +407,22 @@ def delete_server(server):
         yield
 
         try:
-            server.get()
+            refresh_server(server)
         except clients.novaclient.exceptions.NotFound:
             break
+        if server.status == 'DELETED':
+            break
 
 
 @scheduler.wrappertask
 def resize(server, flavor, flavor_id):
     """Resize the server and then call check_resize task to verify."""
-    server.resize(flavor_id)
+    try:
+        server.resize(flavor_id)
+    except (clients.novaclient.exceptions.BadRequest,
+            clients.novaclient.exceptions.NotFound):
+        with excutils.save_and_reraise_exception():
+            invalidate_server_lookups(server.manager.api, flavor=flavor)
     yield check_resize(server, flavor, flavor_id)
 
 
@@ -226,7 +434,7 @@ def check_resize(server, flavor, flavor_id):
     server.get()
     while server.status == 'RESIZE':
         yield
-        server.get()
+        refresh_server(server)
     if server.status == 'VERIFY_RESIZE':
         server.confirm_resize()
     else:
@@ -236,9 +444,15 @@ def check_resize(server, flavor, flavor_id):
 
 
 @scheduler.wrappertask
-def rebuild(server, image_id):
+def rebuild(server, image_id, image=None):
     """Rebuild the server and call check_rebuild to verify."""
-    server.rebuild(image_id)
+    try:
+        server.rebuild(image_id)
+    except (clients.novaclient.exceptions.BadRequest,
+            clients.novaclient.exceptions.NotFound):
+        with excutils.save_and_reraise_exception():
+            invalidate_server_lookups(server.manager.api,
+                                      image=image or image_id)
     yield check_rebuild(server, image_id)
 
 
@@ -250,7 +464,7 @@ def check_rebuild(server, image_id):
     server.get()
     while server.status == 'REBUILD':
         yield
-        server.get()
+        refresh_server(server)
     if server.status == 'ERROR':
         raise exception.Error(
             _("Rebuilding server failed, status '%s'") % server.status)
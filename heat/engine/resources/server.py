@@ -22,6 +22,7 @@ from heat.engine import clients
 from heat.engine import scheduler
 from heat.engine.resources import nova_utils
 from heat.engine import resource
+from heat.openstack.common import excutils
 from heat.openstack.common.gettextutils import _
 from heat.openstack.common import log as logging
 
@@ -194,6 +195,8 @@ class Server(resource.Resource):
 
     update_allowed_keys = ('Metadata', 'Properties')
 
+    cache_attributes = True
+
     def __init__(self, name, json_snippet, stack):
         super(Server, self).__init__(name, json_snippet, stack)
         self.mime_string = None
@@ -272,6 +275,11 @@ class Server(resource.Resource):
                 reservation_id=reservation_id,
                 config_drive=config_drive,
                 disk_config=disk_config)
+        except (clients.novaclient.exceptions.BadRequest,
+                clients.novaclient.exceptions.NotFound):
+            with excutils.save_and_reraise_exception():
+                nova_utils.invalidate_server_lookups(
+                    self.nova(), self.properties.get('image'), flavor)
         finally:
             # Avoid a race condition where the thread could be cancelled
             # before the ID is stored
@@ -286,7 +294,7 @@ class Server(resource.Resource):
     def _check_active(self, server):
 
         if server.status != 'ACTIVE':
-            server.get()
+            nova_utils.refresh_server(server)
 
         # Some clouds append extra (STATUS) strings to the status
         short_server_status = server.status.split('(')[0]
@@ -397,7 +405,7 @@ class Server(resource.Resource):
             if not server:
                 server = self.nova().servers.get(self.resource_id)
             checker = scheduler.TaskRunner(nova_utils.rebuild, server,
-                                           image_id)
+                                           image_id, image)
             checkers.append(checker)
 
         # Optimization: make sure the first task is started before
@@ -508,7 +516,7 @@ class Server(resource.Resource):
             if server.status == 'SUSPENDED':
                 return True
 
-            server.get()
+            nova_utils.refresh_server(server)
             logger.debug('%s check_suspend_complete status = %s' %
                          (self.name, server.status))
             if server.status in list(nova_utils.deferred_server_statuses +
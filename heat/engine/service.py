@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 import functools
 import json
 
@@ -21,6 +22,9 @@ import webob
 
 cfg.CONF.import_opt('max_resources_per_stack', 'heat.common.config')
 cfg.CONF.import_opt('max_stacks_per_tenant', 'heat.common.config')
+cfg.CONF.import_opt('watch_data_retention', 'heat.common.config')
+cfg.CONF.import_opt('watch_data_rollups', 'heat.common.config')
+cfg.CONF.import_opt('watch_data_rollup_retention', 'heat.common.config')
 
 from heat.openstack.common import timeutils
 from heat.common import context
@@ -29,7 +33,6 @@ from heat.engine import api
 from heat.rpc import api as rpc_api
 from heat.engine import attributes
 from heat.engine import clients
-from heat.engine.event import Event
 from heat.engine import environment
 from heat.common import exception
 from heat.common import identifier
@@ -102,31 +105,28 @@ class EngineService(service.Service):
         """
         pass
 
-    def _start_watch_task(self, stack_id, cnxt):
-
-        def stack_has_a_watchrule(sid):
-            wrs = db_api.watch_rule_get_all_by_stack(cnxt, sid)
-
-            now = timeutils.utcnow()
-            start_watch_thread = False
-            for wr in wrs:
-                # reset the last_evaluated so we don't fire off alarms when
-                # the engine has not been running.
-                db_api.watch_rule_update(cnxt, wr.id, {'last_evaluated': now})
-
-                if wr.state != rpc_api.WATCH_STATE_CEILOMETER_CONTROLLED:
-                    start_watch_thread = True
-
-            children = db_api.stack_get_all_by_owner_id(cnxt, sid)
-            for child in children:
-                if stack_has_a_watchrule(child.id):
-                    start_watch_thread = True
-
-            return start_watch_thread
-
-        if stack_has_a_watchrule(stack_id):
-            self._timer_in_thread(stack_id, self._periodic_watcher_task,
-                                  sid=stack_id)
+    def _prune_watch_data(self):
+        """
+        Periodic task which removes metric samples older than the configured
+        watch_data_retention, optionally aggregating them into per-minute
+        rollups first, and then removes expired rollups.
+        """
+        admin_context = context.get_admin_context()
+        now = timeutils.utcnow()
+        try:
+            if cfg.CONF.watch_data_retention:
+                time_line = now - datetime.timedelta(
+                    hours=cfg.CONF.watch_data_retention)
+                count = db_api.watch_data_prune(
+                    admin_context, time_line,
+                    rollups=cfg.CONF.watch_data_rollups)
+                logger.debug('Pruned %d expired metric samples' % count)
+            if cfg.CONF.watch_data_rollup_retention:
+                time_line = now - datetime.timedelta(
+                    hours=cfg.CONF.watch_data_rollup_retention)
+                db_api.watch_data_rollup_prune(admin_context, time_line)
+        except Exception as ex:
+            logger.warn('Unable to prune metric samples: %s' % str(ex))
 
     def start(self):
         super(EngineService, self).start()
@@ -136,11 +136,18 @@ class EngineService(service.Service):
         self.tg.add_timer(cfg.CONF.periodic_interval,
                           self._service_task)
 
-        # Create a periodic_watcher_task per-stack
+        # Expire old metric samples in the background
+        self.tg.add_timer(cfg.CONF.periodic_interval,
+                          self._prune_watch_data)
+
+        # Reset last_evaluated for every watch rule, so we don't fire off
+        # alarms for the time the engine was not running, then evaluate all
+        # of the rules from a single engine-wide periodic task
         admin_context = context.get_admin_context()
-        stacks = db_api.stack_get_all(admin_context)
-        for s in stacks:
-            self._start_watch_task(s.id, admin_context)
+        db_api.watch_rule_update_all(admin_context,
+                                     {'last_evaluated': timeutils.utcnow()})
+        self.tg.add_timer(cfg.CONF.periodic_interval,
+                          self._periodic_watcher_task)
 
     @request_context
     def identify_stack(self, cnxt, stack_name):
@@ -179,11 +186,13 @@ class EngineService(service.Service):
         return s
 
     @request_context
-    def show_stack(self, cnxt, stack_identity):
+    def show_stack(self, cnxt, stack_identity, refresh_outputs=False):
         """
         Return detailed information about one or all stacks.
         arg1 -> RPC cnxt.
         arg2 -> Name of the stack you want to show, or None to show all
+        arg3 -> Whether to resolve the stack outputs again rather than use
+                the values stored when the stack was completed
         """
         if stack_identity is not None:
             stacks = [self._get_stack(cnxt, stack_identity, show_deleted=True)]
@@ -192,6 +201,8 @@ class EngineService(service.Service):
 
         def format_stack_detail(s):
             stack = parser.Stack.load(cnxt, stack=s)
+            if refresh_outputs and stack.status == stack.COMPLETE:
+                stack.store_outputs()
             return api.format_stack(stack)
 
         return [format_stack_detail(s) for s in stacks]
@@ -247,12 +258,11 @@ class EngineService(service.Service):
         logger.info('template is %s' % template)
 
         def _stack_create(stack):
-            # Create the stack, and create the periodic task if successful
+            # Create the stack; its watch rules are picked up by the
+            # engine-wide periodic watcher task
             stack.create()
-            if stack.action == stack.CREATE and stack.status == stack.COMPLETE:
-                # Schedule a periodic watcher task for this stack
-                self._start_watch_task(stack.id, cnxt)
-            else:
+            if (stack.action != stack.CREATE or
+                    stack.status != stack.COMPLETE):
                 logger.warning("Stack create failed, status %s" % stack.status)
 
         if db_api.stack_get_by_name(cnxt, stack_name):
@@ -497,17 +507,7 @@ class EngineService(service.Service):
         else:
             events = db_api.event_get_all_by_tenant(cnxt)
 
-        stacks = {}
-
-        def get_stack(stack_id):
-            if stack_id not in stacks:
-                stacks[stack_id] = parser.Stack.load(cnxt, stack_id)
-            return stacks[stack_id]
-
-        return [api.format_event(Event.load(cnxt,
-                                            e.id, e,
-                                            get_stack(e.stack_id)))
-                for e in events]
+        return [api.format_event(e) for e in events]
 
     def _authorize_stack_user(self, cnxt, stack, resource_name):
         '''
@@ -694,33 +694,23 @@ class EngineService(service.Service):
 
         return resource.metadata
 
-    def _check_stack_watches(self, sid):
-        # Retrieve the stored credentials & create context
-        # Require admin=True to the stack_get to defeat tenant
-        # scoping otherwise we fail to retrieve the stack
-        logger.debug("Periodic watcher task for stack %s" % sid)
+    def _periodic_watcher_task(self):
+        """
+        Periodic task, created once per engine, which evaluates every watch
+        rule that is due in a single pass and dispatches any resulting alarm
+        actions to the thread group of the stack owning the rule
+        """
         admin_context = context.get_admin_context()
-        stack = db_api.stack_get(admin_context, sid, admin=True)
-        if not stack:
-            logger.error("Unable to retrieve stack %s for periodic task" %
-                         sid)
-            return
-        stack_context = self._load_user_creds(stack.user_creds_id)
-
-        # recurse into any nested stacks.
-        children = db_api.stack_get_all_by_owner_id(admin_context, sid)
-        for child in children:
-            self._check_stack_watches(child.id)
-
-        # Get all watchrules for this stack and evaluate them
         try:
-            wrs = db_api.watch_rule_get_all_by_stack(stack_context, sid)
+            wrs = db_api.watch_rule_get_all_with_stack(
+                admin_context,
+                exclude_states=(rpc_api.WATCH_STATE_SUSPENDED,
+                                rpc_api.WATCH_STATE_CEILOMETER_CONTROLLED))
         except Exception as ex:
-            logger.warn('periodic_task db error (%s) %s' %
-                        ('watch rule removed?', str(ex)))
+            logger.warn('periodic_task db error %s' % str(ex))
             return
 
-        def run_alarm_action(actions, details):
+        def run_alarm_action(stack_context, stack, actions, details):
             for action in actions:
                 action(details=details)
 
@@ -728,85 +718,123 @@ class EngineService(service.Service):
             for res in stk.itervalues():
                 res.metadata_update()
 
+        # Stored credentials are only loaded for stacks with rules due for
+        # evaluation, and only once per stack
+        stack_contexts = {}
         for wr in wrs:
-            rule = watchrule.WatchRule.load(stack_context, watch=wr)
-            actions = rule.evaluate()
+            rule = watchrule.WatchRule.load(admin_context, watch=wr)
+            if not rule.is_due():
+                continue
+            stack = wr.stack
+            try:
+                if stack.id not in stack_contexts:
+                    stack_contexts[stack.id] = self._load_user_creds(
+                        stack.user_creds_id)
+                rule.context = stack_contexts[stack.id]
+                actions = rule.evaluate()
+            except Exception:
+                logger.exception('Watch rule %s evaluation failed' % wr.name)
+                continue
             if actions:
-                self._start_in_thread(sid, run_alarm_action, actions,
+                self._start_in_thread(stack.id, run_alarm_action,
+                                      rule.context, stack, actions,
                                       rule.get_details())
 
-    def _periodic_watcher_task(self, sid):
-        """
-        Periodic task, created for each stack, triggers watch-rule
-        evaluation for all rules defined for the stack
-        sid = stack ID
-        """
-        self._check_stack_watches(sid)
-
     @request_context
     def create_watch_data(self, cnxt, watch_name, stats_data):
         '''
         This could be used by CloudWatch and WaitConditions
         and treat HA service events like any other CloudWatch.
+        stats_data may be a single datapoint or a list of datapoints, which
+        are routed to their rules in one pass and stored with a single
+        bulk insert. When watch_name is None, a datapoint with an AlarmName
+        dimension is for the watch it names. Every datapoint is routed
+        before any is stored, so either all are accepted or none are.
         '''
-        def get_matching_watches():
-            if watch_name:
-                yield watchrule.WatchRule.load(cnxt, watch_name)
-            else:
-                for wr in db_api.watch_rule_get_all(cnxt):
-                    if watchrule.rule_can_use_sample(wr, stats_data):
-                        yield watchrule.WatchRule.load(cnxt, watch=wr)
-
-        rule_run = False
-        for rule in get_matching_watches():
-            rule.create_watch_data(stats_data)
-            rule_run = True
+        if isinstance(stats_data, dict):
+            samples = [stats_data]
+        else:
+            samples = stats_data
 
-        if not rule_run:
+        if watch_name:
+            rule = watchrule.WatchRule.load(cnxt, watch_name)
+            routed = [(rule, data) for data in samples]
+        else:
+            named = {}
+            rules = {}
+            routed = []
+            unnamed = []
+            for data in samples:
+                name = watchrule.pop_watch_name(data)
+                if name is None:
+                    unnamed.append(data)
+                    continue
+                if name not in named:
+                    named[name] = watchrule.WatchRule.load(cnxt, name)
+                routed.append((named[name], data))
+            if unnamed:
+                for wr, data in watchrule.route_samples(cnxt, unnamed):
+                    if wr.id not in rules:
+                        rules[wr.id] = watchrule.WatchRule.load(cnxt,
+                                                                watch=wr)
+                    routed.append((rules[wr.id], data))
+
+        if not routed:
             if watch_name is None:
                 watch_name = 'Unknown'
             raise exception.WatchRuleNotFound(watch_name=watch_name)
 
+        watch_data = [wr.accept_watch_data(data) for wr, data in routed]
+        watch_data = [wd for wd in watch_data if wd is not None]
+        if watch_data:
+            db_api.watch_data_create_all(None, watch_data)
+            watchrule.buffer_watch_data(watch_data)
+            logger.debug('%d new watch data samples' % len(watch_data))
+
         return stats_data
 
     @request_context
-    def show_watch(self, cnxt, watch_name):
+    def show_watch(self, cnxt, watch_name, state=None, name_prefix=None,
+                   limit=None, marker=None):
         '''
         The show_watch method returns the attributes of one watch/alarm
         arg1 -> RPC context.
         arg2 -> Name of the watch you want to see, or None to see all
+        arg3 -> State of the watches you want to see, or None to see all
+        arg4 -> Prefix of the names of the watches you want to see, or None
+        arg5 -> Maximum number of watches to return, or None for all
+        arg6 -> ID of the watch after which to start, or None
         '''
         if watch_name:
-            wrn = [watch_name]
+            wrs = [watchrule.WatchRule.load(cnxt, watch_name)]
         else:
             try:
-                wrn = [w.name for w in db_api.watch_rule_get_all(cnxt)]
+                wrs = db_api.watch_rule_get_all_summary(
+                    cnxt, state=state, name_prefix=name_prefix,
+                    limit=limit, marker=marker)
             except Exception as ex:
                 logger.warn('show_watch (all) db error %s' % str(ex))
                 return
 
-        wrs = [watchrule.WatchRule.load(cnxt, w) for w in wrn]
         result = [api.format_watch(w) for w in wrs]
         return result
 
     @request_context
-    def show_watch_metric(self, cnxt, metric_namespace=None, metric_name=None):
+    def show_watch_metric(self, cnxt, metric_namespace=None, metric_name=None,
+                          limit=None, marker=None):
         '''
         The show_watch method returns the datapoints for a metric
         arg1 -> RPC context.
         arg2 -> Name of the namespace you want to see, or None to see all
         arg3 -> Name of the metric you want to see, or None to see all
+        arg4 -> Maximum number of datapoints to return, or None for all
+        arg5 -> ID of the datapoint after which to start, or None
         '''
-
-        # DB API and schema does not yet allow us to easily query by
-        # namespace/metric, but we will want this at some point
-        # for now, the API can query all metric data and filter locally
-        if metric_namespace is not None or metric_name is not None:
-            logger.error("Filtering by namespace/metric not yet supported")
-            return
-
         try:
-            wds = db_api.watch_data_get_all(cnxt)
+            wds = db_api.watch_data_get_all(cnxt,
+                                            namespace=metric_namespace,
+                                            metric_name=metric_name,
+                                            limit=limit, marker=marker)
         except Exception as ex:
             logger.warn('show_metric (all) db error %s' % str(ex))
             return
@@ -16,11 +16,26 @@
 import collections
 import json
 
+from oslo.config import cfg
+
+cfg.CONF.import_opt('template_cache_size', 'heat.common.config')
+
 from heat.api.aws import utils as aws_utils
 from heat.db import api as db_api
+from heat.common import cache
 from heat.common import exception
 from heat.engine.parameters import ParamSchema
 
+_cache = None
+
+
+def _template_cache():
+    global _cache
+    if _cache is None:
+        _cache = cache.LRUCache(cfg.CONF.template_cache_size)
+    return _cache
+
+
 SECTIONS = (VERSION, DESCRIPTION, MAPPINGS,
             PARAMETERS, RESOURCES, OUTPUTS) = \
            ('AWSTemplateFormatVersion', 'Description', 'Mappings',
@@ -55,7 +70,17 @@ class Template(collections.Mapping):
     def load(cls, context, template_id):
         '''Retrieve a Template with the given ID from the database.'''
         t = db_api.raw_template_get(context, template_id)
-        return cls(t.template, template_id)
+        # The template body is not fetched from the database unless it is
+        # missing from the cache. The cache holds the serialised template, so
+        # that each Template gets its own copy which it is free to modify.
+        serialised = _template_cache().get(t.hash)
+        if serialised is None:
+            tmpl = dict(t.template)
+            if t.hash is not None:
+                _template_cache().set(t.hash, json.dumps(tmpl))
+        else:
+            tmpl = json.loads(serialised)
+        return cls(tmpl, template_id)
 
     def store(self, context=None):
         '''Store the Template in the database and return its ID.'''
@@ -14,8 +14,15 @@
 #    under the License.
 
 
+import collections
 import datetime
+import itertools
+import re
+
+from oslo.config import cfg
+
 from heat.common import exception
+from heat.common import sketch
 from heat.openstack.common import log as logging
 from heat.openstack.common import timeutils
 from heat.engine import timestamp
@@ -25,6 +32,10 @@ from heat.rpc import api as rpc_api
 
 logger = logging.getLogger(__name__)
 
+cfg.CONF.import_opt('periodic_interval', 'heat.common.config')
+cfg.CONF.import_opt('watch_sample_buffers', 'heat.common.config')
+cfg.CONF.import_opt('watch_data_rollups', 'heat.common.config')
+
 
 class WatchRule(object):
     WATCH_STATES = (
@@ -48,7 +59,7 @@ class WatchRule(object):
     updated_at = timestamp.Timestamp(db_api.watch_rule_get, 'updated_at')
 
     def __init__(self, context, watch_name, rule, stack_id=None,
-                 state=NODATA, wid=None, watch_data=[],
+                 state=NODATA, wid=None, watch_data=None,
                  last_evaluated=timeutils.utcnow()):
         self.context = context
         self.now = timeutils.utcnow()
@@ -86,7 +97,6 @@ class WatchRule(object):
                        stack_id=watch.stack_id,
                        state=watch.state,
                        wid=watch.id,
-                       watch_data=watch.watch_data,
                        last_evaluated=watch.last_evaluated)
 
     def store(self):
@@ -105,8 +115,10 @@ class WatchRule(object):
         if not self.id:
             wr = db_api.watch_rule_create(self.context, wr_values)
             self.id = wr.id
+            _rule_index().rule_created(self.id, self.state, self.rule)
         else:
             db_api.watch_rule_update(self.context, self.id, wr_values)
+            _rule_index().add(self.id, self.state, self.rule)
 
     def destroy(self):
         '''
@@ -114,6 +126,8 @@ class WatchRule(object):
         '''
         if self.id:
             db_api.watch_rule_delete(self.context, self.id)
+            _rule_index().rule_deleted(self.id)
+            _sample_buffers.pop(self.id, None)
 
     def do_data_cmp(self, data, threshold):
         op = self.rule['ComparisonOperator']
@@ -128,43 +142,107 @@ class WatchRule(object):
         else:
             return False
 
-    def do_Maximum(self):
-        data = 0
-        have_data = False
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            if not have_data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-                have_data = True
-            if float(d.data[self.rule['MetricName']]['Value']) > data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
+    def _period_samples(self):
+        '''
+        Return the samples which fall inside the current evaluation period
+        '''
+        since = self.now - self.timeperiod
+        if self.watch_data is None:
+            if not self.id:
+                return []
+            return db_api.watch_data_get_all_by_watch_rule(self.context,
+                                                           self.id,
+                                                           since=since)
+        return [d for d in self.watch_data if d.created_at >= since]
+
+    def _period_rollups(self):
+        '''
+        Return the rollups of expired samples which fall inside the current
+        evaluation period, if samples are rolled up when they expire.
+        '''
+        if (not cfg.CONF.watch_data_rollups or
+                self.watch_data is not None or not self.id):
+            return []
+        return db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.context, self.id, since=self.now - self.timeperiod)
+
+    def _sample_value(self, sample):
+        if sample.value is not None:
+            return sample.value
+        return float(sample.data[self.rule['MetricName']]['Value'])
 
-        if not have_data:
+    def _sample_buffer(self):
+        '''
+        Return the in-memory buffer of this rule's recent samples, warming
+        it from the database if this engine has not yet buffered the rule.
+        '''
+        buf = _sample_buffers.get(self.id)
+        if buf is None or buf.period != self.timeperiod:
+            buf = SampleBuffer(self.timeperiod)
+            now = timeutils.utcnow()
+            for d in db_api.watch_data_get_all_by_watch_rule(
+                    self.context, self.id, since=now - buf.period):
+                buf.append(d.created_at, self._sample_value(d))
+            _sample_buffers[self.id] = buf
+        return buf
+
+    def _period_statistics(self):
+        '''
+        Return the minimum, maximum, sum and count of the samples inside the
+        current evaluation period. Stored samples are read from the engine's
+        sample buffer if enabled, or else aggregated by the database, unless
+        some predate the numeric value column and so have to be decoded from
+        their JSON data here instead. Rollups of samples which have expired
+        from the database are combined with the samples that remain.
+        '''
+        if self.watch_data is None and self.id:
+            if cfg.CONF.watch_sample_buffers:
+                return self._sample_buffer().statistics(self.now)
+            stats = db_api.watch_data_statistics(
+                self.context, self.id, since=self.now - self.timeperiod)
+            if stats['value_count'] != stats['sample_count']:
+                stats = self._sample_statistics()
+        else:
+            stats = self._sample_statistics()
+
+        for rollup in self._period_rollups():
+            if stats['value_count']:
+                stats['minimum'] = min(stats['minimum'], rollup.minimum)
+                stats['maximum'] = max(stats['maximum'], rollup.maximum)
+                stats['sum'] += rollup.sum
+            else:
+                stats['minimum'] = rollup.minimum
+                stats['maximum'] = rollup.maximum
+                stats['sum'] = rollup.sum
+            stats['sample_count'] += rollup.sample_count
+            stats['value_count'] += rollup.sample_count
+        return stats
+
+    def _sample_statistics(self):
+        values = [self._sample_value(d) for d in self._period_samples()]
+        return {'minimum': min(values) if values else None,
+                'maximum': max(values) if values else None,
+                'sum': sum(values) if values else None,
+                'sample_count': len(values),
+                'value_count': len(values)}
+
+    def do_Maximum(self):
+        stats = self._period_statistics()
+        if not stats['value_count']:
             return self.NODATA
 
-        if self.do_data_cmp(data,
+        if self.do_data_cmp(stats['maximum'],
                             float(self.rule['Threshold'])):
             return self.ALARM
         else:
             return self.NORMAL
 
     def do_Minimum(self):
-        data = 0
-        have_data = False
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            if not have_data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-                have_data = True
-            elif float(d.data[self.rule['MetricName']]['Value']) < data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-
-        if not have_data:
+        stats = self._period_statistics()
+        if not stats['value_count']:
             return self.NODATA
 
-        if self.do_data_cmp(data,
+        if self.do_data_cmp(stats['minimum'],
                             float(self.rule['Threshold'])):
             return self.ALARM
         else:
@@ -174,11 +252,7 @@ class WatchRule(object):
         '''
         count all samples within the specified period
         '''
-        data = 0
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            data = data + 1
+        data = self._period_statistics()['sample_count']
 
         if self.do_data_cmp(data,
                             float(self.rule['Threshold'])):
@@ -187,18 +261,11 @@ class WatchRule(object):
             return self.NORMAL
 
     def do_Average(self):
-        data = 0
-        samples = 0
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            samples = samples + 1
-            data = data + float(d.data[self.rule['MetricName']]['Value'])
-
-        if samples == 0:
+        stats = self._period_statistics()
+        if not stats['value_count']:
             return self.NODATA
 
-        data = data / samples
+        data = stats['sum'] / stats['value_count']
         if self.do_data_cmp(data,
                             float(self.rule['Threshold'])):
             return self.ALARM
@@ -206,12 +273,35 @@ class WatchRule(object):
             return self.NORMAL
 
     def do_Sum(self):
-        data = 0
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                logger.debug('ignoring %s' % str(d.data))
-                continue
-            data = data + float(d.data[self.rule['MetricName']]['Value'])
+        data = self._period_statistics()['sum'] or 0
+
+        if self.do_data_cmp(data,
+                            float(self.rule['Threshold'])):
+            return self.ALARM
+        else:
+            return self.NORMAL
+
+    def _period_percentile(self, q):
+        '''
+        Return an estimate of the q-quantile of the samples inside the
+        current evaluation period, or None if there are none.
+        '''
+        if (self.watch_data is None and self.id and
+                cfg.CONF.watch_sample_buffers):
+            return self._sample_buffer().percentile(self.now, q)
+
+        summary = sketch.DDSketch()
+        for d in self._period_samples():
+            summary.add(self._sample_value(d))
+        for rollup in self._period_rollups():
+            summary.merge(sketch.DDSketch.from_dict(rollup.sketch))
+        return summary.quantile(q)
+
+    def do_ExtendedStatistic(self):
+        q = parse_percentile(self.rule['ExtendedStatistic'])
+        data = self._period_percentile(q)
+        if data is None:
+            return self.NODATA
 
         if self.do_data_cmp(data,
                             float(self.rule['Threshold'])):
@@ -220,15 +310,25 @@ class WatchRule(object):
             return self.NORMAL
 
     def get_alarm_state(self):
+        if self.rule.get('ExtendedStatistic'):
+            return self.do_ExtendedStatistic()
         fn = getattr(self, 'do_%s' % self.rule['Statistic'])
         return fn()
 
+    def is_due(self, now=None):
+        '''
+        Return True if enough time has progressed to run the rule again
+        '''
+        if now is None:
+            now = timeutils.utcnow()
+        return now >= self.last_evaluated + self.timeperiod
+
     def evaluate(self):
         if self.state == self.SUSPENDED:
             return []
         # has enough time progressed to run the rule
         self.now = timeutils.utcnow()
-        if self.now < (self.last_evaluated + self.timeperiod):
+        if not self.is_due(self.now):
             return []
         return self.run_rule()
 
@@ -284,7 +384,12 @@ class WatchRule(object):
             logger.debug('new sample:%s data:%s' % (k, sample))
             clients.ceilometer().samples.create(**sample)
 
-    def create_watch_data(self, data):
+    def accept_watch_data(self, data):
+        '''
+        Return the watch_data values to store for a sample pushed to this
+        rule, or None if the rule does not keep the sample. Samples for
+        Ceilometer-controlled rules are forwarded to Ceilometer instead.
+        '''
         if self.state == self.CEILOMETER_CONTROLLED:
             # this is a short term measure for those that have cfn-push-stats
             # within their templates, but want to use Ceilometer alarms.
@@ -295,7 +400,7 @@ class WatchRule(object):
         if self.state == self.SUSPENDED:
             logger.debug('Ignoring metric data for %s, SUSPENDED state'
                          % self.name)
-            return []
+            return
 
         if self.rule['MetricName'] not in data:
             # Our simplified cloudwatch implementation only expects a single
@@ -307,11 +412,23 @@ class WatchRule(object):
                         (self.rule['MetricName'], data))
             return
 
-        watch_data = {
+        datapoint = data[self.rule['MetricName']]
+        return {
             'data': data,
-            'watch_rule_id': self.id
+            'value': float(datapoint['Value']),
+            'unit': datapoint.get('Unit'),
+            'namespace': data.get('Namespace'),
+            'metric_name': self.rule['MetricName'],
+            'watch_rule_id': self.id,
+            'created_at': timeutils.utcnow()
         }
+
+    def create_watch_data(self, data):
+        watch_data = self.accept_watch_data(data)
+        if watch_data is None:
+            return
         wd = db_api.watch_data_create(None, watch_data)
+        buffer_watch_data([watch_data])
         logger.debug('new watch:%s data:%s' % (self.name, str(wd.data)))
 
     def state_set(self, state):
@@ -345,6 +462,168 @@ class WatchRule(object):
         return actions
 
 
+def parse_percentile(statistic):
+    '''
+    Return the quantile, between 0 and 1, named by a percentile extended
+    statistic such as p90 or p99.9. Raises ValueError for anything else.
+    '''
+    match = re.match(r'^p(\d+(\.\d+)?)$', statistic or '')
+    if match is None or not 0 <= float(match.group(1)) <= 100:
+        raise ValueError(_('Invalid extended statistic "%s", must be a '
+                           'percentile from p0 to p100') % statistic)
+    return float(match.group(1)) / 100
+
+
+class SampleBuffer(object):
+    '''
+    The samples of one watch rule from its latest Period, with their
+    statistics kept up to date incrementally as samples are added and
+    expire. The
+    distribution of the samples is also summarised in a streaming sketch for
+    each tenth of a Period, from which percentiles are estimated.
+    '''
+
+    BUCKETS_PER_PERIOD = 10
+
+    def __init__(self, period):
+        self.period = period
+        self.bucket = max(period // self.BUCKETS_PER_PERIOD,
+                          datetime.timedelta(seconds=1))
+        # (bucket start, sketch) for each bucket, in time order
+        self._sketches = collections.deque()
+        self._seq = 0
+        # Samples from the latest Period, in time order
+        self._current = collections.deque()
+        # Candidates for the current minimum and maximum, in time order
+        self._minima = collections.deque()
+        self._maxima = collections.deque()
+        self._sum = 0.0
+
+    def __len__(self):
+        return len(self._current)
+
+    def append(self, timestamp, value):
+        '''
+        Add a sample. Samples should be added in time order, as one added out
+        of order expires only after those added before it.
+        '''
+        self._seq += 1
+        sample = (self._seq, timestamp, value)
+        self._current.append(sample)
+        self._sum += value
+        while self._minima and self._minima[-1][2] >= value:
+            self._minima.pop()
+        self._minima.append(sample)
+        while self._maxima and self._maxima[-1][2] <= value:
+            self._maxima.pop()
+        self._maxima.append(sample)
+
+        start = _floor_time(timestamp, self.bucket)
+        if not self._sketches or self._sketches[-1][0] < start:
+            self._sketches.append((start, sketch.DDSketch()))
+        self._sketches[-1][1].add(value)
+
+    def _expire(self, now):
+        since = now - self.period
+        while self._current and self._current[0][1] < since:
+            sample = self._current.popleft()
+            self._sum -= sample[2]
+            if self._minima[0] is sample:
+                self._minima.popleft()
+            if self._maxima[0] is sample:
+                self._maxima.popleft()
+        if not self._current:
+            # Don't let rounding errors accumulate
+            self._sum = 0.0
+
+        while (self._sketches and
+               self._sketches[0][0] + self.bucket <= since):
+            self._sketches.popleft()
+
+    def statistics(self, now):
+        '''
+        Return the minimum, maximum, sum and count of the samples in the
+        Period before now.
+        '''
+        self._expire(now)
+        count = len(self._current)
+        return {'minimum': self._minima[0][2] if count else None,
+                'maximum': self._maxima[0][2] if count else None,
+                'sum': self._sum if count else None,
+                'sample_count': count,
+                'value_count': count}
+
+    def percentile(self, now, q):
+        '''
+        Return an estimate of the q-quantile of the samples in the Period
+        before now, or None if there are none. The estimate may include
+        samples from up to one tenth of a Period earlier.
+        '''
+        self._expire(now)
+        if not self._current:
+            return None
+        since = now - self.period
+        summary = sketch.DDSketch()
+        for start, bucket_sketch in self._sketches:
+            if start + self.bucket > since:
+                summary.merge(bucket_sketch)
+        return summary.quantile(q)
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _floor_time(timestamp, resolution):
+    '''Round a datetime down to a whole multiple of a timedelta.'''
+    seconds = int(timeutils.delta_seconds(_EPOCH, timestamp))
+    step = max(int(timeutils.delta_seconds(_EPOCH, _EPOCH + resolution)), 1)
+    return _EPOCH + datetime.timedelta(seconds=seconds - seconds % step)
+
+
+# Sample buffers for the watch rules evaluated by this engine, by rule ID
+_sample_buffers = {}
+
+
+def buffer_watch_data(watch_data):
+    '''
+    Add newly stored watch_data values to the buffers of their rules, with
+    the same timestamps as they were stored with. Rules without a buffer yet
+    are skipped, as the samples will be read from the database when the
+    buffer is created.
+    '''
+    for values in watch_data:
+        buf = _sample_buffers.get(values['watch_rule_id'])
+        if buf is not None:
+            buf.append(values['created_at'], values['value'])
+
+
+def _rule_metric_dimensions(state, rule):
+    '''
+    Return the metric name a rule alarms on, and the dimensions a sample
+    must match for the rule to use it
+    '''
+    if state == WatchRule.CEILOMETER_CONTROLLED:
+        metric = rule.get('meter_name')
+        rule_dims = {}
+        for k, v in iter(rule.get('matching_metadata', {}).items()):
+            name = k.split('.')[-1]
+            rule_dims[name] = v
+    else:
+        metric = rule.get('MetricName')
+        rule_dims = dict((d['Name'], d['Value'])
+                         for d in rule.get('Dimensions', []))
+    return metric, rule_dims
+
+
+def _sample_dimensions(datapoint):
+    data_dims = {}
+    if isinstance(datapoint, dict):
+        data_dims = datapoint.get('Dimensions', {})
+    if isinstance(data_dims, list):
+        data_dims = data_dims[0] if data_dims else {}
+    return data_dims
+
+
 def rule_can_use_sample(wr, stats_data):
     def match_dimesions(rule, data):
         for k, v in iter(rule.items()):
@@ -356,16 +635,7 @@ def rule_can_use_sample(wr, stats_data):
 
     if wr.state == WatchRule.SUSPENDED:
         return False
-    if wr.state == WatchRule.CEILOMETER_CONTROLLED:
-        metric = wr.rule['meter_name']
-        rule_dims = {}
-        for k, v in iter(wr.rule.get('matching_metadata', {}).items()):
-            name = k.split('.')[-1]
-            rule_dims[name] = v
-    else:
-        metric = wr.rule['MetricName']
-        rule_dims = dict((d['Name'], d['Value'])
-                         for d in wr.rule.get('Dimensions', []))
+    metric, rule_dims = _rule_metric_dimensions(wr.state, wr.rule)
 
     if metric not in stats_data:
         return False
@@ -374,9 +644,195 @@ def rule_can_use_sample(wr, stats_data):
         if k == 'Namespace':
             continue
         if k == metric:
-            data_dims = v.get('Dimensions', {})
-            if isinstance(data_dims, list):
-                data_dims = data_dims[0]
-            if match_dimesions(rule_dims, data_dims):
+            if match_dimesions(rule_dims, _sample_dimensions(v)):
                 return True
     return False
+
+
+class WatchRuleIndex(object):
+    '''
+    Maps each (metric name, dimension set) to the IDs of the watch rules
+    alarming on it, so that incoming samples can be routed to the rules
+    which may use them without checking every rule.
+    '''
+
+    # How often to check whether rules have been created or deleted elsewhere
+    CHECK_INTERVAL = datetime.timedelta(seconds=10)
+
+    def __init__(self):
+        self.signature = None
+        self.built_at = None
+        self.checked_at = None
+        self._rules = {}
+        self._index = {}
+
+    @staticmethod
+    def _key(state, rule):
+        try:
+            metric, rule_dims = _rule_metric_dimensions(state, rule)
+            return metric, frozenset(rule_dims.items())
+        except (KeyError, TypeError, AttributeError):
+            # Malformed or unhashable dimensions; no sample could match them
+            return None, None
+
+    def rebuild(self, rules, signature=None):
+        '''Replace the contents of the index with the given rules.'''
+        self._rules = {}
+        self._index = {}
+        for wr in rules:
+            self.add(wr.id, wr.state, wr.rule)
+        self.signature = signature
+        self.built_at = self.checked_at = timeutils.utcnow()
+
+    def add(self, wid, state, rule):
+        '''Add a rule to the index, replacing any previous entry.'''
+        self.remove(wid)
+        metric, dims = self._key(state, rule)
+        if metric is None:
+            return
+        self._rules[wid] = (metric, dims)
+        self._index.setdefault(metric, {}).setdefault(dims, set()).add(wid)
+
+    def remove(self, wid):
+        '''Remove a rule from the index, if present.'''
+        key = self._rules.pop(wid, None)
+        if key is None:
+            return
+        metric, dims = key
+        by_dims = self._index[metric]
+        by_dims[dims].discard(wid)
+        if not by_dims[dims]:
+            del by_dims[dims]
+        if not by_dims:
+            del self._index[metric]
+
+    def rule_created(self, wid, state, rule):
+        '''
+        Add a rule just created by this engine, and update the signature to
+        include it so that this alone does not cause a rebuild.
+        '''
+        self.add(wid, state, rule)
+        if self.signature is not None:
+            count, max_id = self.signature
+            if max_id is None or wid > max_id:
+                max_id = wid
+            self.signature = (count + 1, max_id)
+
+    def rule_deleted(self, wid):
+        '''
+        Remove a rule just deleted by this engine, and update the signature
+        to exclude it, unless the highest rule ID is no longer known.
+        '''
+        self.remove(wid)
+        if self.signature is not None:
+            count, max_id = self.signature
+            if wid == max_id:
+                self.signature = None
+            else:
+                self.signature = (count - 1, max_id)
+
+    def candidates(self, stats_data):
+        '''
+        Return the IDs of all rules whose metric is in the sample and whose
+        dimensions are a subset of the sample's dimensions.
+        '''
+        wids = set()
+        for metric, datapoint in iter(stats_data.items()):
+            if metric == 'Namespace' or metric not in self._index:
+                continue
+            by_dims = self._index[metric]
+            items = set()
+            for item in _sample_dimensions(datapoint).items():
+                try:
+                    hash(item)
+                except TypeError:
+                    continue
+                items.add(item)
+
+            if 2 ** len(items) <= len(by_dims):
+                # Few sample dimensions: look up every subset of them
+                for n in range(len(items) + 1):
+                    for subset in itertools.combinations(items, n):
+                        wids.update(by_dims.get(frozenset(subset), ()))
+            else:
+                for dims, rule_ids in iter(by_dims.items()):
+                    if dims <= items:
+                        wids.update(rule_ids)
+        return wids
+
+
+_index = None
+
+
+def _rule_index():
+    global _index
+    if _index is None:
+        _index = WatchRuleIndex()
+    return _index
+
+
+def route_samples(context, samples):
+    '''
+    Return (rule, sample) pairs for every stored watch rule which can use
+    each of the given samples.
+
+    Rules created, updated or deleted by this engine are applied to the
+    index as they are stored. The index is rebuilt when rules have been
+    created or deleted elsewhere, which is checked at most every
+    CHECK_INTERVAL from the rule count and highest rule ID, and at least
+    every periodic_interval to pick up rules updated by other engines. All
+    of the candidate rules are fetched in a single query.
+    '''
+    index = _rule_index()
+    now = timeutils.utcnow()
+    max_age = datetime.timedelta(seconds=cfg.CONF.periodic_interval)
+    if index.built_at is None or now - index.built_at > max_age:
+        signature = db_api.watch_rule_signature(context)
+        index.rebuild(db_api.watch_rule_get_all(context), signature)
+    elif now - index.checked_at >= index.CHECK_INTERVAL:
+        signature = db_api.watch_rule_signature(context)
+        if signature != index.signature:
+            index.rebuild(db_api.watch_rule_get_all(context), signature)
+        else:
+            index.checked_at = now
+
+    candidates = [index.candidates(stats_data) for stats_data in samples]
+    wids = set().union(*candidates)
+    if not wids:
+        return []
+    rules = dict((wr.id, wr) for wr in
+                 db_api.watch_rule_get_all_by_ids(context, wids))
+
+    routed = []
+    for stats_data, sample_wids in zip(samples, candidates):
+        for wid in sorted(sample_wids):
+            wr = rules.get(wid)
+            if wr is not None and rule_can_use_sample(wr, stats_data):
+                routed.append((wr, stats_data))
+    return routed
+
+
+def pop_watch_name(stats_data):
+    '''
+    Remove the AlarmName dimension, which names the watch that a sample is
+    for, from the sample's datapoints and return it, or None if the sample
+    does not name a watch.
+    '''
+    watch_name = None
+    for key, datapoint in stats_data.items():
+        if key == 'Namespace' or not isinstance(datapoint, dict):
+            continue
+        dimensions = datapoint.get('Dimensions') or []
+        names = [d['AlarmName'] for d in dimensions if 'AlarmName' in d]
+        if names:
+            watch_name = names[-1]
+            datapoint['Dimensions'] = [d for d in dimensions
+                                       if 'AlarmName' not in d]
+    return watch_name
+
+
+def get_matching_rules(context, stats_data):
+    '''
+    Return the stored watch rules which can use the given sample.
+    '''
+    return [wr for wr, data in route_samples(context, [stats_data])]
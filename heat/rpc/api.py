@@ -91,6 +91,7 @@ WATCH_KEYS = (
     WATCH_OK_ACTIONS, WATCH_PERIOD, WATCH_STATE_REASON,
     WATCH_STATE_REASON_DATA, WATCH_STATE_UPDATED_TIME, WATCH_STATE_VALUE,
     WATCH_STATISTIC, WATCH_THRESHOLD, WATCH_UNIT, WATCH_STACK_ID,
+    WATCH_ID,
 ) = (
     'actions_enabled', 'actions', 'topic',
     'updated_time', 'description', 'name',
@@ -99,6 +100,7 @@ WATCH_KEYS = (
     'ok_actions', 'period', 'state_reason',
     'state_reason_data', 'state_updated_time', 'state_value',
     'statistic', 'threshold', 'unit', 'stack_id',
+    'id',
 )
 
 # Alternate representation of a watch rule to align with DB format
@@ -135,10 +137,10 @@ WATCH_STATES = (
 )
 
 WATCH_DATA_KEYS = (
-    WATCH_DATA_ALARM, WATCH_DATA_METRIC, WATCH_DATA_TIME,
+    WATCH_DATA_ID, WATCH_DATA_ALARM, WATCH_DATA_METRIC, WATCH_DATA_TIME,
     WATCH_DATA_NAMESPACE, WATCH_DATA
 ) = (
-    'watch_name', 'metric_name', 'timestamp',
+    'id', 'watch_name', 'metric_name', 'timestamp',
     'namespace', 'data'
 )
 
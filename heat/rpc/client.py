@@ -58,13 +58,21 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
         """
         return self.call(ctxt, self.make_msg('list_stacks'))
 
-    def show_stack(self, ctxt, stack_identity):
+    def show_stack(self, ctxt, stack_identity, refresh_outputs=False):
         """
         Return detailed information about one or all stacks.
         :param ctxt: RPC context.
         :param stack_identity: Name of the stack you want to show, or None to
         show all
-        """
+        :param refresh_outputs: Resolve the stack outputs again, rather than
+        using the values stored when the stack was completed
+        """
+        # Only send the argument when it is needed, so that the message is
+        # understood by engines which do not store outputs
+        if refresh_outputs:
+            return self.call(ctxt, self.make_msg('show_stack',
+                                                 stack_identity=stack_identity,
+                                                 refresh_outputs=True))
         return self.call(ctxt, self.make_msg('show_stack',
                                              stack_identity=stack_identity))
 
@@ -268,13 +276,15 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
         and treat HA service events like any other CloudWatch.
         :param ctxt: RPC context.
         :param watch_name: Name of the watch/alarm
-        :param stats_data: The data to post.
+        :param stats_data: The data to post, either a single datapoint or a
+                           list of datapoints.
         '''
         return self.call(ctxt, self.make_msg('create_watch_data',
                                              watch_name=watch_name,
                                              stats_data=stats_data))
 
-    def show_watch(self, ctxt, watch_name):
+    def show_watch(self, ctxt, watch_name, state=None, name_prefix=None,
+                   limit=None, marker=None):
         """
         The show_watch method returns the attributes of one watch
         or all watches if no watch_name is passed
@@ -282,11 +292,27 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
         :param ctxt: RPC context.
         :param watch_name: Name of the watch/alarm you want to see,
                            or None to see all
-        """
+        :param state: State of the watches to see, or None to see all
+        :param name_prefix: Prefix of the names of the watches to see,
+                            or None to see all
+        :param limit: Maximum number of watches to return, or None for all
+        :param marker: ID of the last watch of the previous page, or None
+                       to start from the first
+        """
+        # Only send the filtering and paging arguments when they are needed,
+        # so that the message is understood by engines which do not support
+        # them
+        filters = dict((k, v) for k, v in (('state', state),
+                                           ('name_prefix', name_prefix),
+                                           ('limit', limit),
+                                           ('marker', marker))
+                       if v is not None)
         return self.call(ctxt, self.make_msg('show_watch',
-                                             watch_name=watch_name))
+                                             watch_name=watch_name,
+                                             **filters))
 
-    def show_watch_metric(self, ctxt, metric_namespace=None, metric_name=None):
+    def show_watch_metric(self, ctxt, metric_namespace=None, metric_name=None,
+                          limit=None, marker=None):
         """
         The show_watch_metric method returns the datapoints associated
         with a specified metric, or all metrics if no metric_name is passed
@@ -296,10 +322,19 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
                            or None to see all
         :param metric_name: Name of the metric you want to see,
                            or None to see all
-        """
+        :param limit: Maximum number of datapoints to return, or None for all
+        :param marker: ID of the last datapoint of the previous page, or None
+                       to start from the oldest
+        """
+        # Only send the paging arguments when they are needed, so that the
+        # message is understood by engines which do not page datapoints
+        paging = dict((k, v) for k, v in (('limit', limit),
+                                          ('marker', marker))
+                      if v is not None)
         return self.call(ctxt, self.make_msg('show_watch_metric',
                                              metric_namespace=metric_namespace,
-                                             metric_name=metric_name))
+                                             metric_name=metric_name,
+                                             **paging))
 
     def set_watch_state(self, ctxt, watch_name, state):
         '''
@@ -23,6 +23,8 @@ import testtools
 
 from oslo.config import cfg
 
+from heat.common import heat_keystoneclient
+from heat.engine import clients
 from heat.engine import environment
 from heat.engine import resources
 from heat.engine import scheduler
@@ -55,6 +57,28 @@ class HeatTestCase(testtools.TestCase):
         cfg.CONF.set_default('environment_dir', env_dir)
         self.addCleanup(cfg.CONF.reset)
 
+        clients.client_cache().clear()
+        heat_keystoneclient.trust_client_cache().clear()
+
+        # Most tests fake changes to the status of servers and Neutron
+        # resources in individual requests, so only refresh them in batches
+        # when a test asks for it
+        cfg.CONF.set_override('server_status_poll_interval', 0)
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resources.nova_utils._server_pollers', {}))
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resources.nova_utils._caches', None))
+        cfg.CONF.set_override('neutron_status_poll_interval', 0)
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resources.neutron.neutron._status_pollers', {}))
+
+        # The watch rule index and sample buffers refer to rules by ID, so
+        # must not outlive the database used by each test
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.watchrule._index', None))
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.watchrule._sample_buffers', {}))
+
         tri = resources.global_env().get_resource_info(
             'AWS::RDS::DBInstance',
             registry_type=environment.TemplateResourceInfo)
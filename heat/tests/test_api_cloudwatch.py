@@ -173,6 +173,51 @@ class WatchControllerTest(HeatTestCase):
         # Call the list controller function and compare the response
         self.assertEqual(expected, self.controller.describe_alarms(dummy_req))
 
+    def test_describe_filtered_page(self):
+        params = {'Action': 'DescribeAlarms',
+                  'StateValue': 'INSUFFICIENT_DATA',
+                  'AlarmNamePrefix': 'Http',
+                  'MaxRecords': '1',
+                  'NextToken': '4'}
+        dummy_req = self._dummy_GET_request(params)
+
+        engine_resp = [{u'id': 5,
+                        u'name': u'HttpFailureAlarm',
+                        u'stack_id': u'21617058-781e-4262-97ab-5f9df371ee52',
+                        u'state_value': u'NODATA',
+                        u'dimensions': []}]
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(dummy_req.context, self.topic,
+                 {'namespace': None,
+                  'args': {'watch_name': None, 'state': 'NODATA',
+                           'name_prefix': 'Http', 'limit': 1,
+                           'marker': 4},
+                  'method': 'show_watch',
+                  'version': self.api_version},
+                 None).AndReturn(engine_resp)
+
+        self.m.ReplayAll()
+
+        result = self.controller.describe_alarms(dummy_req)
+        response = result['DescribeAlarmsResponse']['DescribeAlarmsResult']
+        self.assertEqual([u'HttpFailureAlarm'],
+                         [a['AlarmName'] for a in response['MetricAlarms']])
+        self.assertEqual('5', response['NextToken'])
+        self.m.VerifyAll()
+
+    def test_describe_bad_params(self):
+        for params in ({'StateValue': 'BROKEN'},
+                       {'MaxRecords': '0'},
+                       {'MaxRecords': '101'},
+                       {'MaxRecords': 'many'},
+                       {'NextToken': 'foo'}):
+            params['Action'] = 'DescribeAlarms'
+            dummy_req = self._dummy_GET_request(params)
+            result = self.controller.describe_alarms(dummy_req)
+            self.assertEqual(exception.HeatInvalidParameterValueError,
+                             type(result))
+
     def test_describe_alarms_for_metric(self):
         # Not yet implemented, should raise HeatAPINotImplementedError
         params = {'Action': 'DescribeAlarmsForMetric'}
@@ -227,12 +272,10 @@ class WatchControllerTest(HeatTestCase):
                         u'data': {u'Units': u'Counter', u'Value': 1}}]
 
         self.m.StubOutWithMock(rpc, 'call')
-        # Current engine implementation means we filter in the API
-        # and pass None/None for namespace/watch_name which returns
-        # all metric data which we post-process in the API
         rpc.call(dummy_req.context, self.topic,
                  {'namespace': None,
-                  'args': {'metric_namespace': None, 'metric_name': None},
+                  'args': {'metric_namespace': None, 'metric_name': None,
+                           'limit': 500},
                   'method': 'show_watch_metric',
                   'version': self.api_version},
                  None).AndReturn(engine_resp)
@@ -285,34 +328,19 @@ class WatchControllerTest(HeatTestCase):
                   'MetricName': 'ServiceFailure'}
         dummy_req = self._dummy_GET_request(params)
 
-        # Stub out the RPC call to the engine with a pre-canned response
-        # We dummy three different metrics and namespaces to test
-        # filtering by parameter
+        # Stub out the RPC call to the engine with a pre-canned response,
+        # the engine having filtered by the MetricName
         engine_resp = [{u'timestamp': u'2012-08-30T15:09:02Z',
                         u'watch_name': u'HttpFailureAlarm',
                         u'namespace': u'system/linux',
                         u'metric_name': u'ServiceFailure',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
-
-                       {u'timestamp': u'2012-08-30T15:10:03Z',
-                        u'watch_name': u'HttpFailureAlarm2',
-                        u'namespace': u'system/linux2',
-                        u'metric_name': u'ServiceFailure2',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
-
-                       {u'timestamp': u'2012-08-30T15:16:03Z',
-                        u'watch_name': u'HttpFailureAlar3m',
-                        u'namespace': u'system/linux3',
-                        u'metric_name': u'ServiceFailure3',
                         u'data': {u'Units': u'Counter', u'Value': 1}}]
 
         self.m.StubOutWithMock(rpc, 'call')
-        # Current engine implementation means we filter in the API
-        # and pass None/None for namespace/watch_name which returns
-        # all metric data which we post-process in the API
         rpc.call(dummy_req.context, self.topic, {'args':
                  {'metric_namespace': None,
-                  'metric_name': None},
+                  'metric_name': 'ServiceFailure',
+                  'limit': 500},
                  'namespace': None,
                  'method': 'show_watch_metric',
                  'version': self.api_version},
@@ -334,20 +362,16 @@ class WatchControllerTest(HeatTestCase):
                          {'Name': u'Value',
                           'Value': 1}],
                         'MetricName': u'ServiceFailure'}]}}}
-        # First pass no query paramters filtering, should get all three
         self.assertEqual(expected, self.controller.list_metrics(dummy_req))
 
     def test_list_metrics_filter_namespace(self):
 
-        # Add a Namespace filter and change the engine response so
-        # we should get two reponses
+        # Add a Namespace filter, which the engine applies
         params = {'Action': 'ListMetrics',
                   'Namespace': 'atestnamespace/foo'}
         dummy_req = self._dummy_GET_request(params)
 
         # Stub out the RPC call to the engine with a pre-canned response
-        # We dummy three different metrics and namespaces to test
-        # filtering by parameter
         engine_resp = [{u'timestamp': u'2012-08-30T15:09:02Z',
                         u'watch_name': u'HttpFailureAlarm',
                         u'namespace': u'atestnamespace/foo',
@@ -358,20 +382,13 @@ class WatchControllerTest(HeatTestCase):
                         u'watch_name': u'HttpFailureAlarm2',
                         u'namespace': u'atestnamespace/foo',
                         u'metric_name': u'ServiceFailure2',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
-
-                       {u'timestamp': u'2012-08-30T15:16:03Z',
-                        u'watch_name': u'HttpFailureAlar3m',
-                        u'namespace': u'system/linux3',
-                        u'metric_name': u'ServiceFailure3',
                         u'data': {u'Units': u'Counter', u'Value': 1}}]
 
         self.m.StubOutWithMock(rpc, 'call')
-        # Current engine implementation means we filter in the API
-        # and pass None/None for namespace/watch_name which returns
-        # all metric data which we post-process in the API
         rpc.call(dummy_req.context, self.topic,
-                 {'args': {'metric_namespace': None, 'metric_name': None},
+                 {'args': {'metric_namespace': 'atestnamespace/foo',
+                           'metric_name': None,
+                           'limit': 500},
                   'namespace': None,
                   'method': 'show_watch_metric',
                   'version': self.api_version},
@@ -406,6 +423,49 @@ class WatchControllerTest(HeatTestCase):
                         'MetricName': u'ServiceFailure2'}]}}}
         self.assertEqual(expected, self.controller.list_metrics(dummy_req))
 
+    def test_list_metrics_next_token(self):
+        params = {'Action': 'ListMetrics', 'NextToken': '3'}
+        dummy_req = self._dummy_GET_request(params)
+        self.controller.METRICS_PAGE_SIZE = 2
+
+        engine_resp = [{u'id': 4,
+                        u'timestamp': u'2012-08-30T15:09:02Z',
+                        u'watch_name': u'HttpFailureAlarm',
+                        u'namespace': u'system/linux',
+                        u'metric_name': u'ServiceFailure',
+                        u'data': {u'Value': 1}},
+                       {u'id': 7,
+                        u'timestamp': u'2012-08-30T15:10:03Z',
+                        u'watch_name': u'HttpFailureAlarm',
+                        u'namespace': u'system/linux',
+                        u'metric_name': u'ServiceFailure',
+                        u'data': {u'Value': 2}}]
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(dummy_req.context, self.topic,
+                 {'args': {'metric_namespace': None, 'metric_name': None,
+                           'limit': 2, 'marker': 3},
+                  'namespace': None,
+                  'method': 'show_watch_metric',
+                  'version': self.api_version},
+                 None).AndReturn(engine_resp)
+
+        self.m.ReplayAll()
+
+        result = self.controller.list_metrics(dummy_req)
+        response = result['ListMetricsResponse']['ListMetricsResult']
+        self.assertEqual(2, len(response['Metrics']))
+        # A full page means there may be more to fetch
+        self.assertEqual('7', response['NextToken'])
+        self.m.VerifyAll()
+
+    def test_list_metrics_bad_next_token(self):
+        params = {'Action': 'ListMetrics', 'NextToken': 'foo'}
+        dummy_req = self._dummy_GET_request(params)
+        result = self.controller.list_metrics(dummy_req)
+        self.assertEqual(exception.HeatInvalidParameterValueError,
+                         type(result))
+
     def test_put_metric_alarm(self):
         # Not yet implemented, should raise HeatAPINotImplementedError
         params = {'Action': 'PutMetricAlarm'}
@@ -451,6 +511,121 @@ class WatchControllerTest(HeatTestCase):
                     {'ResponseMetadata': None}}}
         self.assertEqual(expected, self.controller.put_metric_data(dummy_req))
 
+    def test_put_metric_data_multiple(self):
+
+        params = {u'Namespace': u'system/linux',
+                  u'MetricData.member.1.Unit': u'Count',
+                  u'MetricData.member.1.Value': u'1',
+                  u'MetricData.member.1.MetricName': u'ServiceFailure',
+                  u'MetricData.member.1.Dimensions.member.1.Name':
+                  u'InstanceId',
+                  u'MetricData.member.1.Dimensions.member.1.Value':
+                  u'i-1',
+                  u'MetricData.member.2.Unit': u'Percent',
+                  u'MetricData.member.2.Value': u'75',
+                  u'MetricData.member.2.MetricName': u'CPUUtilization',
+                  u'MetricData.member.2.Dimensions.member.1.Name':
+                  u'InstanceId',
+                  u'MetricData.member.2.Dimensions.member.1.Value':
+                  u'i-2',
+                  u'Action': u'PutMetricData'}
+
+        dummy_req = self._dummy_GET_request(params)
+
+        # Every datapoint is passed to the engine in a single call
+        engine_resp = {}
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(dummy_req.context, self.topic,
+                 {'args':
+                  {'stats_data': [
+                      {'Namespace': u'system/linux',
+                       u'ServiceFailure':
+                       {'Value': u'1',
+                        'Unit': u'Count',
+                        'Dimensions': [{u'InstanceId': u'i-1'}]}},
+                      {'Namespace': u'system/linux',
+                       u'CPUUtilization':
+                       {'Value': u'75',
+                        'Unit': u'Percent',
+                        'Dimensions': [{u'InstanceId': u'i-2'}]}}],
+                   'watch_name': None},
+                  'namespace': None,
+                  'method': 'create_watch_data',
+                  'version': self.api_version},
+                 None).AndReturn(engine_resp)
+
+        self.m.ReplayAll()
+
+        expected = {'PutMetricDataResponse': {'PutMetricDataResult':
+                    {'ResponseMetadata': None}}}
+        self.assertEqual(expected, self.controller.put_metric_data(dummy_req))
+
+    def test_put_metric_data_mixed(self):
+
+        params = {u'Namespace': u'system/linux',
+                  u'MetricData.member.1.Unit': u'Count',
+                  u'MetricData.member.1.Value': u'1',
+                  u'MetricData.member.1.MetricName': u'ServiceFailure',
+                  u'MetricData.member.1.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.1.Dimensions.member.1.Value':
+                  u'HttpFailureAlarm',
+                  u'MetricData.member.2.Unit': u'Percent',
+                  u'MetricData.member.2.Value': u'75',
+                  u'MetricData.member.2.MetricName': u'CPUUtilization',
+                  u'MetricData.member.2.Dimensions.member.1.Name':
+                  u'InstanceId',
+                  u'MetricData.member.2.Dimensions.member.1.Value':
+                  u'i-2',
+                  u'MetricData.member.3.Unit': u'Count',
+                  u'MetricData.member.3.Value': u'2',
+                  u'MetricData.member.3.MetricName': u'ServiceFailure',
+                  u'MetricData.member.3.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.3.Dimensions.member.1.Value':
+                  u'HttpFailureAlarm',
+                  u'Action': u'PutMetricData'}
+
+        dummy_req = self._dummy_GET_request(params)
+
+        # Datapoints naming an alarm are sent in the same call as those
+        # which the engine routes by their dimensions, keeping the AlarmName
+        # dimension for the engine to route them by
+        engine_resp = {}
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(dummy_req.context, self.topic,
+                 {'args':
+                  {'stats_data': [
+                      {'Namespace': u'system/linux',
+                       u'ServiceFailure':
+                       {'Value': u'1',
+                        'Unit': u'Count',
+                        'Dimensions': [{'AlarmName': u'HttpFailureAlarm'}]}},
+                      {'Namespace': u'system/linux',
+                       u'CPUUtilization':
+                       {'Value': u'75',
+                        'Unit': u'Percent',
+                        'Dimensions': [{u'InstanceId': u'i-2'}]}},
+                      {'Namespace': u'system/linux',
+                       u'ServiceFailure':
+                       {'Value': u'2',
+                        'Unit': u'Count',
+                        'Dimensions': [{'AlarmName': u'HttpFailureAlarm'}]}}],
+                   'watch_name': None},
+                  'namespace': None,
+                  'method': 'create_watch_data',
+                  'version': self.api_version},
+                 None).AndReturn(engine_resp)
+
+        self.m.ReplayAll()
+
+        expected = {'PutMetricDataResponse': {'PutMetricDataResult':
+                    {'ResponseMetadata': None}}}
+        self.assertEqual(expected, self.controller.put_metric_data(dummy_req))
+        self.m.VerifyAll()
+
     def test_set_alarm_state(self):
         state_map = {'OK': engine_api.WATCH_STATE_OK,
                      'ALARM': engine_api.WATCH_STATE_ALARM,
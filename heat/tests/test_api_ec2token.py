@@ -15,6 +15,7 @@
 
 from heat.tests.common import HeatTestCase
 
+import fixtures
 import requests
 import json
 from oslo.config import cfg
@@ -33,7 +34,7 @@ class Ec2TokenTest(HeatTestCase):
 
     def setUp(self):
         super(Ec2TokenTest, self).setUp()
-        self.m.StubOutWithMock(requests, 'post')
+        self.m.StubOutWithMock(requests.Session, 'post')
 
     def _dummy_GET_request(self, params={}, environ={}):
         # Mangle the params dict into a query string
@@ -202,8 +203,9 @@ class Ec2TokenTest(HeatTestCase):
                                  "path": "/v1",
                                  "body_hash": body_hash}})
         req_headers = {'Content-Type': 'application/json'}
-        requests.post(req_url, data=req_creds,
-                      headers=req_headers).AndReturn(DummyHTTPResponse())
+        requests.Session.post(
+            req_url, data=req_creds,
+            headers=req_headers).AndReturn(DummyHTTPResponse())
 
     def test_call_ok(self):
         dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
@@ -493,3 +495,102 @@ class Ec2TokenTest(HeatTestCase):
         self.assertEqual(ec2.__call__(dummy_req), 'woot')
 
         self.m.VerifyAll()
+
+    def _cache_test_request(self):
+        params = {'AWSAccessKeyId': 'foo', 'Signature': 'xyz'}
+        req_env = {'SERVER_NAME': 'heat',
+                   'SERVER_PORT': '8000',
+                   'PATH_INFO': '/v1'}
+        return self._dummy_GET_request(params, req_env)
+
+    def test_call_ok_cached(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        ok_resp = json.dumps({'access': {'metadata': {}, 'token': {
+            'id': 123,
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        self._stub_http_connection(response=ok_resp,
+                                   params={'AWSAccessKeyId': 'foo'})
+        self.m.ReplayAll()
+        for i in range(2):
+            dummy_req = self._cache_test_request()
+            self.assertEqual(ec2.__call__(dummy_req), 'woot')
+            self.assertEqual(123, dummy_req.headers['X-Auth-Token'])
+            self.assertEqual('abcd1234', dummy_req.headers['X-Tenant-Id'])
+
+        self.m.VerifyAll()
+
+    def test_call_ok_cache_expires(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0', 'cache_ttl': '60'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+        self.now = 1000.0
+        self.useFixture(fixtures.MonkeyPatch('heat.common.cache.wallclock',
+                                             lambda: self.now))
+
+        ok_resp = json.dumps({'access': {'metadata': {}, 'token': {
+            'id': 123,
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        for i in range(2):
+            self._stub_http_connection(response=ok_resp,
+                                       params={'AWSAccessKeyId': 'foo'})
+        self.m.ReplayAll()
+
+        # Requests answered from the cache do not extend its lifetime
+        for i in range(4):
+            self.assertEqual(ec2.__call__(self._cache_test_request()),
+                             'woot')
+            self.now += 20
+
+        self.m.VerifyAll()
+
+    def test_call_ok_cached_until_token_expiry(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        expired_resp = json.dumps({'access': {'metadata': {}, 'token': {
+            'id': 123,
+            'expires': '2013-01-01T00:00:00Z',
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        for i in range(2):
+            self._stub_http_connection(response=expired_resp,
+                                       params={'AWSAccessKeyId': 'foo'})
+        self.m.ReplayAll()
+        for i in range(2):
+            self.assertEqual(ec2.__call__(self._cache_test_request()),
+                             'woot')
+
+        self.m.VerifyAll()
+
+    def test_call_ok_cache_disabled(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0', 'cache_ttl': '0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        ok_resp = json.dumps({'access': {'metadata': {}, 'token': {
+            'id': 123,
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        for i in range(2):
+            self._stub_http_connection(response=ok_resp,
+                                       params={'AWSAccessKeyId': 'foo'})
+        self.m.ReplayAll()
+        for i in range(2):
+            self.assertEqual(ec2.__call__(self._cache_test_request()),
+                             'woot')
+
+        self.m.VerifyAll()
+
+    def test_call_err_not_cached(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        err_msg = "EC2 access key not found."
+        err_resp = json.dumps({'error': {'message': err_msg}})
+        for i in range(2):
+            self._stub_http_connection(response=err_resp,
+                                       params={'AWSAccessKeyId': 'foo'})
+        self.m.ReplayAll()
+        for i in range(2):
+            self.assertRaises(exception.HeatInvalidClientTokenIdError,
+                              ec2.__call__, self._cache_test_request())
+
+        self.m.VerifyAll()
@@ -868,6 +868,41 @@ class StackControllerTest(ControllerTest, HeatTestCase):
         self.assertEqual(response, expected)
         self.m.VerifyAll()
 
+    def test_show_refresh_outputs(self):
+        identity = identifier.HeatIdentifier(self.tenant, 'wordpress', '6')
+
+        req = self._get('/stacks/%(stack_name)s/%(stack_id)s' % identity)
+        req.environ['QUERY_STRING'] = 'refresh_outputs=True'
+
+        outputs = [{u'output_key': u'WebsiteURL',
+                    u'description': u'URL for Wordpress wiki',
+                    u'output_value': u'http://10.0.0.8/wordpress'}]
+        engine_resp = [
+            {
+                u'stack_identity': dict(identity),
+                u'outputs': outputs,
+                u'stack_action': u'CREATE',
+                u'stack_status': u'COMPLETE',
+            }
+        ]
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(req.context, self.topic,
+                 {'namespace': None,
+                  'method': 'show_stack',
+                  'args': {'stack_identity': dict(identity),
+                           'refresh_outputs': True},
+                  'version': self.api_version},
+                 None).AndReturn(engine_resp)
+        self.m.ReplayAll()
+
+        response = self.controller.show(req,
+                                        tenant_id=identity.tenant,
+                                        stack_name=identity.stack_name,
+                                        stack_id=identity.stack_id)
+
+        self.assertEqual(outputs, response['stack']['outputs'])
+        self.m.VerifyAll()
+
     def test_show_notfound(self):
         identity = identifier.HeatIdentifier(self.tenant, 'wibble', '6')
 
@@ -15,6 +15,8 @@
 import datetime
 import copy
 
+import eventlet
+import fixtures
 import mox
 
 from testtools import skipIf
@@ -110,6 +112,7 @@ class AutoScalingTest(HeatTestCase):
         utils.setup_dummy_db()
         cfg.CONF.set_default('heat_waitcondition_server_url',
                              'http://server.test:8000/v1/waitcondition')
+        cfg.CONF.set_override('scaling_signal_window', 0)
         self.fc = fakes.FakeKeystoneClient()
 
     def create_scaling_group(self, t, stack, resource_name):
@@ -770,6 +773,38 @@ class AutoScalingTest(HeatTestCase):
         self.assertEqual(len(rsrc.get_instance_names()), 2)
         self.m.VerifyAll()
 
+    def test_scaling_group_adjust_outputs(self):
+        t = template_format.parse(as_template)
+        t['Outputs'] = {'InstanceList': {'Value': {
+            'Fn::GetAtt': ['WebServerGroup', 'InstanceList']}}}
+        stack = utils.parse_stack(t, params=self.params)
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resources.instance.Instance.FnGetAtt',
+            lambda inst, key: '1.2.3.4'))
+
+        # start with 3
+        properties = t['Resources']['WebServerGroup']['Properties']
+        properties['DesiredCapacity'] = '3'
+        self._stub_lb_reload(3)
+        now = timeutils.utcnow()
+        self._stub_meta_expected(now, 'ExactCapacity : 3')
+        self._stub_create(3)
+        self.m.ReplayAll()
+        rsrc = self.create_scaling_group(t, stack, 'WebServerGroup')
+        stack.store_outputs()
+        self.assertEqual(3, len(stack.output('InstanceList').split(',')))
+
+        # reduce to 1, which changes the output without updating the stack
+        self._stub_lb_reload(1)
+        self._stub_validate()
+        self._stub_meta_expected(now, 'ChangeInCapacity : -2')
+        self.m.ReplayAll()
+        rsrc.adjust(-2)
+        self.assertEqual(1, len(stack.output('InstanceList').split(',')))
+        loaded = parser.Stack.load(stack.context, stack.id)
+        self.assertIsNone(loaded.stored_outputs)
+        self.m.VerifyAll()
+
     def test_scaling_group_scale_up_failure(self):
         t = template_format.parse(as_template)
         stack = utils.parse_stack(t, params=self.params)
@@ -862,6 +897,190 @@ class AutoScalingTest(HeatTestCase):
 
         rsrc.delete()
 
+    def test_scaling_group_adjust_all(self):
+        t = template_format.parse(as_template)
+        stack = utils.parse_stack(t, params=self.params)
+
+        # Create initial group, 2 instances
+        properties = t['Resources']['WebServerGroup']['Properties']
+        properties['DesiredCapacity'] = '2'
+        self._stub_lb_reload(2)
+        self._stub_create(2)
+        now = timeutils.utcnow()
+        self._stub_meta_expected(now, 'ExactCapacity : 2')
+        self.m.ReplayAll()
+        rsrc = self.create_scaling_group(t, stack, 'WebServerGroup')
+        stack['WebServerGroup'] = rsrc
+
+        # The adjustments are applied in order as one resize, skipping the
+        # one which would exceed MaxSize
+        self._stub_lb_reload(3)
+        self._stub_meta_expected(now, 'ChangeInCapacity : 2, '
+                                      'ChangeInCapacity : 10, '
+                                      'ChangeInCapacity : -1')
+        self._stub_create(1)
+        self.m.ReplayAll()
+        rsrc.adjust_all([(2, 'ChangeInCapacity'),
+                         (10, 'ChangeInCapacity'),
+                         (-1, 'ChangeInCapacity')])
+        self.assertEqual(3, len(rsrc.get_instance_names()))
+
+        rsrc.delete()
+        self.m.VerifyAll()
+
+    def test_scaling_group_resize_delta(self):
+        t = template_format.parse(as_template)
+        stack = utils.parse_stack(t, params=self.params)
+
+        # Create initial group, 2 instances
+        properties = t['Resources']['WebServerGroup']['Properties']
+        properties['DesiredCapacity'] = '2'
+        self._stub_lb_reload(2)
+        self._stub_create(2)
+        now = timeutils.utcnow()
+        self._stub_meta_expected(now, 'ExactCapacity : 2')
+        self.m.ReplayAll()
+        rsrc = self.create_scaling_group(t, stack, 'WebServerGroup')
+        stack['WebServerGroup'] = rsrc
+        original = rsrc.get_instance_names()
+
+        # Only the new instance is created, without a full nested stack
+        # update
+        self._stub_lb_reload(3)
+        self._stub_meta_expected(now, 'ChangeInCapacity : 1')
+        self._stub_create(1)
+        self.m.StubOutWithMock(asc.AutoScalingGroup, 'update_with_template')
+        self.m.ReplayAll()
+        rsrc.adjust(1)
+        names = rsrc.get_instance_names()
+        self.assertEqual(original, names[:2])
+        self.assertEqual(3, len(names))
+
+        # The stored template matches the members
+        nested = parser.Stack.load(rsrc.context, rsrc.resource_id)
+        self.assertEqual((nested.UPDATE, nested.COMPLETE), nested.state)
+        self.assertEqual(sorted(names), sorted(nested.t['Resources']))
+
+        # Shrinking deletes the oldest instances
+        self._stub_lb_reload(1)
+        self._stub_meta_expected(now, 'ChangeInCapacity : -2')
+        self._stub_validate()
+        self.m.StubOutWithMock(asc.AutoScalingGroup, 'update_with_template')
+        self.m.ReplayAll()
+        rsrc.adjust(-2)
+        self.assertEqual(names[2:], rsrc.get_instance_names())
+        nested = parser.Stack.load(rsrc.context, rsrc.resource_id)
+        self.assertEqual(names[2:], nested.t['Resources'].keys())
+
+        rsrc.delete()
+        self.m.VerifyAll()
+
+    def _create_queue_group(self):
+        t = template_format.parse(as_template)
+        stack = utils.parse_stack(t, params=self.params)
+
+        self._stub_lb_reload(1)
+        now = timeutils.utcnow()
+        self._stub_meta_expected(now, 'ExactCapacity : 1')
+        self._stub_create(1)
+        self.m.ReplayAll()
+        rsrc = self.create_scaling_group(t, stack, 'WebServerGroup')
+        stack['WebServerGroup'] = rsrc
+        self.m.VerifyAll()
+        self.m.UnsetStubs()
+        cfg.CONF.set_override('scaling_signal_window', 0.01)
+        return rsrc
+
+    def test_scaling_group_queue_adjustment(self):
+        rsrc = self._create_queue_group()
+
+        # Adjustments queued within the window are applied together
+        self.m.StubOutWithMock(rsrc, 'adjust_all')
+        rsrc.adjust_all([(1, 'ChangeInCapacity'),
+                         (-1, 'ChangeInCapacity'),
+                         (3, 'ExactCapacity')]).AndReturn(True)
+        self.m.ReplayAll()
+
+        threads = [eventlet.spawn(rsrc.queue_adjustment, 1),
+                   eventlet.spawn(rsrc.queue_adjustment, -1),
+                   eventlet.spawn(rsrc.queue_adjustment, 3, 'ExactCapacity')]
+        self.assertEqual([True, True, True], [t.wait() for t in threads])
+        self.assertEqual({}, asc._pending_adjustments)
+        self.m.VerifyAll()
+
+    def test_scaling_group_queue_adjustment_failure(self):
+        rsrc = self._create_queue_group()
+
+        # A failed resize is reported to every signaller in the batch
+        self.m.StubOutWithMock(rsrc, 'adjust_all')
+        rsrc.adjust_all([(1, 'ChangeInCapacity'),
+                         (2, 'ChangeInCapacity')]).AndRaise(
+                             exception.Error('resize failed'))
+        self.m.ReplayAll()
+
+        threads = [eventlet.spawn(rsrc.queue_adjustment, 1),
+                   eventlet.spawn(rsrc.queue_adjustment, 2)]
+        for thread in threads:
+            self.assertRaises(exception.Error, thread.wait)
+        self.assertEqual({}, asc._pending_adjustments)
+        self.m.VerifyAll()
+
+    def test_scaling_group_queue_adjustment_cooldown(self):
+        rsrc = self._create_queue_group()
+
+        # Adjustments prevented by the cooldown are reported to every
+        # signaller in the batch
+        self.m.StubOutWithMock(rsrc, '_cooldown_inprogress')
+        rsrc._cooldown_inprogress().AndReturn(True)
+        self.m.StubOutWithMock(rsrc, 'resize')
+        self.m.ReplayAll()
+
+        threads = [eventlet.spawn(rsrc.queue_adjustment, 1),
+                   eventlet.spawn(rsrc.queue_adjustment, 2)]
+        self.assertEqual([False, False], [t.wait() for t in threads])
+        self.assertEqual({}, asc._pending_adjustments)
+        self.m.VerifyAll()
+
+    def test_scaling_group_queue_adjustment_killed(self):
+        rsrc = self._create_queue_group()
+
+        # Killing the signaller applying a batch releases the others in it
+        self.m.StubOutWithMock(rsrc, 'adjust_all')
+        self.m.ReplayAll()
+
+        first = eventlet.spawn(rsrc.queue_adjustment, 1)
+        eventlet.sleep(0)
+        second = eventlet.spawn(rsrc.queue_adjustment, 2)
+        eventlet.sleep(0)
+        first.kill()
+        self.assertRaises(exception.Error, second.wait)
+        self.assertEqual({}, asc._pending_adjustments)
+        self.m.VerifyAll()
+
+    def test_scaling_group_queue_adjustment_ordered(self):
+        rsrc = self._create_queue_group()
+
+        # A batch queued while an earlier one is being applied waits for it
+        calls = []
+
+        def adjust_all(adjustments):
+            calls.append(('start', adjustments))
+            eventlet.sleep(0.02)
+            calls.append(('end', adjustments))
+            return True
+
+        rsrc.adjust_all = adjust_all
+
+        first = eventlet.spawn(rsrc.queue_adjustment, 1)
+        eventlet.sleep(0.015)
+        second = eventlet.spawn(rsrc.queue_adjustment, 2)
+        self.assertEqual([True, True], [first.wait(), second.wait()])
+        self.assertEqual([('start', [(1, 'ChangeInCapacity')]),
+                          ('end', [(1, 'ChangeInCapacity')]),
+                          ('start', [(2, 'ChangeInCapacity')]),
+                          ('end', [(2, 'ChangeInCapacity')])], calls)
+        self.assertEqual({}, asc._pending_adjustments)
+
     def test_scaling_group_cooldown_toosoon(self):
         t = template_format.parse(as_template)
         stack = utils.parse_stack(t, params=self.params)
@@ -553,7 +553,7 @@ class AutoScalingGroupTest(HeatTestCase):
                                       num_updates_expected_on_updt=10,
                                       num_creates_expected_on_updt=0,
                                       num_deletes_expected_on_updt=0,
-                                      num_reloads_expected_on_updt=9,
+                                      num_reloads_expected_on_updt=10,
                                       update_replace=True)
 
     def test_autoscaling_group_update_replace_with_adjusted_capacity(self):
@@ -574,7 +574,7 @@ class AutoScalingGroupTest(HeatTestCase):
                                       num_updates_expected_on_updt=8,
                                       num_creates_expected_on_updt=2,
                                       num_deletes_expected_on_updt=2,
-                                      num_reloads_expected_on_updt=7,
+                                      num_reloads_expected_on_updt=6,
                                       update_replace=True)
 
     def test_autoscaling_group_update_replace_huge_batch_size(self):
@@ -615,7 +615,7 @@ class AutoScalingGroupTest(HeatTestCase):
                                       num_updates_expected_on_updt=9,
                                       num_creates_expected_on_updt=1,
                                       num_deletes_expected_on_updt=1,
-                                      num_reloads_expected_on_updt=13,
+                                      num_reloads_expected_on_updt=11,
                                       update_replace=True)
 
     def test_autoscaling_group_update_no_replace(self):
@@ -661,7 +661,7 @@ class AutoScalingGroupTest(HeatTestCase):
                                       num_updates_expected_on_updt=8,
                                       num_creates_expected_on_updt=2,
                                       num_deletes_expected_on_updt=2,
-                                      num_reloads_expected_on_updt=5,
+                                      num_reloads_expected_on_updt=4,
                                       update_replace=False)
 
     def test_autoscaling_group_update_policy_removed(self):
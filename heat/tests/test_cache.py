@@ -0,0 +1,95 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import fixtures
+import testtools
+
+from heat.common import cache
+
+
+class LRUCacheTest(testtools.TestCase):
+
+    def test_get_set(self):
+        c = cache.LRUCache(2)
+        c.set('a', 1)
+        self.assertEqual(1, c.get('a'))
+        self.assertIsNone(c.get('b'))
+        self.assertEqual('x', c.get('b', 'x'))
+        self.assertIn('a', c)
+
+    def test_evicts_least_recently_used(self):
+        c = cache.LRUCache(2)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.get('a')
+        c.set('c', 3)
+        self.assertEqual(2, len(c))
+        self.assertIn('a', c)
+        self.assertNotIn('b', c)
+        self.assertIn('c', c)
+
+    def test_delete_clear(self):
+        c = cache.LRUCache(2)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.delete('a')
+        c.delete('missing')
+        self.assertNotIn('a', c)
+        c.clear()
+        self.assertEqual(0, len(c))
+
+    def test_disabled(self):
+        c = cache.LRUCache(0)
+        c.set('a', 1)
+        self.assertIsNone(c.get('a'))
+
+
+class TTLCacheTest(testtools.TestCase):
+
+    def setUp(self):
+        super(TTLCacheTest, self).setUp()
+        self.now = 1000.0
+        self.useFixture(fixtures.MonkeyPatch('heat.common.cache.wallclock',
+                                             lambda: self.now))
+
+    def test_expiry(self):
+        c = cache.TTLCache(10, 60)
+        c.set('a', 1)
+        c.set('b', 2, ttl=10)
+        self.now += 30
+        self.assertEqual(1, c.get('a'))
+        self.assertIsNone(c.get('b'))
+        self.assertNotIn('b', c)
+        self.now += 30
+        self.assertNotIn('a', c)
+        self.assertEqual('x', c.get('a', 'x'))
+        self.assertEqual(0, len(c))
+
+    def test_hit_rate(self):
+        c = cache.TTLCache(10, 60)
+        self.assertIsNone(c.hit_rate())
+        c.set('a', 1)
+        c.get('a')
+        c.get('a')
+        c.get('a')
+        c.get('b')
+        self.assertEqual(3, c.hits)
+        self.assertEqual(1, c.misses)
+        self.assertEqual(0.75, c.hit_rate())
+
+    def test_disabled(self):
+        c = cache.TTLCache(10, 0)
+        c.set('a', 1)
+        self.assertIsNone(c.get('a'))
@@ -12,8 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
+
 from heat.engine import clients
 from heat.tests.common import HeatTestCase
+from heat.tests import utils
 
 
 class ClientsTest(HeatTestCase):
@@ -21,3 +24,49 @@ class ClientsTest(HeatTestCase):
     def test_clients_chosen_at_module_initilization(self):
         self.assertFalse(hasattr(clients.Clients, 'nova'))
         self.assertTrue(hasattr(clients.Clients('fakecontext'), 'nova'))
+
+    def _stub_url_for(self):
+        self.m.StubOutWithMock(clients.OpenStackClients, 'url_for')
+        clients.OpenStackClients.url_for(
+            service_type='compute').MultipleTimes().AndReturn(
+                'http://server.test:8774/v2/test_tenant_id')
+
+    def test_nova_client_shared(self):
+        self._stub_url_for()
+        self.m.ReplayAll()
+
+        first = clients.OpenStackClients(utils.dummy_context())
+        second = clients.OpenStackClients(utils.dummy_context())
+        nova = first.nova()
+
+        self.assertIs(nova, second.nova())
+        self.assertEqual('abcd1234', nova.client.auth_token)
+        self.assertEqual('http://server.test:8774/v2/test_tenant_id',
+                         nova.client.management_url)
+        self.m.VerifyAll()
+
+    def test_nova_client_not_shared_between_tokens(self):
+        self._stub_url_for()
+        self.m.ReplayAll()
+
+        context = utils.dummy_context()
+        nova = clients.OpenStackClients(context).nova()
+        context.auth_token = 'efgh5678'
+        other = clients.OpenStackClients(context).nova()
+
+        self.assertIsNot(nova, other)
+        self.assertEqual('efgh5678', other.client.auth_token)
+        self.m.VerifyAll()
+
+    def test_nova_extensions_discovered_once(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.clients._nova_extensions', None))
+        self.m.StubOutWithMock(clients.novashell.OpenStackComputeShell,
+                               '_discover_extensions')
+        clients.novashell.OpenStackComputeShell._discover_extensions(
+            '1.1').AndReturn([])
+        self.m.ReplayAll()
+
+        self.assertEqual([], clients.nova_extensions())
+        self.assertEqual([], clients.nova_extensions())
+        self.m.VerifyAll()
@@ -15,6 +15,7 @@
 
 import copy
 
+from heat.common import exception
 from heat.common import template_format
 from heat.engine.resources import cloud_watch
 from heat.engine import resource
@@ -122,6 +123,43 @@ class CloudWatchAlarmTest(HeatTestCase):
         scheduler.TaskRunner(rsrc.delete)()
         self.m.VerifyAll()
 
+    def test_extended_statistic(self):
+        t = template_format.parse(alarm_template)
+        properties = t['Resources']['MEMAlarmHigh']['Properties']
+        del properties['Statistic']
+        properties['ExtendedStatistic'] = 'p99.9'
+
+        stack = utils.parse_stack(t)
+        stack.store()
+
+        self.m.ReplayAll()
+        rsrc = self.create_alarm(t, stack, 'MEMAlarmHigh')
+        wr = watchrule.WatchRule.load(stack.context,
+                                      watch_name=rsrc.physical_resource_name())
+        self.assertEqual('p99.9', wr.rule['ExtendedStatistic'])
+
+        scheduler.TaskRunner(rsrc.delete)()
+        self.m.VerifyAll()
+
+    def test_extended_statistic_invalid(self):
+        t = template_format.parse(alarm_template)
+        properties = t['Resources']['MEMAlarmHigh']['Properties']
+        stack = utils.parse_stack(t)
+
+        # Both Statistic and ExtendedStatistic
+        properties['ExtendedStatistic'] = 'p90'
+        rsrc = cloud_watch.CloudWatchAlarm('MEMAlarmHigh',
+                                           t['Resources']['MEMAlarmHigh'],
+                                           stack)
+        self.assertRaises(exception.StackValidationFailed, rsrc.validate)
+
+        del properties['Statistic']
+        properties['ExtendedStatistic'] = 'p101'
+        rsrc = cloud_watch.CloudWatchAlarm('MEMAlarmHigh',
+                                           t['Resources']['MEMAlarmHigh'],
+                                           stack)
+        self.assertRaises(exception.StackValidationFailed, rsrc.validate)
+
     def test_suspend_resume(self):
         t = template_format.parse(alarm_template)
         stack = utils.parse_stack(t)
@@ -210,6 +210,25 @@ class EIPTest(HeatTestCase):
 
         self.m.VerifyAll()
 
+    def test_eip_address_stored(self):
+        eip.ElasticIp.nova().MultipleTimes().AndReturn(self.fc)
+        self.fc.servers.get('WebServer').AndReturn(self.fc.servers.list()[0])
+        self.m.StubOutWithMock(self.fc.floating_ips, 'get')
+        self.m.ReplayAll()
+
+        t = template_format.parse(eip_template)
+        stack = utils.parse_stack(t)
+        stack.store()
+
+        rsrc = self.create_eip(t, stack, 'IPAddress')
+
+        # The address is not fetched again when the stack is reloaded
+        loaded = eip.ElasticIp('IPAddress', t['Resources']['IPAddress'],
+                               stack)
+        self.assertEqual('11.0.0.1', loaded.FnGetRefId())
+
+        self.m.VerifyAll()
+
     def test_association_eip(self):
         eip.ElasticIp.nova().AndReturn(self.fc)
         eip.ElasticIp.nova().AndReturn(self.fc)
@@ -13,6 +13,7 @@
 #    under the License.
 
 
+import datetime
 import functools
 import json
 import sys
@@ -43,6 +44,7 @@ from heat.engine.resources import nova_utils
 from heat.engine import resource as rsrs
 from heat.engine import watchrule
 from heat.openstack.common import threadgroup
+from heat.openstack.common import timeutils
 from heat.tests.common import HeatTestCase
 from heat.tests import generic_resource as generic_rsrc
 from heat.tests import utils
@@ -972,6 +974,7 @@ class StackServiceTest(HeatTestCase):
         service.EngineService._get_stack(self.ctx,
                                          self.stack.identifier(),
                                          show_deleted=True).AndReturn(s)
+        self.m.StubOutWithMock(parser.Stack, 'load')
         self.m.ReplayAll()
 
         events = self.eng.list_events(self.ctx, self.stack.identifier())
@@ -1076,6 +1079,10 @@ class StackServiceTest(HeatTestCase):
 
     @stack_context('service_event_list_test_stack')
     def test_stack_event_list_by_tenant(self):
+        # Events are formatted from the database rows alone
+        self.m.StubOutWithMock(parser.Stack, 'load')
+        self.m.ReplayAll()
+
         events = self.eng.list_events(self.ctx, None)
 
         self.assertEqual(2, len(events))
@@ -1205,6 +1212,18 @@ class StackServiceTest(HeatTestCase):
 
         self.m.VerifyAll()
 
+    @stack_context('service_describe_refresh_test_stack')
+    def test_stack_describe_refresh_outputs(self):
+        self.m.StubOutWithMock(parser.Stack, 'store_outputs')
+        parser.Stack.store_outputs()
+        self.m.ReplayAll()
+
+        sl = self.eng.show_stack(self.ctx, self.stack.identifier(),
+                                 refresh_outputs=True)
+
+        self.assertEqual(1, len(sl))
+        self.m.VerifyAll()
+
     @stack_context('service_describe_all_test_stack', False)
     def test_stack_describe_all(self):
         sl = self.eng.show_stack(self.ctx, None)
@@ -1597,45 +1616,129 @@ class StackServiceTest(HeatTestCase):
 
         self.m.VerifyAll()
 
-    @stack_context('periodic_watch_task_not_created')
-    def test_periodic_watch_task_not_created(self):
-        self.eng.stg[self.stack.id] = DummyThreadGroup()
-        self.eng._start_watch_task(self.stack.id, self.ctx)
-        self.assertEqual([], self.eng.stg[self.stack.id].threads)
-
-    def test_periodic_watch_task_created(self):
-        stack = get_stack('period_watch_task_created',
-                          utils.dummy_context(),
-                          alarm_template)
+    def _create_alarm_stack(self, stack_name, last_evaluated):
+        stack = get_stack(stack_name, self.ctx, alarm_template)
         self.stack = stack
-        self.m.ReplayAll()
         stack.store()
         stack.create()
+        wr = db_api.watch_rule_get_all_by_stack(self.ctx, stack.id)[0]
+        db_api.watch_rule_update(self.ctx, wr.id,
+                                 {'last_evaluated': last_evaluated})
         self.eng.stg[stack.id] = DummyThreadGroup()
-        self.eng._start_watch_task(stack.id, self.ctx)
-        self.assertEqual([self.eng._periodic_watcher_task],
-                         self.eng.stg[stack.id].threads)
-        self.stack.delete()
+        return stack
+
+    def test_periodic_watch_task_not_due(self):
+        stack = self._create_alarm_stack('periodic_watch_task_not_due',
+                                         timeutils.utcnow())
+        self.m.StubOutWithMock(service.EngineService, '_load_user_creds')
+        self.m.StubOutWithMock(watchrule.WatchRule, 'evaluate')
+        self.m.ReplayAll()
+
+        self.eng._periodic_watcher_task()
+        self.assertEqual([], self.eng.stg[stack.id].threads)
+        self.m.VerifyAll()
+        stack.delete()
+
+    def test_periodic_watch_task_alarm(self):
+        stack = self._create_alarm_stack(
+            'periodic_watch_task_alarm',
+            timeutils.utcnow() - datetime.timedelta(seconds=600))
+
+        class DummyAction(object):
+            signal = "dummyfoo"
+
+        self.m.StubOutWithMock(service.EngineService, '_load_user_creds')
+        service.EngineService._load_user_creds(
+            mox.IgnoreArg()).AndReturn(self.ctx)
+        self.m.StubOutWithMock(watchrule.WatchRule, 'evaluate')
+        watchrule.WatchRule.evaluate().AndReturn([DummyAction.signal])
+        self.m.ReplayAll()
+
+        self.eng._periodic_watcher_task()
+        self.assertEqual(1, len(self.eng.stg[stack.id].threads))
+        self.m.VerifyAll()
+        stack.delete()
 
-    def test_periodic_watch_task_created_nested(self):
+    def test_periodic_watch_task_suspended(self):
+        stack = self._create_alarm_stack(
+            'periodic_watch_task_suspended',
+            timeutils.utcnow() - datetime.timedelta(seconds=600))
+        wr = db_api.watch_rule_get_all_by_stack(self.ctx, stack.id)[0]
+        db_api.watch_rule_update(self.ctx, wr.id,
+                                 {'state': watchrule.WatchRule.SUSPENDED})
+        self.m.StubOutWithMock(service.EngineService, '_load_user_creds')
+        self.m.StubOutWithMock(watchrule.WatchRule, 'evaluate')
+        self.m.ReplayAll()
+
+        self.eng._periodic_watcher_task()
+        self.assertEqual([], self.eng.stg[stack.id].threads)
+        self.m.VerifyAll()
+        stack.delete()
+
+    def test_periodic_watch_task_nested(self):
         self.m.StubOutWithMock(urlfetch, 'get')
         urlfetch.get('https://server.test/alarm.template').MultipleTimes().\
             AndReturn(alarm_template)
         self.m.ReplayAll()
 
-        stack = get_stack('period_watch_task_created_nested',
-                          utils.dummy_context(),
+        stack = get_stack('periodic_watch_task_nested', self.ctx,
                           nested_alarm_template)
-        setup_keystone_mocks(self.m, stack)
         self.stack = stack
-        self.m.ReplayAll()
         stack.store()
         stack.create()
-        self.eng.stg[stack.id] = DummyThreadGroup()
-        self.eng._start_watch_task(stack.id, self.ctx)
-        self.assertEqual([self.eng._periodic_watcher_task],
-                         self.eng.stg[stack.id].threads)
-        self.stack.delete()
+        self.m.VerifyAll()
+        self.m.UnsetStubs()
+
+        # Rules in nested stacks are evaluated by the same engine-wide task,
+        # and their actions run in the thread group of the nested stack
+        nested = stack['the_nested'].nested()
+        wr = db_api.watch_rule_get_all_by_stack(self.ctx, nested.id)[0]
+        db_api.watch_rule_update(
+            self.ctx, wr.id,
+            {'last_evaluated':
+             timeutils.utcnow() - datetime.timedelta(seconds=600)})
+        self.eng.stg[nested.id] = DummyThreadGroup()
+
+        self.m.StubOutWithMock(service.EngineService, '_load_user_creds')
+        service.EngineService._load_user_creds(
+            mox.IgnoreArg()).AndReturn(self.ctx)
+        self.m.StubOutWithMock(watchrule.WatchRule, 'evaluate')
+        watchrule.WatchRule.evaluate().AndReturn(['dummyfoo'])
+        self.m.ReplayAll()
+
+        self.eng._periodic_watcher_task()
+        self.assertEqual(1, len(self.eng.stg[nested.id].threads))
+        stack.delete()
+        self.m.VerifyAll()
+
+    def test_prune_watch_data(self):
+        cfg.CONF.set_override('watch_data_retention', 2)
+        cfg.CONF.set_override('watch_data_rollups', True)
+        cfg.CONF.set_override('watch_data_rollup_retention', 24)
+        now = timeutils.utcnow()
+        self.m.StubOutWithMock(timeutils, 'utcnow')
+        timeutils.utcnow().AndReturn(now)
+        self.m.StubOutWithMock(db_api, 'watch_data_prune')
+        db_api.watch_data_prune(mox.IgnoreArg(),
+                                now - datetime.timedelta(hours=2),
+                                rollups=True).AndReturn(3)
+        self.m.StubOutWithMock(db_api, 'watch_data_rollup_prune')
+        db_api.watch_data_rollup_prune(mox.IgnoreArg(),
+                                       now - datetime.timedelta(hours=24))
+        self.m.ReplayAll()
+
+        self.eng._prune_watch_data()
+        self.m.VerifyAll()
+
+    def test_prune_watch_data_disabled(self):
+        cfg.CONF.set_override('watch_data_retention', 0)
+        cfg.CONF.set_override('watch_data_rollup_retention', 0)
+        self.m.StubOutWithMock(db_api, 'watch_data_prune')
+        self.m.StubOutWithMock(db_api, 'watch_data_rollup_prune')
+        self.m.ReplayAll()
+
+        self.eng._prune_watch_data()
+        self.m.VerifyAll()
 
     @stack_context('service_show_watch_test_stack', False)
     @utils.wr_delete_after
@@ -1691,6 +1794,30 @@ class StackServiceTest(HeatTestCase):
         for key in engine_api.WATCH_KEYS:
             self.assertTrue(key in result[0])
 
+        # Listing all watches loads no watch data
+        self.m.StubOutWithMock(db_api, 'watch_data_get_all_by_watch_rule')
+        self.m.ReplayAll()
+        result = self.eng.show_watch(self.ctx, watch_name=None,
+                                     name_prefix='show_watch_')
+        self.assertEqual(['show_watch_1', 'show_watch_2'],
+                         [r['name'] for r in result])
+        for key in engine_api.WATCH_KEYS:
+            self.assertTrue(key in result[0])
+        self.m.VerifyAll()
+
+        self.wr[1].state_set(watchrule.WatchRule.ALARM)
+        result = self.eng.show_watch(self.ctx, watch_name=None,
+                                     state=watchrule.WatchRule.ALARM)
+        self.assertEqual(['show_watch_2'], [r['name'] for r in result])
+
+        result = self.eng.show_watch(self.ctx, watch_name=None,
+                                     name_prefix='show_watch_', limit=1)
+        self.assertEqual(['show_watch_1'], [r['name'] for r in result])
+        result = self.eng.show_watch(self.ctx, watch_name=None,
+                                     name_prefix='show_watch_', limit=1,
+                                     marker=result[0]['id'])
+        self.assertEqual(['show_watch_2'], [r['name'] for r in result])
+
     @stack_context('service_show_watch_metric_test_stack', False)
     @utils.wr_delete_after
     def test_show_watch_metric(self):
@@ -1738,6 +1865,99 @@ class StackServiceTest(HeatTestCase):
         for key in engine_api.WATCH_DATA_KEYS:
             self.assertTrue(key in result[0])
 
+        # Datapoints stored by the rule are recorded under its metric
+        self.wr.create_watch_data(values['data'])
+        result = self.eng.show_watch_metric(self.ctx,
+                                            metric_namespace=u'system/linux',
+                                            metric_name=u'ServiceFailure')
+        self.assertEqual(1, len(result))
+        self.assertEqual(u'ServiceFailure',
+                         result[0][engine_api.WATCH_DATA_METRIC])
+
+        result = self.eng.show_watch_metric(self.ctx,
+                                            metric_namespace=u'other')
+        self.assertEqual([], result)
+
+        # ...and paginated by ID
+        result = self.eng.show_watch_metric(self.ctx, limit=2)
+        self.assertEqual(2, len(result))
+        result = self.eng.show_watch_metric(
+            self.ctx, limit=2, marker=result[-1][engine_api.WATCH_DATA_ID])
+        self.assertEqual(1, len(result))
+
+    @stack_context('service_create_watch_data_batch_test_stack', False)
+    @utils.wr_delete_after
+    def test_create_watch_data_batch(self):
+        rule = {u'EvaluationPeriods': u'1',
+                u'AlarmDescription': u'Restart the WikiDatabase',
+                u'Namespace': u'system/linux',
+                u'Period': u'300',
+                u'ComparisonOperator': u'GreaterThanThreshold',
+                u'Statistic': u'SampleCount',
+                u'Threshold': u'2',
+                u'MetricName': u'ServiceFailure'}
+        self.wr = []
+        for name, metric in (('batch_watch_1', u'ServiceFailure'),
+                             ('batch_watch_2', u'CPUUtilization')):
+            self.wr.append(watchrule.WatchRule(context=self.ctx,
+                                               watch_name=name,
+                                               rule=dict(rule,
+                                                         MetricName=metric),
+                                               stack_id=self.stack.id,
+                                               state='NORMAL'))
+            self.wr[-1].store()
+
+        def sample(metric, value):
+            return {u'Namespace': u'system/linux',
+                    metric: {u'Unit': u'Count', u'Value': value,
+                             u'Dimensions': [{}]}}
+
+        stats_data = [sample(u'ServiceFailure', u'1'),
+                      sample(u'CPUUtilization', u'75'),
+                      sample(u'ServiceFailure', u'2'),
+                      sample(u'MemoryUtilization', u'10')]
+
+        self.m.StubOutWithMock(db_api, 'watch_data_create')
+        self.m.ReplayAll()
+        result = self.eng.create_watch_data(self.ctx, None, stats_data)
+        self.assertEqual(stats_data, result)
+        self.m.VerifyAll()
+
+        values = dict((wr.id, []) for wr in self.wr)
+        for wd in db_api.watch_data_get_all(self.ctx):
+            values[wd.watch_rule_id].append(wd.value)
+        self.assertEqual([1.0, 2.0], sorted(values[self.wr[0].id]))
+        self.assertEqual([75.0], values[self.wr[1].id])
+
+        self.assertRaises(exception.WatchRuleNotFound,
+                          self.eng.create_watch_data,
+                          self.ctx, None, [sample(u'MemoryUtilization', 1)])
+
+        # Datapoints may name their watch with an AlarmName dimension, and
+        # none are stored if any names a watch which does not exist
+        named = sample(u'CPUUtilization', u'50')
+        named[u'CPUUtilization'][u'Dimensions'] = [{u'AlarmName':
+                                                    'batch_watch_2'}]
+        missing = sample(u'CPUUtilization', u'60')
+        missing[u'CPUUtilization'][u'Dimensions'] = [{u'AlarmName':
+                                                      'no_such_watch'}]
+        self.assertRaises(exception.WatchRuleNotFound,
+                          self.eng.create_watch_data,
+                          self.ctx, None,
+                          [sample(u'ServiceFailure', u'3'), named, missing])
+        self.assertEqual(3, len(db_api.watch_data_get_all(self.ctx)))
+
+        named[u'CPUUtilization'][u'Dimensions'] = [{u'AlarmName':
+                                                    'batch_watch_2'}]
+        self.eng.create_watch_data(self.ctx, None,
+                                   [sample(u'ServiceFailure', u'3'), named])
+        values = dict((wr.id, []) for wr in self.wr)
+        for wd in db_api.watch_data_get_all(self.ctx):
+            values[wd.watch_rule_id].append(wd.value)
+        self.assertEqual([1.0, 2.0, 3.0], sorted(values[self.wr[0].id]))
+        self.assertEqual([50.0, 75.0], sorted(values[self.wr[1].id]))
+        self.assertEqual([], named[u'CPUUtilization'][u'Dimensions'])
+
     @stack_context('service_show_watch_state_test_stack')
     @utils.wr_delete_after
     def test_set_watch_state(self):
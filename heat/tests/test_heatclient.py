@@ -14,6 +14,7 @@
 
 import mox
 
+from keystoneclient import exceptions as kc_exception
 from oslo.config import cfg
 
 from heat.common import exception
@@ -45,8 +46,9 @@ class KeystoneClientTest(HeatTestCase):
         self.addCleanup(self.m.VerifyAll)
 
     def _stubs_v2(self, method='token', auth_ok=True,
-                  trust_scoped=True):
-        self.m.StubOutClassWithMocks(heat_keystoneclient.kc, "Client")
+                  trust_scoped=True, stub_class=True):
+        if stub_class:
+            self.m.StubOutClassWithMocks(heat_keystoneclient.kc, "Client")
         if method == 'token':
             self.mock_ks_client = heat_keystoneclient.kc.Client(
                 auth_url=mox.IgnoreArg(),
@@ -289,6 +291,79 @@ class KeystoneClientTest(HeatTestCase):
         self.assertRaises(exception.AuthorizationFailure,
                           heat_keystoneclient.KeystoneClient, ctx)
 
+    def test_trust_init_cached(self):
+
+        """Test a trust-scoped token is reused by later clients."""
+
+        cfg.CONF.set_override('deferred_auth_method', 'trusts')
+
+        self._stubs_v2(method='trust')
+        self.mock_ks_client.auth_ref.will_expire_soon(300).AndReturn(False)
+        self.m.ReplayAll()
+
+        for i in range(2):
+            ctx = utils.dummy_context()
+            ctx.username = None
+            ctx.password = None
+            ctx.auth_token = None
+            ctx.trust_id = 'atrust123'
+            heat_ks_client = heat_keystoneclient.KeystoneClient(ctx)
+            self.assertIs(self.mock_ks_client, heat_ks_client.client_v2)
+            self.assertEqual('atrusttoken', ctx.auth_token)
+            self.assertEqual('http://server.test:5000/v2.0', ctx.auth_url)
+
+    def test_trust_init_cached_refresh(self):
+
+        """Test a new trust-scoped token is requested before expiry."""
+
+        cfg.CONF.set_override('deferred_auth_method', 'trusts')
+
+        self._stubs_v2(method='trust')
+        self.mock_ks_client.auth_ref.will_expire_soon(300).AndReturn(True)
+        self._stubs_v2(method='trust', stub_class=False)
+        self.mock_ks_client.auth_ref.auth_token = 'anothertrusttoken'
+        self.m.ReplayAll()
+
+        for expected in ('atrusttoken', 'anothertrusttoken'):
+            ctx = utils.dummy_context()
+            ctx.auth_token = None
+            ctx.trust_id = 'atrust123'
+            heat_keystoneclient.KeystoneClient(ctx)
+            self.assertEqual(expected, ctx.auth_token)
+
+    def test_trust_cached_unauthorized(self):
+
+        """Test a revoked cached trust-scoped token is replaced."""
+
+        cfg.CONF.set_override('deferred_auth_method', 'trusts')
+
+        self._stubs_v2(method='trust')
+        cached_client = self.mock_ks_client
+        cached_client.auth_ref.will_expire_soon(300).AndReturn(False)
+        cached_client.users = self.m.CreateMockAnything()
+        cached_client.users.update_enabled('auser', False).AndRaise(
+            kc_exception.Unauthorized)
+        self._stubs_v2(method='trust', stub_class=False)
+        self.mock_ks_client.auth_ref.auth_token = 'anothertrusttoken'
+        self.mock_ks_client.users = self.m.CreateMockAnything()
+        self.mock_ks_client.users.update_enabled('auser', False)
+        self.m.ReplayAll()
+
+        contexts = []
+        for i in range(2):
+            ctx = utils.dummy_context()
+            ctx.auth_token = None
+            ctx.trust_id = 'atrust123'
+            contexts.append(ctx)
+        heat_keystoneclient.KeystoneClient(contexts[0])
+        heat_ks_client = heat_keystoneclient.KeystoneClient(contexts[1])
+        self.assertIs(cached_client, heat_ks_client.client_v2)
+        heat_ks_client.disable_stack_user('auser')
+        self.assertEqual('anothertrusttoken', contexts[1].auth_token)
+        self.assertIs(self.mock_ks_client,
+                      heat_keystoneclient.trust_client_cache().get(
+                          'atrust123'))
+
     def test_trust_init_pw(self):
 
         """Test trust_id is takes precedence username/password specified."""
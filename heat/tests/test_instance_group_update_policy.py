@@ -16,9 +16,13 @@ import mox
 import json
 import copy
 
+import fixtures
+
 from heat.common import exception
 from heat.common import template_format
 from heat.engine import parser
+from heat.engine import scheduler
+from heat.engine.resources import autoscaling
 from heat.engine.resources import instance
 from heat.tests.common import HeatTestCase
 from heat.tests import utils
@@ -674,3 +678,86 @@ class InstanceGroupTest(HeatTestCase):
         expected_error_message = ('The current UpdatePolicy will result '
                                   'in stack update timeout.')
         self.assertIn(expected_error_message, stack.status_reason)
+
+
+class RollingUpdateTest(HeatTestCase):
+
+    def run_update(self, durations, max_in_flight, failing=None):
+        self.events = []
+        self.updating = []
+
+        def update(name):
+            self.events.append(('start', name))
+            for i in range(durations[name]):
+                yield
+            if name == failing:
+                raise exception.Error('update of %s failed' % name)
+            self.events.append(('finish', name))
+
+        def out_of_service(updating):
+            self.assertTrue(len(updating) <= max_in_flight)
+            self.updating.append(updating)
+
+        updater = autoscaling.RollingUpdate(sorted(durations), update,
+                                            max_in_flight,
+                                            out_of_service=out_of_service)
+        runner = scheduler.TaskRunner(updater)
+        runner.start()
+        steps = 0
+        while not runner.step():
+            steps += 1
+        return steps
+
+    def test_rolling_update_pipelined(self):
+        steps = self.run_update({'a': 5, 'b': 1, 'c': 1, 'd': 1}, 2)
+
+        # b, c and d are updated while a is still in progress
+        self.assertEqual(4, steps)
+        self.assertEqual([('start', 'a'), ('start', 'b'),
+                          ('finish', 'b'), ('start', 'c'),
+                          ('finish', 'c'), ('start', 'd'),
+                          ('finish', 'd'), ('finish', 'a')], self.events)
+        self.assertEqual([set(['a', 'b']), set(['a', 'c']),
+                          set(['a', 'd']), set(['a'])], self.updating)
+
+    def test_rolling_update_pause(self):
+        clock = utils.FakeClock()
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.scheduler.wallclock', clock))
+        self.updating = []
+        started = []
+
+        def update(name):
+            started.append((name, clock.now))
+            yield
+
+        updater = autoscaling.RollingUpdate(
+            ['a', 'b', 'c'], update, 2, pause_time=10,
+            out_of_service=self.updating.append)
+        runner = scheduler.TaskRunner(updater)
+        runner.start()
+        while not runner.step():
+            clock.now += 5
+
+        # c is taken out of service when a slot is freed, and is not
+        # started until the slot's pause has ended
+        self.assertEqual([('a', 1000.0), ('b', 1000.0), ('c', 1010.0)],
+                         started)
+        self.assertEqual([set(['a', 'b']), set(['c'])], self.updating)
+
+    def test_rolling_update_failure(self):
+        self.assertRaises(exception.Error, self.run_update,
+                          {'a': 5, 'b': 1, 'c': 1}, 2, failing='b')
+        self.assertEqual([('start', 'a'), ('start', 'b')], self.events)
+
+    def test_member_hash(self):
+        definition = {'Type': 'AWS::EC2::Instance',
+                      'Properties': {'ImageId': 'foo', 'KeyName': 'bar'}}
+        same = json.loads(json.dumps(definition))
+        changed = copy.deepcopy(definition)
+        changed['Properties']['ImageId'] = 'baz'
+
+        self.assertEqual(autoscaling.member_hash(definition),
+                         autoscaling.member_hash(same))
+        self.assertNotEqual(autoscaling.member_hash(definition),
+                            autoscaling.member_hash(changed))
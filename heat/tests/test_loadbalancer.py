@@ -207,6 +207,39 @@ class LoadBalancerTest(HeatTestCase):
 
         self.m.VerifyAll()
 
+    def test_loadbalancer_member_changes(self):
+        self._create_stubs(stub_meta=False)
+        self.m.StubOutWithMock(lb.nova_utils, 'server_to_ipaddress')
+        lb.nova_utils.server_to_ipaddress(
+            mox.IgnoreArg(), mox.IgnoreArg()).AndReturn('1.2.3.4')
+        lb.nova_utils.server_to_ipaddress(self.fc, 'i-1').AndReturn('1.1.1.1')
+        lb.nova_utils.server_to_ipaddress(self.fc, 'i-2').AndReturn('2.2.2.2')
+        lb.nova_utils.server_to_ipaddress(self.fc, 'i-3').AndReturn('3.3.3.3')
+        self.m.ReplayAll()
+
+        t = template_format.parse(lb_template)
+        s = utils.parse_stack(t)
+        s.store()
+
+        rsrc = self.create_loadbalancer(t, s, 'LoadBalancer')
+
+        # The configuration is unchanged, so the metadata is not updated
+        rsrc.handle_update(rsrc.json_snippet, {},
+                           {'Instances': rsrc.properties['Instances']})
+
+        templ = template_format.parse(lb.lb_template)
+        ha_cfg = rsrc._haproxy_config(templ, ['i-1', 'i-2'])
+        self.assertRegexpMatches(ha_cfg, 'server server1 1\.1\.1\.1:80')
+        self.assertRegexpMatches(ha_cfg, 'server server2 2\.2\.2\.2:80')
+
+        # Only the new member is looked up, and it takes the free server
+        # number without renumbering the remaining member
+        ha_cfg = rsrc._haproxy_config(templ, ['i-2', 'i-3'])
+        self.assertRegexpMatches(ha_cfg, 'server server1 3\.3\.3\.3:80')
+        self.assertRegexpMatches(ha_cfg, 'server server2 2\.2\.2\.2:80')
+        self.assertNotIn('1.1.1.1', ha_cfg)
+        self.m.VerifyAll()
+
     def test_loadbalancer_nokey(self):
         self._create_stubs(key_name=None, stub_meta=False)
         self.m.ReplayAll()
@@ -12,8 +12,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
 import mox
 
+from oslo.config import cfg
 from testtools import skipIf
 
 from heat.engine import clients
@@ -23,6 +25,7 @@ from heat.engine import properties
 from heat.engine import resource
 from heat.engine import scheduler
 from heat.engine.resources.neutron import net
+from heat.engine.resources.neutron import neutron
 from heat.engine.resources.neutron import subnet
 from heat.engine.resources.neutron import router
 from heat.engine.resources.neutron.neutron import NeutronResource as qr
@@ -227,6 +230,102 @@ class NeutronTest(HeatTestCase):
         })
 
 
+class NeutronStatusPollerTest(HeatTestCase):
+
+    def setUp(self):
+        super(NeutronStatusPollerTest, self).setUp()
+        self.clock = utils.FakeClock()
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resources.neutron.neutron.wallclock', self.clock))
+        self.poller = neutron.NeutronStatusPoller(5)
+        self.resources = {'a': {'id': 'a', 'status': 'BUILD'},
+                          'b': {'id': 'b', 'status': 'BUILD'}}
+        self.shown = []
+        self.listed = []
+
+    def show(self, resource_id):
+        def show_resource():
+            self.shown.append(resource_id)
+            if resource_id not in self.resources:
+                raise qe.NeutronClientException(status_code=404)
+            return dict(self.resources[resource_id])
+        return show_resource
+
+    def list_all(self, ids):
+        self.listed.append(sorted(ids))
+        return [dict(self.resources[i]) for i in ids if i in self.resources]
+
+    def refresh(self, resource_id):
+        return self.poller.refresh(resource_id, self.show(resource_id),
+                                   self.list_all)
+
+    def test_batched_refresh(self):
+        self.assertEqual('BUILD', self.refresh('a')['status'])
+        self.assertEqual('BUILD', self.refresh('b')['status'])
+        self.assertEqual(['a', 'b'], self.shown)
+
+        self.resources['a']['status'] = 'ACTIVE'
+        self.resources['b']['status'] = 'ACTIVE'
+        self.clock.now += 1
+        self.assertEqual('ACTIVE', self.refresh('a')['status'])
+        self.assertEqual('ACTIVE', self.refresh('b')['status'])
+        self.assertEqual(['a', 'b'], self.shown)
+        self.assertEqual([['a', 'b']], self.listed)
+
+    def test_poll_interval(self):
+        self.refresh('a')
+        self.clock.now += 1
+        self.refresh('a')
+        self.assertEqual(1, len(self.listed))
+
+        self.resources['a']['status'] = 'ACTIVE'
+        self.clock.now += 1
+        self.assertEqual('BUILD', self.refresh('a')['status'])
+        self.assertEqual(1, len(self.listed))
+
+        self.clock.now += 5
+        self.assertEqual('ACTIVE', self.refresh('a')['status'])
+        self.assertEqual(2, len(self.listed))
+
+    def test_deleted_resource(self):
+        self.refresh('a')
+        self.refresh('b')
+        del self.resources['a']
+        self.clock.now += 1
+
+        ex = self.assertRaises(qe.NeutronClientException, self.refresh, 'a')
+        self.assertEqual(404, ex.status_code)
+        self.assertEqual(['a', 'b', 'a'], self.shown)
+        self.assertEqual([['a', 'b']], self.listed)
+        self.assertNotIn('a', self.poller.watching)
+
+    def test_forgets_idle_resources(self):
+        self.refresh('a')
+        self.refresh('b')
+        self.clock.now += 1
+        self.refresh('a')
+
+        self.clock.now += 49.5
+        self.refresh('a')
+        self.assertEqual([['a', 'b'], ['a', 'b']], self.listed)
+        self.assertNotIn('b', self.poller.watching)
+
+        self.clock.now += 51
+        self.refresh('a')
+        self.assertEqual(['a', 'b', 'a'], self.shown)
+        self.assertEqual(2, len(self.listed))
+
+    def test_list_limited_ids(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resources.neutron.neutron.'
+            'NeutronStatusPoller.MAX_IDS', 1))
+        self.refresh('a')
+        self.refresh('b')
+        self.clock.now += 1
+        self.refresh('a')
+        self.assertEqual([['a'], ['b']], sorted(self.listed))
+
+
 @skipIf(neutronclient is None, 'neutronclient unavailable')
 class NeutronNetTest(HeatTestCase):
 
@@ -358,6 +457,38 @@ class NeutronNetTest(HeatTestCase):
         scheduler.TaskRunner(rsrc.delete)()
         self.m.VerifyAll()
 
+    def test_net_batched_status(self):
+        cfg.CONF.set_override('neutron_status_poll_interval', 1)
+        self.m.StubOutWithMock(neutronclient.Client, 'list_networks')
+        clients.OpenStackClients.keystone().AndReturn(
+            fakes.FakeKeystoneClient())
+        network = {
+            "status": "BUILD",
+            "subnets": [],
+            "name": "name",
+            "admin_state_up": True,
+            "shared": False,
+            "tenant_id": "c1210485b2424d48804aad5d39c61b8f",
+            "id": "fc68ea2c-b60b-4b4f-bd82-94ec81110766"
+        }
+        neutronclient.Client.create_network({
+            'network': {'name': utils.PhysName('test_stack', 'test_net'),
+                        'admin_state_up': True}
+        }).AndReturn({"network": dict(network)})
+        neutronclient.Client.show_network(
+            'fc68ea2c-b60b-4b4f-bd82-94ec81110766'
+        ).AndReturn({"network": dict(network)})
+        network['status'] = 'ACTIVE'
+        neutronclient.Client.list_networks(
+            id=['fc68ea2c-b60b-4b4f-bd82-94ec81110766']
+        ).AndReturn({"networks": [dict(network)]})
+
+        self.m.ReplayAll()
+        t = template_format.parse(neutron_template)
+        stack = utils.parse_stack(t)
+        self.create_net(t, stack, 'unnamed_network')
+        self.m.VerifyAll()
+
 
 @skipIf(neutronclient is None, 'neutronclient unavailable')
 class NeutronSubnetTest(HeatTestCase):
@@ -17,8 +17,13 @@
 import testscenarios
 import uuid
 
+from oslo.config import cfg
+
 from heat.common import exception
+from heat.engine import clients
+from heat.engine import scheduler
 from heat.engine.resources import nova_utils
+from heat.openstack.common import timeutils
 from heat.tests.common import HeatTestCase
 
 load_tests = testscenarios.load_tests_apply_scenarios
@@ -88,6 +93,240 @@ class NovaUtilsTests(HeatTestCase):
         self.m.VerifyAll()
 
 
+class FakeHTTPClient(object):
+    def __init__(self, projectid, auth_token):
+        self.projectid = projectid
+        self.auth_token = auth_token
+
+
+class NovaUtilsLookupCacheTests(HeatTestCase):
+
+    def setUp(self):
+        super(NovaUtilsLookupCacheTests, self).setUp()
+        self.nova_client = self.m.CreateMockAnything()
+        self.nova_client.client = FakeHTTPClient('tenant', 'token')
+
+    def _flavor(self, flav_id, name):
+        flavor = self.m.CreateMockAnything()
+        flavor.id = flav_id
+        flavor.name = name
+        return flavor
+
+    def test_flavors_listed_once(self):
+        self.nova_client.flavors = self.m.CreateMockAnything()
+        self.nova_client.flavors.list().AndReturn(
+            [self._flavor('1', 'm1.small'), self._flavor('2', 'm1.large')])
+        self.m.ReplayAll()
+        hits = nova_utils.lookup_cache('tenant').hits
+
+        for i in range(100):
+            self.assertEqual('1', nova_utils.get_flavor_id(self.nova_client,
+                                                           'm1.small'))
+            self.assertEqual('2', nova_utils.get_flavor_id(self.nova_client,
+                                                           'm1.large'))
+        self.m.VerifyAll()
+        self.assertEqual(hits + 199, nova_utils.lookup_cache('tenant').hits)
+
+    def test_not_found_cached(self):
+        self.nova_client.images = self.m.CreateMockAnything()
+        self.nova_client.images.list().AndReturn([])
+        self.m.ReplayAll()
+
+        for i in range(2):
+            self.assertRaises(exception.ImageNotFound,
+                              nova_utils.get_image_id,
+                              self.nova_client, 'noimage')
+        self.m.VerifyAll()
+
+    def test_not_unique_cached_briefly(self):
+        # Duplicate names found while looking up another image expire after
+        # nova_lookup_negative_cache_ttl, like the image not being found
+        cfg.CONF.set_override('nova_lookup_cache_ttl', 60)
+        cfg.CONF.set_override('nova_lookup_negative_cache_ttl', 0)
+        images = []
+        for image_id, name in (('1', 'dup'), ('2', 'dup'), ('3', 'single')):
+            image = self.m.CreateMockAnything()
+            image.id = image_id
+            image.name = name
+            images.append(image)
+        self.nova_client.images = self.m.CreateMockAnything()
+        self.nova_client.images.list().AndReturn(images)
+        self.nova_client.images.list().AndReturn(images[1:])
+        self.m.ReplayAll()
+
+        self.assertEqual('3', nova_utils.get_image_id(self.nova_client,
+                                                      'single'))
+        self.assertEqual('2', nova_utils.get_image_id(self.nova_client,
+                                                      'dup'))
+        self.m.VerifyAll()
+
+    def test_cache_per_tenant(self):
+        cfg.CONF.set_override('nova_lookup_cache_size', 2)
+        other_client = self.m.CreateMockAnything()
+        other_client.client = FakeHTTPClient('other_tenant', 'other_token')
+        for client in (self.nova_client, other_client):
+            client.flavors = self.m.CreateMockAnything()
+            client.flavors.list().AndReturn([self._flavor('1', 'm1.small')])
+        self.m.ReplayAll()
+
+        # Another tenant's lookups do not evict this tenant's
+        for client in (self.nova_client, other_client, self.nova_client):
+            self.assertEqual('1', nova_utils.get_flavor_id(client,
+                                                           'm1.small'))
+        self.m.VerifyAll()
+
+    def test_invalidate_lookup(self):
+        my_key = self.m.CreateMockAnything()
+        my_key.name = 'mykey'
+        self.nova_client.keypairs = self.m.CreateMockAnything()
+        self.nova_client.keypairs.list().AndReturn([])
+        self.nova_client.keypairs.list().AndReturn([my_key])
+        self.m.ReplayAll()
+
+        self.assertRaises(exception.UserKeyPairMissing,
+                          nova_utils.get_keypair, self.nova_client, 'mykey')
+        nova_utils.invalidate_lookup(self.nova_client, 'keypair', 'mykey')
+        self.assertEqual(my_key, nova_utils.get_keypair(self.nova_client,
+                                                        'mykey'))
+        self.m.VerifyAll()
+
+    def test_resize_rejected_invalidates_flavor(self):
+        self.nova_client.flavors = self.m.CreateMockAnything()
+        self.nova_client.flavors.list().AndReturn(
+            [self._flavor('1', 'm1.small')])
+        self.nova_client.flavors.list().AndReturn([])
+        server = self.m.CreateMockAnything()
+        server.manager = self.m.CreateMockAnything()
+        server.manager.api = self.nova_client
+        server.resize('1').AndRaise(
+            clients.novaclient.exceptions.BadRequest(400))
+        self.m.ReplayAll()
+
+        flavor_id = nova_utils.get_flavor_id(self.nova_client, 'm1.small')
+        self.assertRaises(clients.novaclient.exceptions.BadRequest,
+                          scheduler.TaskRunner(nova_utils.resize, server,
+                                               'm1.small', flavor_id))
+        self.assertRaises(exception.FlavorMissing, nova_utils.get_flavor_id,
+                          self.nova_client, 'm1.small')
+        self.m.VerifyAll()
+
+    def test_keypairs_not_shared_between_users(self):
+        my_key = self.m.CreateMockAnything()
+        my_key.name = 'mykey'
+        other_client = self.m.CreateMockAnything()
+        other_client.client = FakeHTTPClient('tenant', 'other_token')
+        self.nova_client.keypairs = self.m.CreateMockAnything()
+        self.nova_client.keypairs.list().AndReturn([my_key])
+        other_client.keypairs = self.m.CreateMockAnything()
+        other_client.keypairs.list().AndReturn([])
+        self.m.ReplayAll()
+
+        self.assertEqual(my_key, nova_utils.get_keypair(self.nova_client,
+                                                        'mykey'))
+        self.assertRaises(exception.UserKeyPairMissing,
+                          nova_utils.get_keypair, other_client, 'mykey')
+        self.m.VerifyAll()
+
+
+class FakeServer(object):
+    def __init__(self, manager, server_id, status):
+        self.manager = manager
+        self.id = server_id
+        self._info = {}
+        self._add_details({'id': server_id, 'status': status,
+                           'updated': '2013-10-01T00:00:00Z'})
+
+    def get(self):
+        self.manager.gets.append(self.id)
+
+    def _add_details(self, info):
+        for k, v in info.items():
+            setattr(self, k, v)
+            self._info[k] = v
+
+
+class FakeServerManager(object):
+    def __init__(self):
+        self.api = self
+        self.client = FakeHTTPClient('tenant', 'token')
+        self.gets = []
+        self.lists = []
+        self.servers = []
+
+    def list(self, detailed=True, search_opts=None):
+        self.lists.append(search_opts)
+        return self.servers
+
+
+class ServerStatusPollerTests(HeatTestCase):
+
+    def setUp(self):
+        super(ServerStatusPollerTests, self).setUp()
+        cfg.CONF.set_override('server_status_poll_interval', 1)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.manager = FakeServerManager()
+
+    def test_refresh_batched(self):
+        servers = [FakeServer(self.manager, str(i), 'BUILD')
+                   for i in range(3)]
+        for server in servers:
+            nova_utils.refresh_server(server)
+        self.assertEqual(['0', '1', '2'], self.manager.gets)
+
+        active = FakeServer(self.manager, '1', 'ACTIVE')
+        active._info['updated'] = '2013-10-01T00:00:10Z'
+        self.manager.servers = [active]
+        timeutils.advance_time_seconds(1)
+        for server in servers:
+            nova_utils.refresh_server(server)
+
+        self.assertEqual(['0', '1', '2'], self.manager.gets)
+        self.assertEqual(1, len(self.manager.lists))
+        self.assertIn('changes-since', self.manager.lists[0])
+        self.assertEqual(['BUILD', 'ACTIVE', 'BUILD'],
+                         [s.status for s in servers])
+
+        # No more requests until the interval has passed again
+        for server in servers:
+            nova_utils.refresh_server(server)
+        self.assertEqual(1, len(self.manager.lists))
+
+    def test_refresh_ignores_older_details(self):
+        server = FakeServer(self.manager, '1', 'ACTIVE')
+        server._info['updated'] = '2013-10-01T00:00:10Z'
+        nova_utils.refresh_server(server)
+
+        self.manager.servers = [FakeServer(self.manager, '1', 'BUILD')]
+        timeutils.advance_time_seconds(1)
+        nova_utils.refresh_server(server)
+
+        self.assertEqual(1, len(self.manager.lists))
+        self.assertEqual('ACTIVE', server.status)
+
+    def test_refresh_forgets_idle_servers(self):
+        server = FakeServer(self.manager, '1', 'BUILD')
+        nova_utils.refresh_server(server)
+        timeutils.advance_time_seconds(3600)
+        nova_utils.refresh_server(server)
+        nova_utils.refresh_server(server)
+
+        self.assertEqual(['1', '1'], self.manager.gets)
+        since = timeutils.utcnow() - nova_utils.ServerStatusPoller.CLOCK_SKEW
+        self.assertEqual([{'changes-since': timeutils.isotime(since)}],
+                         self.manager.lists)
+
+    def test_refresh_disabled(self):
+        cfg.CONF.set_override('server_status_poll_interval', 0)
+        server = FakeServer(self.manager, '1', 'BUILD')
+        for i in range(3):
+            nova_utils.refresh_server(server)
+            timeutils.advance_time_seconds(1)
+
+        self.assertEqual(['1', '1', '1'], self.manager.gets)
+        self.assertEqual([], self.manager.lists)
+
+
 class NovaUtilsUserdataTests(HeatTestCase):
 
     scenarios = [
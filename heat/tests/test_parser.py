@@ -657,6 +657,33 @@ class StackTest(HeatTestCase):
         self.assertRaises(exception.NotFound, parser.Stack.load,
                           None, -1)
 
+    def test_load_template_shared(self):
+        tmpl = {'Resources': {'A': {'Type': 'GenericResourceType'}}}
+        stack1 = parser.Stack(self.ctx, 'stack1', parser.Template(tmpl))
+        stack1.store()
+        stack2 = parser.Stack(self.ctx, 'stack2', parser.Template(tmpl))
+        stack2.store()
+        self.assertEqual(stack1.t.id, stack2.t.id)
+
+        loaded1 = parser.Template.load(self.ctx, stack1.t.id)
+        loaded2 = parser.Template.load(self.ctx, stack2.t.id)
+        self.assertEqual(tmpl, loaded1.t)
+        self.assertEqual(tmpl, loaded2.t)
+
+    def test_load_template_cached_copy(self):
+        tmpl = {'Resources': {'A': {'Type': 'GenericResourceType',
+                                    'Properties': {'Instances': []}}}}
+        stack = parser.Stack(self.ctx, 'stack', parser.Template(tmpl))
+        stack.store()
+
+        loaded = parser.Template.load(self.ctx, stack.t.id)
+        loaded = parser.Template.load(self.ctx, stack.t.id)
+        loaded['Resources']['A']['Properties']['Instances'] = ['mutated']
+
+        reloaded = parser.Template.load(self.ctx, stack.t.id)
+        self.assertEqual([], reloaded['Resources']['A']['Properties'][
+            'Instances'])
+
     def test_total_resources_empty(self):
         stack = parser.Stack(self.ctx, 'test_stack', parser.Template({}),
                              status_reason='flimflam')
@@ -1766,6 +1793,8 @@ class StackTest(HeatTestCase):
         self.assertTrue('AResource' in self.stack)
         rsrc = self.stack['AResource']
         rsrc.resource_id_set('aaaa')
+        # Resolve the output from the resource, not the stored value
+        self.stack.stored_outputs = None
         self.assertEqual('AResource', rsrc.FnGetAtt('Foo'))
 
         for action, status in (
@@ -1786,6 +1815,66 @@ class StackTest(HeatTestCase):
             rsrc.state_set(action, status)
             self.assertEqual(None, self.stack.output('TestOutput'))
 
+    @utils.stack_delete_after
+    def test_outputs_stored(self):
+        tmpl = {
+            'Resources': {'AResource': {'Type': 'GenericResourceType'}},
+            'Outputs': {'TestOutput': {'Value': {
+                'Fn::GetAtt': ['AResource', 'Foo']}}
+            }
+        }
+
+        self.stack = parser.Stack(self.ctx, 'outputs_stored',
+                                  template.Template(tmpl))
+        self.stack.store()
+        self.stack.create()
+        self.assertEqual({'TestOutput': 'AResource'},
+                         self.stack.stored_outputs)
+
+        stack = parser.Stack.load(self.ctx, stack_id=self.stack.id)
+        self.assertEqual({'TestOutput': 'AResource'}, stack.stored_outputs)
+
+        # The stored value is used without resolving the output again
+        self.m.StubOutWithMock(stack, '_resolve_output')
+        self.m.ReplayAll()
+        self.assertEqual('AResource', stack.output('TestOutput'))
+        self.m.VerifyAll()
+        self.m.UnsetStubs()
+
+        # A change to a resource discards the stored values
+        rsrc = stack['AResource']
+        rsrc.state_set(rsrc.DELETE, rsrc.COMPLETE)
+        self.assertEqual(None, stack.stored_outputs)
+        self.assertEqual(None, stack.output('TestOutput'))
+        loaded = parser.Stack.load(self.ctx, stack_id=self.stack.id)
+        self.assertEqual(None, loaded.stored_outputs)
+
+        stack.store_outputs()
+        self.assertEqual(None, stack.output('TestOutput'))
+        stack = parser.Stack.load(self.ctx, stack_id=self.stack.id)
+        self.assertEqual({'TestOutput': None}, stack.stored_outputs)
+
+    @utils.stack_delete_after
+    def test_outputs_cleared(self):
+        tmpl = {
+            'Resources': {'AResource': {'Type': 'GenericResourceType'}},
+            'Outputs': {'TestOutput': {'Value': {
+                'Fn::GetAtt': ['AResource', 'Foo']}}
+            }
+        }
+
+        self.stack = parser.Stack(self.ctx, 'outputs_cleared',
+                                  template.Template(tmpl))
+        self.stack.store()
+        self.stack.create()
+
+        self.stack.state_set(self.stack.UPDATE, self.stack.IN_PROGRESS,
+                             'test')
+        self.assertEqual(None, self.stack.stored_outputs)
+        stack = parser.Stack.load(self.ctx, stack_id=self.stack.id)
+        self.assertEqual(None, stack.stored_outputs)
+        self.assertEqual('AResource', stack.output('TestOutput'))
+
     @utils.stack_delete_after
     def test_resource_required_by(self):
         tmpl = {'Resources': {'AResource': {'Type': 'GenericResourceType'},
@@ -0,0 +1,245 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import BaseHTTPServer
+import json
+import threading
+
+import fixtures
+from novaclient import exceptions as novaexceptions
+from oslo.config import cfg
+
+from heat.engine import clients
+from heat.engine import ratelimit
+from heat.tests.common import HeatTestCase
+from heat.tests import utils
+
+
+class FakeNovaHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''Reply to each request with the next status in the server's list.'''
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.server.methods.append(self.command)
+        if self.server.statuses:
+            status = self.server.statuses.pop(0)
+        else:
+            status = 200
+        if status == 200:
+            body = {'flavors': []}
+        else:
+            body = {'error': {'code': status,
+                              'message': 'Request rejected'}}
+        data = json.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if status in (413, 429) and self.server.retry_after is not None:
+            self.send_header('Retry-After', self.server.retry_after)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeNovaServer(fixtures.Fixture):
+    '''A local HTTP endpoint standing in for the Nova API.'''
+
+    def __init__(self, statuses, retry_after='0'):
+        super(FakeNovaServer, self).__init__()
+        self.statuses = statuses
+        self.retry_after = retry_after
+
+    def setUp(self):
+        super(FakeNovaServer, self).setUp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                FakeNovaHandler)
+        self.server.statuses = list(self.statuses)
+        self.server.paths = []
+        self.server.methods = []
+        self.server.retry_after = self.retry_after
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%d/v2/test_tenant_id' % (
+            self.server.server_address[1])
+
+    @property
+    def paths(self):
+        return self.server.paths
+
+
+class TokenBucketTest(HeatTestCase):
+
+    def setUp(self):
+        super(TokenBucketTest, self).setUp()
+        self.clock = utils.FakeClock()
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.ratelimit.wallclock', self.clock))
+
+    def test_burst(self):
+        bucket = ratelimit.TokenBucket(2, 3)
+        self.assertEqual([0, 0, 0, 0.5, 1.0],
+                         [bucket.reserve() for i in range(5)])
+
+    def test_refill(self):
+        bucket = ratelimit.TokenBucket(2, 3)
+        for i in range(3):
+            bucket.reserve()
+        self.clock.now += 1
+        self.assertEqual([0, 0, 0.5],
+                         [bucket.reserve() for i in range(3)])
+
+    def test_refill_limited_to_burst(self):
+        bucket = ratelimit.TokenBucket(2, 3)
+        self.clock.now += 100
+        self.assertEqual([0, 0, 0, 0.5],
+                         [bucket.reserve() for i in range(4)])
+
+    def test_bucket_shared(self):
+        cfg.CONF.set_override('api_rate_limit', 10)
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.ratelimit._buckets', {}))
+        bucket = ratelimit.bucket('compute', 'tenant')
+        self.assertIs(bucket, ratelimit.bucket('compute', 'tenant'))
+        self.assertIsNot(bucket, ratelimit.bucket('compute', 'other'))
+        self.assertIsNot(bucket, ratelimit.bucket('volume', 'tenant'))
+
+    def test_bucket_disabled(self):
+        cfg.CONF.set_override('api_rate_limit', 0)
+        self.assertIsNone(ratelimit.bucket('compute', 'tenant'))
+
+
+class BackoffTest(HeatTestCase):
+
+    def test_backoff_limits(self):
+        self.m.StubOutWithMock(ratelimit.random, 'uniform')
+        for limit in (1.0, 2.0, 4.0, 30.0):
+            ratelimit.random.uniform(0, limit).AndReturn(limit / 2)
+        self.m.ReplayAll()
+
+        self.assertEqual(0.5, ratelimit.backoff(0))
+        self.assertEqual(1.0, ratelimit.backoff(1))
+        self.assertEqual(2.0, ratelimit.backoff(2))
+        self.assertEqual(15.0, ratelimit.backoff(10))
+        self.m.VerifyAll()
+
+
+class LimitedRequestTest(HeatTestCase):
+
+    def setUp(self):
+        super(LimitedRequestTest, self).setUp()
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.ratelimit._buckets', {}))
+        self.sleeps = []
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.ratelimit.sleep', self.sleeps.append))
+
+    def _nova(self, server):
+        self.m.StubOutWithMock(clients.OpenStackClients, 'url_for')
+        clients.OpenStackClients.url_for(
+            service_type='compute').AndReturn(server.url)
+        self.m.ReplayAll()
+        return clients.OpenStackClients(utils.dummy_context()).nova()
+
+    def test_retry_over_limit(self):
+        server = self.useFixture(FakeNovaServer([429, 413, 429]))
+        nova = self._nova(server)
+
+        self.assertEqual([], nova.flavors.list())
+        self.assertEqual(4, len(server.paths))
+        self.assertEqual(3, len(self.sleeps))
+        self.m.VerifyAll()
+
+    def test_retry_limit(self):
+        cfg.CONF.set_override('api_retry_limit', 2)
+        server = self.useFixture(FakeNovaServer([429, 429, 429, 429]))
+        nova = self._nova(server)
+
+        self.assertRaises(novaexceptions.RateLimit, nova.flavors.list)
+        self.assertEqual(3, len(server.paths))
+        self.m.VerifyAll()
+
+    def test_no_retry_other_errors(self):
+        server = self.useFixture(FakeNovaServer([404]))
+        nova = self._nova(server)
+
+        self.assertRaises(novaexceptions.NotFound, nova.flavors.list)
+        self.assertEqual(1, len(server.paths))
+        self.m.VerifyAll()
+
+    def test_post_retry_too_many_requests(self):
+        server = self.useFixture(FakeNovaServer([429], retry_after=None))
+        nova = self._nova(server)
+
+        nova.client.post('/flavors', body={})
+        self.assertEqual(['POST', 'POST'], server.server.methods)
+        self.m.VerifyAll()
+
+    def test_post_retry_over_limit_with_retry_after(self):
+        server = self.useFixture(FakeNovaServer([413], retry_after='2'))
+        nova = self._nova(server)
+
+        nova.client.post('/flavors', body={})
+        self.assertEqual(['POST', 'POST'], server.server.methods)
+        self.assertEqual(1, len(self.sleeps))
+        self.assertTrue(self.sleeps[0] >= 2)
+        self.m.VerifyAll()
+
+    def test_post_no_retry_over_limit(self):
+        server = self.useFixture(FakeNovaServer([413], retry_after=None))
+        nova = self._nova(server)
+
+        self.assertRaises(novaexceptions.OverLimit,
+                          nova.client.post, '/flavors', body={})
+        self.assertEqual(['POST'], server.server.methods)
+        self.m.VerifyAll()
+
+    def test_post_no_retry_unavailable(self):
+        server = self.useFixture(FakeNovaServer([503]))
+        nova = self._nova(server)
+
+        self.assertRaises(novaexceptions.ClientException,
+                          nova.client.post, '/flavors', body={})
+        self.assertEqual(['POST'], server.server.methods)
+        self.m.VerifyAll()
+
+    def test_get_retry_unavailable(self):
+        server = self.useFixture(FakeNovaServer([503]))
+        nova = self._nova(server)
+
+        self.assertEqual([], nova.flavors.list())
+        self.assertEqual(['GET', 'GET'], server.server.methods)
+        self.m.VerifyAll()
+
+    def test_rate_limited(self):
+        cfg.CONF.set_override('api_rate_limit', 1)
+        cfg.CONF.set_override('api_rate_burst', 2)
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.ratelimit.wallclock', utils.FakeClock()))
+        server = self.useFixture(FakeNovaServer([]))
+        nova = self._nova(server)
+
+        for i in range(4):
+            nova.flavors.list()
+        self.assertEqual(4, len(server.paths))
+        self.assertEqual([0, 0, 1.0, 2.0], self.sleeps)
+        self.m.VerifyAll()
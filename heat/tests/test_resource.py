@@ -14,6 +14,9 @@
 
 import itertools
 
+import fixtures
+from oslo.config import cfg
+
 from heat.common import exception
 from heat.engine import dependencies
 from heat.engine import parser
@@ -566,6 +569,91 @@ class ResourceTest(HeatTestCase):
                              'Test::Resource::resource'))
 
 
+class CachingResource(generic_rsrc.GenericResource):
+    cache_attributes = True
+
+
+class ResourceAttributeCacheTest(HeatTestCase):
+    def setUp(self):
+        super(ResourceAttributeCacheTest, self).setUp()
+        utils.setup_dummy_db()
+        self.stack = parser.Stack(utils.dummy_context(), 'test_stack',
+                                  parser.Template({}))
+        self.stack.store()
+        self.now = 1000
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.engine.resource.wallclock', lambda: self.now))
+        self.m.StubOutWithMock(CachingResource, '_resolve_attribute')
+
+    def _create(self):
+        snippet = {'Type': 'GenericResourceType'}
+        res = CachingResource('test_resource', snippet, self.stack)
+        scheduler.TaskRunner(res.create)()
+        return res
+
+    def _load(self):
+        snippet = {'Type': 'GenericResourceType'}
+        return CachingResource('test_resource', snippet, self.stack)
+
+    def test_cached(self):
+        CachingResource._resolve_attribute('foo').AndReturn('bar')
+        CachingResource._resolve_attribute('Foo').AndReturn('baz')
+        self.m.ReplayAll()
+
+        res = self._create()
+        self.assertEqual('bar', res.FnGetAtt('foo'))
+        self.assertEqual('bar', res.FnGetAtt('foo'))
+        self.assertEqual('baz', res.FnGetAtt('Foo'))
+        self.assertEqual('bar', self._load().FnGetAtt('foo'))
+        self.assertEqual('baz', self._load().FnGetAtt('Foo'))
+        self.m.VerifyAll()
+
+    def test_expired(self):
+        CachingResource._resolve_attribute('foo').AndReturn('bar')
+        CachingResource._resolve_attribute('foo').AndReturn('baz')
+        self.m.ReplayAll()
+
+        res = self._create()
+        self.assertEqual('bar', res.FnGetAtt('foo'))
+        self.now += 61
+        self.assertEqual('baz', self._load().FnGetAtt('foo'))
+        self.assertEqual('baz', self._load().FnGetAtt('foo'))
+        self.m.VerifyAll()
+
+    def test_cleared_on_state_change(self):
+        CachingResource._resolve_attribute('foo').AndReturn('bar')
+        CachingResource._resolve_attribute('foo').AndReturn('baz')
+        self.m.ReplayAll()
+
+        res = self._create()
+        self.assertEqual('bar', res.FnGetAtt('foo'))
+        scheduler.TaskRunner(res.suspend)()
+        self.assertEqual('baz', self._load().FnGetAtt('foo'))
+        self.m.VerifyAll()
+
+    def test_not_cached_in_progress(self):
+        CachingResource._resolve_attribute('foo').AndReturn('bar')
+        CachingResource._resolve_attribute('foo').AndReturn('baz')
+        self.m.ReplayAll()
+
+        res = self._create()
+        res.state_set(res.UPDATE, res.IN_PROGRESS)
+        self.assertEqual('bar', res.FnGetAtt('foo'))
+        self.assertEqual('baz', res.FnGetAtt('foo'))
+        self.m.VerifyAll()
+
+    def test_not_cached_when_disabled(self):
+        cfg.CONF.set_override('attribute_cache_ttl', 0)
+        CachingResource._resolve_attribute('foo').AndReturn('bar')
+        CachingResource._resolve_attribute('foo').AndReturn('baz')
+        self.m.ReplayAll()
+
+        res = self._create()
+        self.assertEqual('bar', res.FnGetAtt('foo'))
+        self.assertEqual('baz', res.FnGetAtt('foo'))
+        self.m.VerifyAll()
+
+
 class ResourceDependenciesTest(HeatTestCase):
     def setUp(self):
         super(ResourceDependenciesTest, self).setUp()
@@ -96,6 +96,10 @@ class EngineRpcAPITestCase(testtools.TestCase):
     def test_show_stack(self):
         self._test_engine_api('show_stack', 'call', stack_identity='wordpress')
 
+    def test_show_stack_refresh_outputs(self):
+        self._test_engine_api('show_stack', 'call', stack_identity='wordpress',
+                              refresh_outputs=True)
+
     def test_create_stack(self):
         self._test_engine_api('create_stack', 'call', stack_name='wordpress',
                               template={u'Foo': u'bar'},
@@ -187,10 +191,20 @@ class EngineRpcAPITestCase(testtools.TestCase):
         self._test_engine_api('show_watch', 'call',
                               watch_name='watch1')
 
+    def test_show_watch_filtered(self):
+        self._test_engine_api('show_watch', 'call',
+                              watch_name=None, state='ALARM',
+                              name_prefix='Http', limit=10, marker=4)
+
     def test_show_watch_metric(self):
         self._test_engine_api('show_watch_metric', 'call',
                               metric_namespace=None, metric_name=None)
 
+    def test_show_watch_metric_paged(self):
+        self._test_engine_api('show_watch_metric', 'call',
+                              metric_namespace=None, metric_name=None,
+                              limit=500, marker=3)
+
     def test_set_watch_state(self):
         self._test_engine_api('set_watch_state', 'call',
                               watch_name='watch1', state="xyz")
@@ -16,6 +16,7 @@ import copy
 
 import mox
 
+from heat.engine import clients
 from heat.engine import environment
 from heat.tests.v1_1 import fakes
 from heat.common import exception
@@ -23,6 +24,7 @@ from heat.common import template_format
 from heat.engine import parser
 from heat.engine import resource
 from heat.engine import scheduler
+from heat.engine.resources import nova_utils
 from heat.engine.resources import server as servers
 from heat.openstack.common import uuidutils
 from heat.tests.common import HeatTestCase
@@ -157,6 +159,32 @@ class ServersTest(HeatTestCase):
         self.assertIn(substr, str(error))
         self.m.VerifyAll()
 
+    def test_server_create_rejected_invalidates_lookups(self):
+        server = self._setup_test_server(None, 'test_server_rejected',
+                                         stub_create=False)
+        self.m.StubOutWithMock(self.fc.servers, 'create')
+        self.fc.servers.create(
+            image=1, flavor=1, key_name='test',
+            name=utils.PhysName('test_server_rejected_s', server.name),
+            security_groups=None,
+            userdata=mox.IgnoreArg(), scheduler_hints=None,
+            meta=None, nics=None, availability_zone=None,
+            block_device_mapping=None, config_drive=None,
+            disk_config=None, reservation_id=None).AndRaise(
+                clients.novaclient.exceptions.BadRequest(400))
+        self.m.ReplayAll()
+
+        self.assertRaises(exception.ResourceFailure,
+                          scheduler.TaskRunner(server.create))
+
+        # The image or flavor may have been deleted since it was looked up
+        scope = nova_utils._lookup_scope(self.fc, 'image')
+        cache = nova_utils.lookup_cache(scope)
+        self.assertNotIn(('image', 'CentOS 5.2'), cache)
+        self.assertNotIn(('flavor', '256 MB Server'), cache)
+        self.assertIn(('flavor', 'm1.large'), cache)
+        self.m.VerifyAll()
+
     def test_server_create_with_image_id(self):
         return_server = self.fc.servers.list()[1]
         server = self._setup_test_server(return_server,
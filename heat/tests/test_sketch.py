@@ -0,0 +1,83 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from heat.common import sketch
+from heat.tests.common import HeatTestCase
+
+
+class DDSketchTest(HeatTestCase):
+
+    def test_empty(self):
+        s = sketch.DDSketch()
+        self.assertEqual(None, s.quantile(0.5))
+        self.assertRaises(ValueError, s.quantile, 1.5)
+
+    def test_quantile_accuracy(self):
+        s = sketch.DDSketch(relative_accuracy=0.01)
+        for i in range(1, 10001):
+            s.add(float(i))
+        self.assertEqual(10000, s.count)
+        for q in (0.0, 0.25, 0.5, 0.9, 0.99, 1.0):
+            expected = 1 + q * 9999
+            self.assertAlmostEqual(expected, s.quantile(q),
+                                   delta=expected * 0.01)
+
+    def test_negative_and_zero(self):
+        s = sketch.DDSketch()
+        for value in (-100.0, -10.0, 0.0, 0.0, 10.0, 100.0):
+            s.add(value)
+        self.assertAlmostEqual(-100.0, s.quantile(0.0), delta=1)
+        self.assertAlmostEqual(-10.0, s.quantile(0.2), delta=0.1)
+        self.assertEqual(0.0, s.quantile(0.5))
+        self.assertAlmostEqual(100.0, s.quantile(1.0), delta=1)
+
+    def test_merge(self):
+        low = sketch.DDSketch()
+        high = sketch.DDSketch()
+        for i in range(1, 101):
+            low.add(float(i))
+            high.add(float(i + 100))
+        low.merge(high)
+        self.assertEqual(200, low.count)
+        self.assertAlmostEqual(100.0, low.quantile(0.5), delta=1)
+        self.assertRaises(ValueError, low.merge, sketch.DDSketch(0.05))
+
+    def test_max_bins(self):
+        s = sketch.DDSketch(max_bins=10)
+        for i in range(1, 1001):
+            s.add(float(i))
+        self.assertEqual(10, len(s.positive))
+        self.assertAlmostEqual(1000.0, s.quantile(1.0), delta=10)
+
+    def test_max_bins_mixed_sign(self):
+        s = sketch.DDSketch(relative_accuracy=0.1, max_bins=10)
+        for i in range(1, 101):
+            s.add(-float(i))
+        for i in range(1, 1001):
+            s.add(float(i))
+        self.assertEqual(10, len(s.negative))
+        # Only the most negative values lose accuracy; those close to zero,
+        # which hold the middle quantiles, do not
+        self.assertAlmostEqual(-2.0, s.quantile(98.0 / 1099), delta=0.2)
+        self.assertAlmostEqual(-5.0, s.quantile(95.0 / 1099), delta=0.5)
+        self.assertAlmostEqual(1000.0, s.quantile(1.0), delta=100)
+
+    def test_dict_round_trip(self):
+        s = sketch.DDSketch()
+        for value in (-3.0, 0.0, 1.0, 2.0, 2.0, 50.0):
+            s.add(value)
+        copy = sketch.DDSketch.from_dict(s.to_dict())
+        self.assertEqual(s.count, copy.count)
+        for q in (0.0, 0.3, 0.5, 0.8, 1.0):
+            self.assertEqual(s.quantile(q), copy.quantile(q))
@@ -20,13 +20,16 @@ import mox
 
 
 from heat.db.sqlalchemy import api as db_api
+from heat.db.sqlalchemy import models
 from heat.engine import environment
 from heat.tests.v1_1 import fakes
 from heat.engine.resource import Resource
 from heat.common import context
 from heat.common import exception
+from heat.common import sketch
 from heat.common import template_format
 from heat.engine.resources import instance as instances
+from heat.openstack.common.db import exception as db_exception
 from heat.engine import parser
 from heat.engine import scheduler
 from heat.openstack.common import timeutils
@@ -458,6 +461,7 @@ class DBAPIRawTemplateTest(HeatTestCase):
         super(DBAPIRawTemplateTest, self).setUp()
         self.ctx = utils.dummy_context()
         utils.setup_dummy_db()
+        utils.reset_dummy_db()
 
     def test_raw_template_create(self):
         t = template_format.parse(wp_template)
@@ -472,6 +476,38 @@ class DBAPIRawTemplateTest(HeatTestCase):
         self.assertEqual(tp.id, template.id)
         self.assertEqual(tp.template, template.template)
 
+    def test_raw_template_create_shared(self):
+        t = template_format.parse(wp_template)
+        tp1 = create_raw_template(self.ctx, template=t)
+        tp2 = create_raw_template(self.ctx,
+                                  template=template_format.parse(wp_template))
+        self.assertEqual(tp1.id, tp2.id)
+        self.assertIsNotNone(tp1.hash)
+
+        t['Description'] = 'Something else'
+        tp3 = create_raw_template(self.ctx, template=t)
+        self.assertNotEqual(tp1.id, tp3.id)
+        self.assertNotEqual(tp1.hash, tp3.hash)
+
+    def test_raw_template_refcount(self):
+        tp = create_raw_template(self.ctx)
+        creds = create_user_creds(self.ctx)
+        stack1 = create_stack(self.ctx, tp, creds)
+        create_stack(self.ctx, tp, creds)
+
+        def refcount(template_id):
+            ctx = utils.dummy_context()
+            return db_api.raw_template_get(ctx, template_id).refcount
+
+        self.assertEqual(2, refcount(tp.id))
+
+        t = template_format.parse(wp_template)
+        t['Description'] = 'Updated'
+        tp2 = create_raw_template(self.ctx, template=t)
+        db_api.stack_update(self.ctx, stack1.id, {'raw_template_id': tp2.id})
+        self.assertEqual(1, refcount(tp.id))
+        self.assertEqual(1, refcount(tp2.id))
+
 
 class DBAPIUserCredsTest(HeatTestCase):
     def setUp(self):
@@ -695,6 +731,83 @@ class DBAPIStackTest(HeatTestCase):
         self._deleted_stack_existance(utils.dummy_context(), stacks,
                                       (), (0, 1, 2, 3, 4))
 
+    def test_purge_deleted_dependents(self):
+        now = datetime.now()
+        creds = [create_user_creds(self.ctx) for i in range(3)]
+        stacks = [create_stack(self.ctx, self.template, creds[i],
+                               deleted_at=now - timedelta(days=2))
+                  for i in range(3)]
+        stacks[2].deleted_at = None
+        stacks[2].save(self.ctx.session)
+        for stack in stacks:
+            res = create_resource(self.ctx, stack)
+            res.context = self.ctx
+            create_resource_data(self.ctx, res)
+            rule = create_watch_rule(self.ctx, stack)
+            create_watch_data(self.ctx, rule)
+            create_event(self.ctx, stack_id=stack.id)
+
+        counts = db_api.purge_deleted(age=1, granularity='days',
+                                      batch_size=1)
+        self.assertEqual({'stack': 2, 'event': 2, 'resource': 2,
+                          'resource_data': 2, 'watch_rule': 2,
+                          'watch_data': 2, 'watch_data_rollup': 0,
+                          'user_creds': 2}, counts)
+
+        ctx = utils.dummy_context()
+        self._deleted_stack_existance(ctx, stacks, (2,), (0, 1))
+        self.assertEqual(1, len(db_api.resource_get_all(ctx)))
+        self.assertEqual(1, len(db_api.watch_rule_get_all(ctx)))
+        self.assertEqual(1, len(db_api.watch_data_get_all(ctx)))
+        self.assertEqual(1, len(db_api.event_get_all(ctx)))
+
+    def test_purge_deleted_bad_batch_size(self):
+        self.assertRaises(exception.Error, db_api.purge_deleted, age=1,
+                          batch_size=0)
+        self.assertRaises(exception.Error, db_api.purge_deleted, age=1,
+                          batch_size='x')
+
+    def test_purge_deleted_shared_template(self):
+        now = datetime.now()
+        template = create_raw_template(self.ctx)
+        creds = [create_user_creds(self.ctx) for i in range(2)]
+        deleted = create_stack(self.ctx, template, creds[0],
+                               deleted_at=now - timedelta(days=2))
+        live = create_stack(self.ctx, template, creds[1])
+
+        db_api.purge_deleted(age=1, granularity='days')
+        self._deleted_stack_existance(utils.dummy_context(), [deleted, live],
+                                      (1,), (0,))
+        ret_template = db_api.raw_template_get(utils.dummy_context(),
+                                               template.id)
+        self.assertEqual(1, ret_template.refcount)
+
+    def test_purge_deleted_concurrent(self):
+        now = datetime.now()
+        template = create_raw_template(self.ctx)
+        creds = [create_user_creds(self.ctx) for i in range(2)]
+        deleted = create_stack(self.ctx, template, creds[0],
+                               deleted_at=now - timedelta(days=2))
+        live = create_stack(self.ctx, template, creds[1])
+
+        # Another purge deletes the same batch of stacks just before this one
+        purge_stacks = db_api._purge_stacks
+
+        def concurrent_purge_stacks(*args):
+            purge_stacks(*args)
+            return purge_stacks(*args)
+
+        self.useFixture(fixtures.MonkeyPatch(
+            'heat.db.sqlalchemy.api._purge_stacks', concurrent_purge_stacks))
+
+        counts = db_api.purge_deleted(age=1, granularity='days')
+        self.assertEqual(0, counts['stack'])
+        self._deleted_stack_existance(utils.dummy_context(), [deleted, live],
+                                      (1,), (0,))
+        ret_template = db_api.raw_template_get(utils.dummy_context(),
+                                               template.id)
+        self.assertEqual(1, ret_template.refcount)
+
     def _deleted_stack_existance(self, ctx, stacks, existing, deleted):
         for s in existing:
             self.assertIsNotNone(db_api.stack_get(ctx, stacks[s].id,
@@ -966,6 +1079,28 @@ class DBAPIWatchRuleTest(HeatTestCase):
         names = [wr.name for wr in wrs]
         [self.assertIn(val['name'], names) for val in values]
 
+    def test_watch_rule_get_all_summary(self):
+        for name, state in (('web_cpu', 'NORMAL'), ('web_mem', 'ALARM'),
+                            ('webXcpu', 'ALARM'), ('db_cpu', 'ALARM')):
+            create_watch_rule(self.ctx, self.stack, name=name, state=state)
+
+        wrs = db_api.watch_rule_get_all_summary(self.ctx)
+        self.assertEqual(['web_cpu', 'web_mem', 'webXcpu', 'db_cpu'],
+                         [wr.name for wr in wrs])
+        self.assertEqual({"foo": "123"}, wrs[0].rule)
+
+        # The underscore in the prefix is not a wildcard
+        wrs = db_api.watch_rule_get_all_summary(self.ctx, name_prefix='web_')
+        self.assertEqual(['web_cpu', 'web_mem'], [wr.name for wr in wrs])
+
+        wrs = db_api.watch_rule_get_all_summary(self.ctx, state='ALARM',
+                                                name_prefix='web')
+        self.assertEqual(['web_mem', 'webXcpu'], [wr.name for wr in wrs])
+
+        wrs = db_api.watch_rule_get_all_summary(self.ctx, state='ALARM',
+                                                limit=2, marker=wrs[0].id)
+        self.assertEqual(['webXcpu', 'db_cpu'], [wr.name for wr in wrs])
+
     def test_watch_rule_get_all_by_stack(self):
         self.stack1 = create_stack(self.ctx, self.template, self.user_creds)
 
@@ -981,6 +1116,50 @@ class DBAPIWatchRuleTest(HeatTestCase):
         wrs = db_api.watch_rule_get_all_by_stack(self.ctx, self.stack1.id)
         self.assertEqual(2, len(wrs))
 
+    def test_watch_rule_get_all_by_ids(self):
+        wrs = [create_watch_rule(self.ctx, self.stack, name=name)
+               for name in ('rule1', 'rule2', 'rule3')]
+
+        ret_wrs = db_api.watch_rule_get_all_by_ids(
+            self.ctx, set([wrs[0].id, wrs[2].id]))
+        self.assertEqual(['rule1', 'rule3'],
+                         sorted(wr.name for wr in ret_wrs))
+
+    def test_watch_rule_signature(self):
+        self.assertEqual((0, None), db_api.watch_rule_signature(self.ctx))
+        wr1 = create_watch_rule(self.ctx, self.stack, name='rule1')
+        wr2 = create_watch_rule(self.ctx, self.stack, name='rule2')
+        self.assertEqual((2, wr2.id), db_api.watch_rule_signature(self.ctx))
+        db_api.watch_rule_delete(self.ctx, wr1.id)
+        self.assertEqual((1, wr2.id), db_api.watch_rule_signature(self.ctx))
+
+    def test_watch_rule_get_all_with_stack(self):
+        deleted = create_stack(self.ctx, self.template, self.user_creds,
+                               deleted_at=timeutils.utcnow())
+        values = [
+            {'name': 'rule1', 'state': 'NORMAL'},
+            {'name': 'rule2', 'state': 'SUSPENDED'},
+            {'name': 'rule3', 'state': 'ALARM', 'stack_id': deleted.id},
+        ]
+        [create_watch_rule(self.ctx, self.stack, **val) for val in values]
+
+        wrs = db_api.watch_rule_get_all_with_stack(self.ctx)
+        self.assertEqual(['rule1', 'rule2'], sorted(wr.name for wr in wrs))
+
+        wrs = db_api.watch_rule_get_all_with_stack(
+            self.ctx, exclude_states=['SUSPENDED'])
+        self.assertEqual(['rule1'], [wr.name for wr in wrs])
+        self.assertEqual(self.stack.id, wrs[0].stack.id)
+
+    def test_watch_rule_update_all(self):
+        [create_watch_rule(self.ctx, self.stack, name=name)
+         for name in ('rule1', 'rule2')]
+        now = timeutils.utcnow()
+        db_api.watch_rule_update_all(self.ctx, {'last_evaluated': now})
+
+        wrs = db_api.watch_rule_get_all(utils.dummy_context())
+        self.assertEqual([now, now], [wr.last_evaluated for wr in wrs])
+
     def test_watch_rule_update(self):
         watch_rule = create_watch_rule(self.ctx, self.stack)
         values = {
@@ -1040,3 +1219,187 @@ class DBAPIWatchDataTest(HeatTestCase):
 
         data = [wd.data for wd in watch_data]
         [self.assertIn(val['data'], data) for val in values]
+
+    def test_watch_data_get_all_filtered(self):
+        for namespace, metric_name in (('system/linux', 'CPU'),
+                                       ('system/linux', 'Memory'),
+                                       ('system/linux', 'CPU'),
+                                       ('other', 'CPU')):
+            create_watch_data(self.ctx, self.watch_rule,
+                              namespace=namespace, metric_name=metric_name)
+
+        watch_data = db_api.watch_data_get_all(self.ctx,
+                                               namespace='system/linux')
+        self.assertEqual(['CPU', 'Memory', 'CPU'],
+                         [wd.metric_name for wd in watch_data])
+
+        watch_data = db_api.watch_data_get_all(self.ctx, metric_name='CPU')
+        self.assertEqual(['system/linux', 'system/linux', 'other'],
+                         [wd.namespace for wd in watch_data])
+
+        watch_data = db_api.watch_data_get_all(self.ctx,
+                                               namespace='system/linux',
+                                               metric_name='CPU')
+        self.assertEqual(2, len(watch_data))
+
+    def test_watch_data_get_all_paginated(self):
+        for i in range(5):
+            create_watch_data(self.ctx, self.watch_rule, value=float(i))
+
+        page = db_api.watch_data_get_all(self.ctx, limit=2)
+        self.assertEqual([0.0, 1.0], [wd.value for wd in page])
+        page = db_api.watch_data_get_all(self.ctx, limit=2,
+                                         marker=page[-1].id)
+        self.assertEqual([2.0, 3.0], [wd.value for wd in page])
+        page = db_api.watch_data_get_all(self.ctx, limit=2,
+                                         marker=page[-1].id)
+        self.assertEqual([4.0], [wd.value for wd in page])
+
+    def test_watch_data_create_all(self):
+        values = [{'data': {'foo': 'd%d' % i}, 'value': float(i),
+                   'unit': 'Count', 'watch_rule_id': self.watch_rule.id}
+                  for i in range(3)]
+        db_api.watch_data_create_all(self.ctx, values)
+
+        watch_data = db_api.watch_data_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id)
+        self.assertEqual([0.0, 1.0, 2.0],
+                         sorted(wd.value for wd in watch_data))
+        self.assertIn({'foo': 'd1'}, [wd.data for wd in watch_data])
+        [self.assertIsNotNone(wd.created_at) for wd in watch_data]
+
+    def test_watch_data_get_all_by_watch_rule(self):
+        now = timeutils.utcnow()
+        other_rule = create_watch_rule(self.ctx, self.stack, name='other')
+        for age in (30, 90, 600):
+            create_watch_data(self.ctx, self.watch_rule, value=float(age),
+                              created_at=now - timedelta(seconds=age))
+        create_watch_data(self.ctx, other_rule, value=1.0, created_at=now)
+
+        watch_data = db_api.watch_data_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id)
+        self.assertEqual([600.0, 90.0, 30.0], [wd.value for wd in watch_data])
+
+        watch_data = db_api.watch_data_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id, since=now - timedelta(seconds=300))
+        self.assertEqual([90.0, 30.0], [wd.value for wd in watch_data])
+
+    def test_watch_data_statistics(self):
+        now = timeutils.utcnow()
+        for value, age in ((3.0, 30), (8.0, 60), (1.0, 90), (50.0, 600)):
+            create_watch_data(self.ctx, self.watch_rule, value=value,
+                              created_at=now - timedelta(seconds=age))
+        create_watch_data(self.ctx, self.watch_rule, created_at=now)
+
+        stats = db_api.watch_data_statistics(
+            self.ctx, self.watch_rule.id, since=now - timedelta(seconds=300))
+        self.assertEqual({'minimum': 1.0, 'maximum': 8.0, 'sum': 12.0,
+                          'sample_count': 4, 'value_count': 3}, stats)
+
+        stats = db_api.watch_data_statistics(
+            self.ctx, self.watch_rule.id, since=now + timedelta(seconds=1))
+        self.assertEqual({'minimum': None, 'maximum': None, 'sum': None,
+                          'sample_count': 0, 'value_count': 0}, stats)
+
+    def test_watch_data_prune(self):
+        now = timeutils.utcnow()
+        for age in (1, 2, 3):
+            create_watch_data(self.ctx, self.watch_rule, value=float(age),
+                              created_at=now - timedelta(hours=age))
+
+        count = db_api.watch_data_prune(self.ctx,
+                                        now - timedelta(minutes=90))
+        self.assertEqual(2, count)
+        watch_data = db_api.watch_data_get_all(self.ctx)
+        self.assertEqual([1.0], [wd.value for wd in watch_data])
+        self.assertEqual([], db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id))
+
+    def test_watch_data_prune_rollups(self):
+        minute = datetime(2013, 10, 1, 12, 30)
+        samples = [(minute, 4.0), (minute + timedelta(seconds=20), 1.0),
+                   (minute + timedelta(seconds=40), 7.0),
+                   (minute + timedelta(minutes=1), 2.0),
+                   (minute + timedelta(minutes=2, seconds=10), 5.0)]
+        for created_at, value in samples:
+            create_watch_data(self.ctx, self.watch_rule, value=value,
+                              unit='Count', created_at=created_at)
+
+        # The cut-off falls part way into the last minute, which must be
+        # kept whole rather than split across two rollups
+        count = db_api.watch_data_prune(
+            self.ctx, minute + timedelta(minutes=2, seconds=30), rollups=True)
+        self.assertEqual(4, count)
+        self.assertEqual([5.0], [wd.value for wd in
+                                 db_api.watch_data_get_all(self.ctx)])
+
+        rollups = db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id)
+        self.assertEqual([(minute, 1.0, 7.0, 12.0, 3, 'Count'),
+                          (minute + timedelta(minutes=1),
+                           2.0, 2.0, 2.0, 1, 'Count')],
+                         [(r.period_start, r.minimum, r.maximum, r.sum,
+                           r.sample_count, r.unit) for r in rollups])
+        rollup_sketch = sketch.DDSketch.from_dict(rollups[0].sketch)
+        self.assertEqual(3, rollup_sketch.count)
+        self.assertAlmostEqual(4.0, rollup_sketch.quantile(0.5), delta=0.1)
+
+        count = db_api.watch_data_rollup_prune(
+            self.ctx, minute + timedelta(minutes=1))
+        self.assertEqual(1, count)
+        rollups = db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id)
+        self.assertEqual([minute + timedelta(minutes=1)],
+                         [r.period_start for r in rollups])
+
+        db_api.watch_rule_delete(self.ctx, self.watch_rule.id)
+        self.assertEqual([], db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id))
+
+    def test_watch_data_prune_rollups_idempotent(self):
+        minute = datetime(2013, 10, 1, 12, 30)
+        create_watch_data(self.ctx, self.watch_rule, value=4.0,
+                          created_at=minute)
+        db_api.watch_data_prune(self.ctx, minute + timedelta(minutes=1),
+                                rollups=True)
+
+        # A sample for a minute which has already been rolled up, e.g. by
+        # another engine, is deleted without storing a second rollup
+        create_watch_data(self.ctx, self.watch_rule, value=6.0,
+                          created_at=minute + timedelta(seconds=30))
+        count = db_api.watch_data_prune(
+            self.ctx, minute + timedelta(minutes=1), rollups=True)
+        self.assertEqual(1, count)
+        self.assertEqual([], db_api.watch_data_get_all(self.ctx))
+        rollups = db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id)
+        self.assertEqual([(minute, 4.0)],
+                         [(r.period_start, r.sum) for r in rollups])
+
+    def test_watch_data_prune_rollups_concurrent(self):
+        minute = datetime(2013, 10, 1, 12, 30)
+        create_watch_data(self.ctx, self.watch_rule, value=4.0,
+                          created_at=minute)
+
+        # Another engine stores the same rollup before this one commits
+        session = self.ctx.session
+        flush = session.flush
+
+        def conflicting_flush(*args, **kwargs):
+            if any(isinstance(o, models.WatchDataRollup)
+                   for o in session.new):
+                raise db_exception.DBDuplicateEntry()
+            return flush(*args, **kwargs)
+
+        session.flush = conflicting_flush
+        try:
+            count = db_api.watch_data_prune(
+                self.ctx, minute + timedelta(minutes=1), rollups=True)
+        finally:
+            del session.flush
+
+        self.assertEqual(0, count)
+        self.assertEqual([4.0], [wd.value for wd in
+                                 db_api.watch_data_get_all(self.ctx)])
+        self.assertEqual([], db_api.watch_data_rollup_get_all_by_watch_rule(
+            self.ctx, self.watch_rule.id))
@@ -15,6 +15,9 @@
 
 import datetime
 import mox
+
+from oslo.config import cfg
+
 import heat.db.api as db_api
 
 from heat.common import exception
@@ -28,6 +31,7 @@ from heat.tests import utils
 class WatchData(object):
     def __init__(self, data, created_at):
         self.created_at = created_at
+        self.value = None
         self.data = {'test_metric': {'Value': data,
                                      'Unit': 'Count'}}
 
@@ -269,6 +273,200 @@ class WatchRuleTest(HeatTestCase):
         new_state = self.wr.get_alarm_state()
         self.assertEqual(new_state, 'ALARM')
 
+    def test_extended_statistic(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'ExtendedStatistic': 'p90',
+                'ComparisonOperator': 'GreaterThanThreshold',
+                'Threshold': '50'}
+
+        now = timeutils.utcnow()
+        last = now - datetime.timedelta(seconds=320)
+        data = [WatchData(v, now - datetime.timedelta(seconds=100))
+                for v in range(1, 51)]
+        self.wr = watchrule.WatchRule(context=self.ctx,
+                                      watch_name="testwatch",
+                                      rule=rule,
+                                      watch_data=data,
+                                      stack_id=self.stack_id,
+                                      last_evaluated=last)
+        self.wr.now = now
+        self.assertEqual('NORMAL', self.wr.get_alarm_state())
+
+        # p90 of 1..100 is ~90 -> ALARM
+        data.extend(WatchData(v, now - datetime.timedelta(seconds=200))
+                    for v in range(51, 101))
+        self.assertEqual('ALARM', self.wr.get_alarm_state())
+
+        # samples outside the period are ignored
+        self.wr.watch_data = [WatchData(200,
+                                        now - datetime.timedelta(seconds=400))]
+        self.assertEqual('NODATA', self.wr.get_alarm_state())
+
+    def test_parse_percentile(self):
+        self.assertEqual(0.9, watchrule.parse_percentile('p90'))
+        self.assertAlmostEqual(0.999, watchrule.parse_percentile('p99.9'))
+        self.assertEqual(0.0, watchrule.parse_percentile('p0'))
+        self.assertEqual(1.0, watchrule.parse_percentile('p100'))
+        for bad in ('90', 'p101', 'pX', 'Average', '', None):
+            self.assertRaises(ValueError, watchrule.parse_percentile, bad)
+
+    @utils.wr_delete_after
+    def test_stored_samples_in_period(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Maximum',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+
+        now = timeutils.utcnow()
+        self.wr = watchrule.WatchRule(context=self.ctx,
+                                      watch_name='stored_samples_test',
+                                      rule=rule,
+                                      stack_id=self.stack_id)
+        self.wr.store()
+        for value, age in ((25, 100), (99, 400)):
+            db_api.watch_data_create(self.ctx, {
+                'data': {'test_metric': {'Value': value, 'Unit': 'Count'}},
+                'value': float(value),
+                'unit': 'Count',
+                'watch_rule_id': self.wr.id,
+                'created_at': now - datetime.timedelta(seconds=age)})
+
+        cfg.CONF.set_override('watch_sample_buffers', False)
+        self.wr = watchrule.WatchRule.load(self.ctx, 'stored_samples_test')
+        self.wr.now = now
+        self.assertEqual([25.0], [d.value for d in self.wr._period_samples()])
+
+        self.m.StubOutWithMock(db_api, 'watch_data_get_all_by_watch_rule')
+        self.m.ReplayAll()
+        self.assertEqual('NORMAL', self.wr.get_alarm_state())
+        self.m.VerifyAll()
+
+    @utils.wr_delete_after
+    def test_stored_rollups_in_period(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '600',
+                'Statistic': 'Average',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+
+        now = datetime.datetime(2013, 1, 1, 12, 0, 0)
+        self.wr = watchrule.WatchRule(context=self.ctx,
+                                      watch_name='stored_rollups_test',
+                                      rule=rule,
+                                      stack_id=self.stack_id)
+        self.wr.store()
+        for value, age in ((10, 60), (20, 120), (60, 300), (70, 310),
+                           (99, 900)):
+            db_api.watch_data_create(self.ctx, {
+                'data': {'test_metric': {'Value': value, 'Unit': 'Count'}},
+                'value': float(value),
+                'unit': 'Count',
+                'watch_rule_id': self.wr.id,
+                'created_at': now - datetime.timedelta(seconds=age)})
+        # Roll up the samples more than four minutes old
+        db_api.watch_data_prune(self.ctx,
+                                now - datetime.timedelta(seconds=240),
+                                rollups=True)
+
+        cfg.CONF.set_override('watch_data_rollups', True)
+        self.wr = watchrule.WatchRule.load(self.ctx, 'stored_rollups_test')
+        self.wr.now = now
+        self.assertEqual({'minimum': 10.0, 'maximum': 70.0, 'sum': 160.0,
+                          'sample_count': 4, 'value_count': 4},
+                         self.wr._period_statistics())
+        self.assertEqual('ALARM', self.wr.get_alarm_state())
+        self.assertAlmostEqual(70.0, self.wr._period_percentile(1.0),
+                               delta=1)
+        self.assertAlmostEqual(10.0, self.wr._period_percentile(0.0),
+                               delta=0.1)
+
+        cfg.CONF.set_override('watch_data_rollups', False)
+        self.assertEqual('NORMAL', self.wr.get_alarm_state())
+
+    @utils.wr_delete_after
+    def test_stored_samples_without_value(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Average',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+
+        now = timeutils.utcnow()
+        self.wr = watchrule.WatchRule(context=self.ctx,
+                                      watch_name='legacy_samples_test',
+                                      rule=rule,
+                                      stack_id=self.stack_id)
+        self.wr.store()
+        # A sample stored before values were split out of the JSON data
+        db_api.watch_data_create(self.ctx, {
+            'data': {'test_metric': {'Value': '50', 'Unit': 'Count'}},
+            'watch_rule_id': self.wr.id,
+            'created_at': now - datetime.timedelta(seconds=100)})
+        db_api.watch_data_create(self.ctx, {
+            'data': {'test_metric': {'Value': 20, 'Unit': 'Count'}},
+            'value': 20.0,
+            'unit': 'Count',
+            'watch_rule_id': self.wr.id,
+            'created_at': now - datetime.timedelta(seconds=50)})
+
+        self.wr = watchrule.WatchRule.load(self.ctx, 'legacy_samples_test')
+        self.wr.now = now
+        self.assertEqual({'minimum': 20.0, 'maximum': 50.0, 'sum': 70.0,
+                          'sample_count': 2, 'value_count': 2},
+                         self.wr._period_statistics())
+        self.assertEqual('ALARM', self.wr.get_alarm_state())
+
+    @utils.wr_delete_after
+    def test_sample_buffer(self):
+        cfg.CONF.set_override('watch_sample_buffers', True)
+        rule = {'EvaluationPeriods': '2',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Maximum',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+
+        self.wr = watchrule.WatchRule(context=self.ctx,
+                                      watch_name='sample_buffer_test',
+                                      rule=rule,
+                                      stack_id=self.stack_id)
+        self.wr.store()
+        db_api.watch_data_create(self.ctx, {
+            'data': {'test_metric': {'Value': 20, 'Unit': 'Count'}},
+            'value': 20.0,
+            'unit': 'Count',
+            'watch_rule_id': self.wr.id})
+
+        # The first evaluation reads the samples from the database
+        self.wr = watchrule.WatchRule.load(self.ctx, 'sample_buffer_test')
+        self.wr.now = timeutils.utcnow()
+        self.assertEqual('NORMAL', self.wr.get_alarm_state())
+
+        # Later samples are buffered as they are stored
+        self.wr.create_watch_data(
+            {'test_metric': {'Value': 40, 'Unit': 'Count'}})
+        stored = db_api.watch_data_get_all_by_watch_rule(self.ctx,
+                                                         self.wr.id)
+        self.assertEqual(max(wd.created_at for wd in stored),
+                         watchrule._sample_buffers[self.wr.id]._current[-1][1])
+
+        self.m.StubOutWithMock(db_api, 'watch_data_get_all_by_watch_rule')
+        self.m.StubOutWithMock(db_api, 'watch_data_statistics')
+        self.m.ReplayAll()
+        self.wr = watchrule.WatchRule.load(self.ctx, 'sample_buffer_test')
+        self.wr.now = timeutils.utcnow()
+        self.assertEqual({'minimum': 20.0, 'maximum': 40.0, 'sum': 60.0,
+                          'sample_count': 2, 'value_count': 2},
+                         self.wr._period_statistics())
+        self.assertEqual('ALARM', self.wr.get_alarm_state())
+        self.m.VerifyAll()
+
     @utils.wr_delete_after
     def test_load(self):
         # Insert two dummy watch rules into the DB
@@ -611,6 +809,8 @@ class WatchRuleTest(HeatTestCase):
 
         dbwr = db_api.watch_rule_get_by_name(self.ctx, 'create_data_test')
         self.assertEqual(dbwr.watch_data[0].data, data)
+        self.assertEqual(1.0, dbwr.watch_data[0].value)
+        self.assertEqual('Counter', dbwr.watch_data[0].unit)
 
         # Note, would be good to write another datapoint and check it
         # but sqlite seems to not interpret the backreference correctly
@@ -879,3 +1079,197 @@ class WatchRuleTest(HeatTestCase):
         self.assertRaises(ValueError, self.wr.set_watch_state, None)
 
         self.assertRaises(ValueError, self.wr.set_watch_state, "BADSTATE")
+
+    @utils.wr_delete_after
+    def test_get_matching_rules(self):
+        rule = {u'EvaluationPeriods': u'1',
+                u'AlarmDescription': u'test alarm',
+                u'Period': u'300',
+                u'ComparisonOperator': u'GreaterThanThreshold',
+                u'Statistic': u'SampleCount',
+                u'Threshold': u'2',
+                u'Dimensions': [{u'Name': 'AutoScalingGroupName',
+                                 u'Value': 'group_x'}],
+                u'MetricName': u'IndexMetric'}
+        other_rule = dict(rule, Dimensions=[{u'Name': 'AutoScalingGroupName',
+                                             u'Value': 'group_y'}])
+        self.wr = [watchrule.WatchRule(context=self.ctx,
+                                       watch_name='index_match_test',
+                                       stack_id=self.stack_id, rule=rule),
+                   watchrule.WatchRule(context=self.ctx,
+                                       watch_name='index_other_test',
+                                       stack_id=self.stack_id,
+                                       rule=other_rule)]
+        for wr in self.wr:
+            wr.store()
+
+        data = {u'IndexMetric': {"Unit": "Counter",
+                                 "Value": "1",
+                                 "Dimensions": [{u'AutoScalingGroupName':
+                                                 u'group_x',
+                                                 u'InstanceId': u'i-1'}]}}
+        matches = watchrule.get_matching_rules(self.ctx, data)
+        self.assertEqual(['index_match_test'], [wr.name for wr in matches])
+
+        # Only the matching rule is fetched from the database
+        self.m.StubOutWithMock(db_api, 'watch_rule_get_all_by_ids')
+        db_api.watch_rule_get_all_by_ids(
+            self.ctx, set([self.wr[0].id])).AndReturn([])
+        self.m.ReplayAll()
+        watchrule.get_matching_rules(self.ctx, data)
+        self.m.VerifyAll()
+
+
+class SampleBufferTest(HeatTestCase):
+
+    def test_statistics(self):
+        start = datetime.datetime(2013, 10, 1, 12, 0, 0)
+
+        def at(seconds):
+            return start + datetime.timedelta(seconds=seconds)
+
+        buf = watchrule.SampleBuffer(datetime.timedelta(seconds=60))
+        self.assertEqual({'minimum': None, 'maximum': None, 'sum': None,
+                          'sample_count': 0, 'value_count': 0},
+                         buf.statistics(at(0)))
+
+        for seconds, value in ((0, 5.0), (20, 1.0), (40, 9.0), (60, 3.0)):
+            buf.append(at(seconds), value)
+        self.assertEqual({'minimum': 1.0, 'maximum': 9.0, 'sum': 18.0,
+                          'sample_count': 4, 'value_count': 4},
+                         buf.statistics(at(60)))
+
+        # The first two samples expire from the latest Period, and are
+        # discarded
+        self.assertEqual({'minimum': 3.0, 'maximum': 9.0, 'sum': 12.0,
+                          'sample_count': 2, 'value_count': 2},
+                         buf.statistics(at(100)))
+        self.assertEqual(2, len(buf))
+
+        self.assertEqual({'minimum': None, 'maximum': None, 'sum': None,
+                          'sample_count': 0, 'value_count': 0},
+                         buf.statistics(at(215)))
+        self.assertEqual(0, len(buf))
+
+        buf.append(at(220), 4.0)
+        self.assertEqual({'minimum': 4.0, 'maximum': 4.0, 'sum': 4.0,
+                          'sample_count': 1, 'value_count': 1},
+                         buf.statistics(at(220)))
+
+    def test_percentile(self):
+        start = datetime.datetime(2013, 10, 1, 12, 0, 0)
+
+        def at(seconds):
+            return start + datetime.timedelta(seconds=seconds)
+
+        buf = watchrule.SampleBuffer(datetime.timedelta(seconds=100))
+        self.assertEqual(None, buf.percentile(at(0), 0.5))
+
+        for i in range(100):
+            buf.append(at(i), float(i + 1))
+        self.assertAlmostEqual(50.0, buf.percentile(at(99), 0.5), delta=1)
+        self.assertAlmostEqual(99.0, buf.percentile(at(99), 0.99), delta=1)
+
+        # Only the buckets overlapping the latest Period are merged, so the
+        # estimate includes the samples from 41s onwards rather than 49s
+        for i in range(100, 150):
+            buf.append(at(i), 1000.0)
+        self.assertAlmostEqual(1000.0, buf.percentile(at(149), 0.9),
+                               delta=10)
+        self.assertAlmostEqual(41.0, buf.percentile(at(149), 0.0), delta=1)
+
+        # Sketches expire along with the samples
+        self.assertEqual(None, buf.percentile(at(400), 0.5))
+        self.assertEqual(0, len(buf._sketches))
+
+
+class WatchRuleIndexTest(HeatTestCase):
+
+    class Rule(object):
+        def __init__(self, wid, rule, state=watchrule.WatchRule.NORMAL):
+            self.id = wid
+            self.rule = rule
+            self.state = state
+
+    def test_candidates(self):
+        index = watchrule.WatchRuleIndex()
+        index.rebuild([
+            self.Rule(1, {'MetricName': 'm1'}),
+            self.Rule(2, {'MetricName': 'm1',
+                          'Dimensions': [{'Name': 'a', 'Value': '1'}]}),
+            self.Rule(3, {'MetricName': 'm1',
+                          'Dimensions': [{'Name': 'a', 'Value': '2'}]}),
+            self.Rule(4, {'MetricName': 'm2'}),
+            self.Rule(5, {'meter_name': 'm1',
+                          'matching_metadata': {'metadata.user.a': '1'}},
+                      state=watchrule.WatchRule.CEILOMETER_CONTROLLED)])
+
+        def candidates(metric, dims):
+            return index.candidates({'Namespace': 'test',
+                                     metric: {'Value': 1,
+                                              'Dimensions': [dims]}})
+
+        self.assertEqual(set([1, 2, 5]), candidates('m1', {'a': '1'}))
+        self.assertEqual(set([1, 3]), candidates('m1', {'a': '2', 'b': '3'}))
+        self.assertEqual(set([1]), candidates('m1', {}))
+        self.assertEqual(set([4]), candidates('m2', {'a': '1'}))
+        self.assertEqual(set(), candidates('m3', {}))
+
+    def test_add_remove(self):
+        index = watchrule.WatchRuleIndex()
+        index.rebuild([])
+        data = {'m1': {'Value': 1}}
+
+        index.add(1, watchrule.WatchRule.NORMAL, {'MetricName': 'm1'})
+        self.assertEqual(set([1]), index.candidates(data))
+
+        index.add(1, watchrule.WatchRule.NORMAL, {'MetricName': 'm2'})
+        self.assertEqual(set(), index.candidates(data))
+
+        index.add(2, watchrule.WatchRule.NORMAL, {'MetricName': 'm1'})
+        index.remove(2)
+        index.remove(3)
+        self.assertEqual(set(), index.candidates(data))
+
+    def test_signature(self):
+        index = watchrule.WatchRuleIndex()
+        index.rebuild([], (0, None))
+
+        index.rule_created(4, watchrule.WatchRule.NORMAL, {'MetricName': 'm1'})
+        self.assertEqual((1, 4), index.signature)
+        index.rule_created(5, watchrule.WatchRule.NORMAL, {'MetricName': 'm1'})
+        self.assertEqual((2, 5), index.signature)
+        self.assertEqual(set([4, 5]), index.candidates({'m1': {'Value': 1}}))
+
+        index.rule_deleted(4)
+        self.assertEqual((1, 5), index.signature)
+        # The next highest ID is unknown, so the index must be rebuilt
+        index.rule_deleted(5)
+        self.assertEqual(None, index.signature)
+
+    def test_route_samples_check_interval(self):
+        ctx = utils.dummy_context()
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+        self.m.StubOutWithMock(db_api, 'watch_rule_signature')
+        self.m.StubOutWithMock(db_api, 'watch_rule_get_all')
+        db_api.watch_rule_signature(ctx).AndReturn((0, None))
+        db_api.watch_rule_get_all(ctx).AndReturn([])
+        db_api.watch_rule_signature(ctx).AndReturn((0, None))
+        db_api.watch_rule_signature(ctx).AndReturn((1, 1))
+        db_api.watch_rule_get_all(ctx).AndReturn([])
+        self.m.ReplayAll()
+
+        data = {'m1': {'Value': 1}}
+        # The index is built on first use...
+        self.assertEqual([], watchrule.route_samples(ctx, [data]))
+        # ...and the signature is not checked again until CHECK_INTERVAL
+        # has passed
+        timeutils.advance_time_seconds(5)
+        self.assertEqual([], watchrule.route_samples(ctx, [data]))
+        timeutils.advance_time_seconds(5)
+        self.assertEqual([], watchrule.route_samples(ctx, [data]))
+        # ...when the index is rebuilt if rules have changed elsewhere
+        timeutils.advance_time_seconds(10)
+        self.assertEqual([], watchrule.route_samples(ctx, [data]))
+        self.m.VerifyAll()
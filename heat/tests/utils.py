@@ -46,6 +46,16 @@ class UUIDStub(object):
         uuid.uuid4 = self.uuid4
 
 
+class FakeClock(object):
+    '''A clock for replacing a wallclock function, advanced by hand.'''
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 def random_name():
     return ''.join(random.choice(string.ascii_uppercase)
                    for x in range(10))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Simulate rolling updates of instance groups.
+
+Compares the total time taken to update every member of a group when each
+batch must finish before the next is started, with the time taken by the
+pipelined RollingUpdate task used by InstanceGroup, which starts another
+member as soon as a slot is free. The time taken to update each member is
+drawn at random, and simulated time advances by one second per step, so no
+real resources are involved.
+"""
+
+import random
+
+from heat.engine.resources import autoscaling
+from heat.engine import scheduler
+
+MEAN_UPDATE_TIME = 120
+STDDEV_UPDATE_TIME = 40
+
+
+class SimulatedClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def update_times(num_members, seed=0):
+    rand = random.Random(seed)
+    return [max(1, int(rand.gauss(MEAN_UPDATE_TIME, STDDEV_UPDATE_TIME)))
+            for i in range(num_members)]
+
+
+def batched(times, batch_size, pause_time):
+    """
+    Return the time taken to update the members in sequential batches, and
+    the number of load balancer reloads needed.
+    """
+    batches = [times[i:i + batch_size]
+               for i in range(0, len(times), batch_size)]
+    pauses = len(batches) - 1 if pause_time else 0
+    return (sum(max(b) for b in batches) + pause_time * (len(batches) - 1),
+            len(batches) + pauses)
+
+
+def pipelined(times, batch_size, pause_time):
+    """
+    Return the time taken to update the members with RollingUpdate, and the
+    number of load balancer reloads needed.
+    """
+    clock = SimulatedClock()
+    reloads = []
+
+    def update(member):
+        for i in range(times[member]):
+            yield
+
+    wallclock = scheduler.wallclock
+    scheduler.wallclock = clock
+    try:
+        runner = scheduler.TaskRunner(autoscaling.RollingUpdate(
+            range(len(times)), update, batch_size, pause_time,
+            out_of_service=reloads.append))
+        runner.start()
+        while not runner.step():
+            clock.now += 1
+    finally:
+        scheduler.wallclock = wallclock
+    return clock.now, len(reloads)
+
+
+def main():
+    print("| Members | MaxBatchSize | PauseTime | Batched (s) | Reloads "
+          "| Pipelined (s) | Reloads |")
+    print("|---------+--------------+-----------+-------------+---------"
+          "+---------------+---------|")
+
+    for num_members in (100, 1000):
+        times = update_times(num_members)
+        for batch_size in (1, 10, 50):
+            for pause_time in (0, 60):
+                print("| %7d | %12d | %9d | %11d | %7d | %13d | %7d |" %
+                      ((num_members, batch_size, pause_time) +
+                       batched(times, batch_size, pause_time) +
+                       pipelined(times, batch_size, pause_time)))
+
+
+if __name__ == '__main__':
+    main()